@@ -3,8 +3,8 @@ from django.db import transaction
 
 from apps.accounts.models import User
 from apps.payments.models import Dispute, FinancialAuditLog
-from apps.payments.services import resolve_dispute
-from apps.payments.services import _build_hash_chain
+from apps.payments.services import record_financial_event, resolve_dispute
+from common.cache_utils import bump_platform_settings_version
 from common.exceptions import DomainError
 from common.models import PlatformSetting
 
@@ -21,27 +21,16 @@ def update_platform_fee(pct: int, actor: User) -> PlatformSetting:
     if pct < 0 or pct > 30:
         raise DomainError("Platform fee must be between 0 and 30.")
 
-    setting = PlatformSetting.get_solo()
+    setting = PlatformSetting.get_solo(for_update=True)
     before_state = {
         "platform_fee_pct": setting.platform_fee_pct,
         "partial_escrow_mode": setting.partial_escrow_mode,
     }
     setting.platform_fee_pct = pct
     setting.save(update_fields=["platform_fee_pct"])
+    bump_platform_settings_version()
 
-    payload = {
-        "actor_id": actor.id,
-        "action_type": FinancialAuditLog.ACTION_COMMISSION_UPDATE,
-        "entity_type": FinancialAuditLog.ENTITY_COMMISSION,
-        "entity_id": setting.id,
-        "before_state": before_state,
-        "after_state": {
-            "platform_fee_pct": setting.platform_fee_pct,
-            "partial_escrow_mode": setting.partial_escrow_mode,
-        },
-        "reason": "Admin updated commission policy",
-    }
-    FinancialAuditLog.objects.create(
+    record_financial_event(
         actor=actor,
         action_type=FinancialAuditLog.ACTION_COMMISSION_UPDATE,
         entity_type=FinancialAuditLog.ENTITY_COMMISSION,
@@ -52,7 +41,6 @@ def update_platform_fee(pct: int, actor: User) -> PlatformSetting:
             "partial_escrow_mode": setting.partial_escrow_mode,
         },
         reason="Admin updated commission policy",
-        hash_chain=_build_hash_chain(payload),
     )
     return setting
 
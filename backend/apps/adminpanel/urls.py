@@ -6,9 +6,13 @@ from .views import (
     AdminCommissionUpdateView,
     AdminDisputeListView,
     AdminDisputeResolveView,
+    AdminEscrowLedgerView,
     AdminEscrowListView,
     AdminPaymentListView,
     AdminProjectListView,
+    AdminQPayStatsView,
+    AdminRevenueCategoryReportView,
+    AdminRevenueReportView,
     AdminUserListView,
     AdminUserVerifyView,
 )
@@ -18,9 +22,17 @@ urlpatterns = [
     path("users/<int:user_id>/verify", AdminUserVerifyView.as_view(), name="admin-users-verify"),
     path("projects", AdminProjectListView.as_view(), name="admin-projects"),
     path("escrow", AdminEscrowListView.as_view(), name="admin-escrow"),
+    path("escrow/<int:escrow_id>/ledger", AdminEscrowLedgerView.as_view(), name="admin-escrow-ledger"),
     path("payments", AdminPaymentListView.as_view(), name="admin-payments"),
+    path("ops/qpay", AdminQPayStatsView.as_view(), name="admin-ops-qpay"),
     path("disputes", AdminDisputeListView.as_view(), name="admin-disputes"),
     path("disputes/<int:dispute_id>/resolve", AdminDisputeResolveView.as_view(), name="admin-disputes-resolve"),
+    path("reports/revenue", AdminRevenueReportView.as_view(), name="admin-reports-revenue"),
+    path(
+        "reports/revenue/categories",
+        AdminRevenueCategoryReportView.as_view(),
+        name="admin-reports-revenue-categories",
+    ),
     path("settings/commission", AdminCommissionUpdateView.as_view(), name="admin-commission"),
     path("settings/commission/detail", AdminCommissionDetailView.as_view(), name="admin-commission-detail"),
 ]
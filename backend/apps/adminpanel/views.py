@@ -1,6 +1,8 @@
 """Admin panel API views."""
-from django.core.cache import cache
+from datetime import date, timedelta
+
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -8,12 +10,29 @@ from rest_framework.views import APIView
 from apps.accounts.models import User
 from apps.accounts.permissions import IsAdminUser
 from apps.accounts.serializers import UserSerializer
-from apps.payments.models import Dispute, Escrow, Payment
+from apps.payments.models import Dispute, Escrow, LedgerPosting, Payment
 from apps.payments.idempotency import execute_idempotent
-from apps.payments.serializers import DisputeSerializer, EscrowSerializer, PaymentSerializer
+from apps.payments.services.qpay_service import qpay_breaker_stats
+from apps.payments.services.revenue_rollups import REPORTS_RESOURCE, category_report, revenue_report
+from apps.payments.services.webhook_cache import webhook_verification_stats
+from apps.payments.serializers import (
+    DisputeSerializer,
+    EscrowSerializer,
+    LedgerAccountSerializer,
+    LedgerPostingSerializer,
+    PaymentSerializer,
+)
 from apps.projects.models import Project
 from apps.projects.serializers import ProjectSerializer
-from common.cache_utils import admin_detail_cache_key, admin_list_cache_key, bump_admin_resource_version, bump_user_public_version
+from common.cache_utils import (
+    admin_detail_cache_key,
+    admin_list_cache_key,
+    bump_admin_resource_version,
+    bump_user_public_version,
+    stale_cache_key,
+)
+from common.cached_read import cached_json_response
+from common.exceptions import DomainError
 from common.pagination import StandardResultsSetPagination
 from common.models import PlatformSetting
 
@@ -27,22 +46,53 @@ def _paginated_response(request, queryset, serializer_class, view):
     return paginator.get_paginated_response(serializer.data)
 
 
+def _cached_admin_list(request, resource: str, compute):
+    cache_key = admin_list_cache_key(resource, request.query_params)
+    return cached_json_response(request, cache_key, compute, timeout=60, stale_key=stale_cache_key(cache_key))
+
+
+REPORT_DEFAULT_DAYS = 30
+REPORT_MAX_DAYS = 366
+
+
+def _report_range(request) -> tuple[date, date]:
+    """``from``/``to`` ISO dates, inclusive; the last 30 days by default."""
+    try:
+        until = date.fromisoformat(request.query_params.get("to") or timezone.localdate().isoformat())
+        since = date.fromisoformat(
+            request.query_params.get("from") or (until - timedelta(days=REPORT_DEFAULT_DAYS - 1)).isoformat()
+        )
+    except ValueError:
+        raise DomainError("from and to must be YYYY-MM-DD dates.")
+    if since > until:
+        raise DomainError("from must not be after to.")
+    if (until - since).days >= REPORT_MAX_DAYS:
+        raise DomainError(f"Report range is limited to {REPORT_MAX_DAYS} days.")
+    return since, until
+
+
+def _cached_report(request, group: str, since: date, until: date, report):
+    # Keyed on the resolved range, so a default "last 30 days" entry is not served on the next day.
+    params = request.query_params.copy()
+    params["group"], params["from"], params["to"] = group, since.isoformat(), until.isoformat()
+    cache_key = admin_list_cache_key(REPORTS_RESOURCE, params)
+    return cached_json_response(
+        request, cache_key, lambda: report(since, until), timeout=60, stale_key=stale_cache_key(cache_key)
+    )
+
+
 class AdminUserListView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        cache_key = admin_list_cache_key("users", request.query_params)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
+        def _compute():
+            verified = request.query_params.get("verified")
+            queryset = User.objects.all().order_by("-created_at")
+            if verified is not None:
+                queryset = queryset.filter(is_verified=verified.lower() == "true")
+            return _paginated_response(request, queryset, UserSerializer, self).data
 
-        verified = request.query_params.get("verified")
-        queryset = User.objects.all().order_by("-created_at")
-        if verified is not None:
-            queryset = queryset.filter(is_verified=verified.lower() == "true")
-        response = _paginated_response(request, queryset, UserSerializer, self)
-        cache.set(cache_key, response.data, timeout=60)
-        return response
+        return _cached_admin_list(request, "users", _compute)
 
 
 class AdminUserVerifyView(APIView):
@@ -60,72 +110,100 @@ class AdminProjectListView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        cache_key = admin_list_cache_key("projects", request.query_params)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
+        def _compute():
+            status_param = request.query_params.get("status")
+            queryset = Project.objects.all().order_by("-created_at")
+            if status_param:
+                queryset = queryset.filter(status=status_param)
+            return _paginated_response(request, queryset, ProjectSerializer, self).data
 
-        status_param = request.query_params.get("status")
-        queryset = Project.objects.all().order_by("-created_at")
-        if status_param:
-            queryset = queryset.filter(status=status_param)
-        response = _paginated_response(request, queryset, ProjectSerializer, self)
-        cache.set(cache_key, response.data, timeout=60)
-        return response
+        return _cached_admin_list(request, "projects", _compute)
 
 
 class AdminEscrowListView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        cache_key = admin_list_cache_key("escrow", request.query_params)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
+        def _compute():
+            status_param = request.query_params.get("status")
+            queryset = Escrow.objects.select_related("project").all().order_by("-created_at")
+            if status_param:
+                queryset = queryset.filter(status=status_param)
+            return _paginated_response(request, queryset, EscrowSerializer, self).data
+
+        return _cached_admin_list(request, "escrow", _compute)
 
-        status_param = request.query_params.get("status")
-        queryset = Escrow.objects.select_related("project").all().order_by("-created_at")
-        if status_param:
-            queryset = queryset.filter(status=status_param)
-        response = _paginated_response(request, queryset, EscrowSerializer, self)
-        cache.set(cache_key, response.data, timeout=60)
-        return response
+
+class AdminEscrowLedgerView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, escrow_id):
+        # Balances are financial source of truth, so this view always reads the database.
+        escrow = get_object_or_404(Escrow, id=escrow_id)
+        postings = (
+            LedgerPosting.objects.filter(entry__escrow=escrow)
+            .select_related("entry", "debit_account", "credit_account")
+            .order_by("id")
+        )
+        return Response(
+            {
+                "escrow": EscrowSerializer(escrow).data,
+                "accounts": LedgerAccountSerializer(escrow.ledger_accounts.order_by("kind"), many=True).data,
+                "postings": LedgerPostingSerializer(postings, many=True).data,
+            }
+        )
+
+
+class AdminQPayStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # Live counters shared by every worker; caching them would only hide changes.
+        return Response({"breaker": qpay_breaker_stats(), "webhook_verification": webhook_verification_stats()})
 
 
 class AdminPaymentListView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        cache_key = admin_list_cache_key("payments", request.query_params)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
+        def _compute():
+            status_param = request.query_params.get("status")
+            queryset = Payment.objects.select_related("project").all().order_by("-created_at")
+            if status_param:
+                queryset = queryset.filter(status=status_param)
+            return _paginated_response(request, queryset, PaymentSerializer, self).data
 
-        status_param = request.query_params.get("status")
-        queryset = Payment.objects.select_related("project").all().order_by("-created_at")
-        if status_param:
-            queryset = queryset.filter(status=status_param)
-        response = _paginated_response(request, queryset, PaymentSerializer, self)
-        cache.set(cache_key, response.data, timeout=60)
-        return response
+        return _cached_admin_list(request, "payments", _compute)
 
 
 class AdminDisputeListView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        cache_key = admin_list_cache_key("disputes", request.query_params)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
+        def _compute():
+            unresolved = request.query_params.get("unresolved")
+            queryset = Dispute.objects.select_related("project", "raised_by", "resolved_by").all().order_by("-created_at")
+            if unresolved is not None and unresolved.lower() == "true":
+                queryset = queryset.filter(resolved_at__isnull=True)
+            return _paginated_response(request, queryset, DisputeSerializer, self).data
 
-        unresolved = request.query_params.get("unresolved")
-        queryset = Dispute.objects.select_related("project", "raised_by", "resolved_by").all().order_by("-created_at")
-        if unresolved is not None and unresolved.lower() == "true":
-            queryset = queryset.filter(resolved_at__isnull=True)
-        response = _paginated_response(request, queryset, DisputeSerializer, self)
-        cache.set(cache_key, response.data, timeout=60)
-        return response
+        return _cached_admin_list(request, "disputes", _compute)
+
+
+class AdminRevenueReportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        since, until = _report_range(request)
+        return _cached_report(request, "day", since, until, revenue_report)
+
+
+class AdminRevenueCategoryReportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        since, until = _report_range(request)
+        return _cached_report(request, "category", since, until, category_report)
 
 
 class AdminDisputeResolveView(APIView):
@@ -176,16 +254,20 @@ class AdminCommissionUpdateView(APIView):
         return Response(payload, status=status_code)
 
 
+def _commission_detail():
+    return {"platform_fee_pct": PlatformSetting.get_solo().platform_fee_pct}
+
+
 class AdminCommissionDetailView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         cache_key = admin_detail_cache_key("settings")
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
-
-        setting = PlatformSetting.get_solo()
-        payload = {"platform_fee_pct": setting.platform_fee_pct}
-        cache.set(cache_key, payload, timeout=300)
-        return Response(payload)
+        return cached_json_response(
+            request,
+            cache_key,
+            _commission_detail,
+            timeout=300,
+            soft_timeout=240,
+            stale_key=stale_cache_key(cache_key),
+        )
@@ -1,41 +1,183 @@
-"""Idempotency helpers for financial endpoints."""
+"""Idempotency helpers for financial endpoints.
+
+Recorded responses live in Postgres (``IdempotencyKey``) for the retention window and in the
+cache for the first ``IDEMPOTENCY_CACHE_SECONDS`` of it, so a client retry is usually answered
+without touching the database.
+"""
 import hashlib
 import json
+import time
 
-from django.db import IntegrityError
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 
-from common.exceptions import DomainError
+from common.exceptions import ConflictError, DomainError
 
 from .models import IdempotencyKey
 
+CACHE_KEY_PREFIX = "idempotency:response"
+PURGE_CHUNK_SIZE = 5000
+RESERVE_ATTEMPTS = 3
+WAIT_INTERVAL_SECONDS = 0.05
+
 
 def _hash_response(payload) -> str:
     raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
     return hashlib.sha256(raw).hexdigest()
 
 
+def idempotency_cache_key(actor_id: int, endpoint: str, key: str) -> str:
+    digest = hashlib.sha256(f"{endpoint}\n{key}".encode("utf-8")).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{actor_id}:{digest}"
+
+
 def execute_idempotent(request, endpoint: str, actor, executor):
+    """Run ``executor`` at most once per ``(actor, endpoint, Idempotency-Key)``.
+
+    The first request reserves the key with a committed pending row before executing, so a
+    concurrent duplicate never reaches the executor: it waits up to ``IDEMPOTENCY_WAIT_SECONDS``
+    to replay the result, then gets a 409. A failed executor releases the key for a retry, and
+    a reservation older than ``IDEMPOTENCY_RESERVATION_TTL_SECONDS`` (a crashed worker) is
+    taken over.
+    """
     key = request.headers.get("Idempotency-Key")
     if not key:
         raise DomainError("Idempotency-Key header is required.")
 
-    existing = IdempotencyKey.objects.filter(actor=actor, endpoint=endpoint, key=key).first()
-    if existing:
-        return existing.response_body, existing.status_code
+    cache_key = idempotency_cache_key(actor.id, endpoint, key)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached["body"], cached["status"]
+
+    record, owner = _reserve(actor, endpoint, key)
+    if not owner:
+        if record.state == IdempotencyKey.STATE_COMPLETED:
+            _remember(cache_key, record.response_body, record.status_code)
+            return record.response_body, record.status_code
+        return _await_completion(record, cache_key)
 
-    response_body, status_code = executor()
-    response_hash = _hash_response(response_body)
     try:
-        IdempotencyKey.objects.create(
-            actor=actor,
-            endpoint=endpoint,
-            key=key,
-            response_hash=response_hash,
-            response_body=response_body,
-            status_code=status_code,
-        )
-    except IntegrityError:
-        replay = IdempotencyKey.objects.get(actor=actor, endpoint=endpoint, key=key)
-        return replay.response_body, replay.status_code
+        response_body, status_code = executor()
+    except BaseException:
+        IdempotencyKey.objects.filter(
+            id=record.id,
+            state=IdempotencyKey.STATE_PENDING,
+            reserved_at=record.reserved_at,
+        ).delete()
+        raise
 
+    IdempotencyKey.objects.filter(id=record.id).update(
+        state=IdempotencyKey.STATE_COMPLETED,
+        response_hash=_hash_response(response_body),
+        response_body=response_body,
+        status_code=status_code,
+    )
+    _remember(cache_key, response_body, status_code)
     return response_body, status_code
+
+
+def purge_expired_idempotency_keys(
+    *,
+    retention_days: int | None = None,
+    chunk_size: int = PURGE_CHUNK_SIZE,
+    progress=None,
+) -> int:
+    """Delete keys older than the retention window, ``chunk_size`` rows per statement.
+
+    Endpoints are visited one at a time with ``endpoint > previous`` seeks and each endpoint's
+    expired rows are found by a ``created_at`` range scan, so both walk
+    ``idx_idempo_endpoint_created`` instead of scanning the table.
+    """
+    if retention_days is None:
+        retention_days = settings.IDEMPOTENCY_RETENTION_DAYS
+    cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+    deleted = 0
+    endpoint = ""
+    while True:
+        endpoint = (
+            IdempotencyKey.objects.filter(endpoint__gt=endpoint)
+            .order_by("endpoint")
+            .values_list("endpoint", flat=True)
+            .first()
+        )
+        if endpoint is None:
+            return deleted
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(endpoint=endpoint, created_at__lt=cutoff)
+                .order_by("created_at")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+            if progress:
+                progress(deleted)
+            if len(ids) < chunk_size:
+                break
+
+
+def _reserve(actor, endpoint: str, key: str) -> tuple[IdempotencyKey, bool]:
+    """Return the key's row and whether this caller owns its execution."""
+    now = timezone.now()
+    for _attempt in range(RESERVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    actor=actor,
+                    endpoint=endpoint,
+                    key=key,
+                    state=IdempotencyKey.STATE_PENDING,
+                    reserved_at=now,
+                    response_hash="",
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(actor=actor, endpoint=endpoint, key=key).first()
+        if record is not None:
+            break
+        # The owner failed and released the key between our insert and read; try to reserve again.
+    else:
+        raise ConflictError("A request with this Idempotency-Key is still in progress.")
+
+    stale_before = now - timezone.timedelta(seconds=settings.IDEMPOTENCY_RESERVATION_TTL_SECONDS)
+    if record.state == IdempotencyKey.STATE_PENDING and record.reserved_at < stale_before:
+        # Conditional on the reservation we read, so only one duplicate wins the takeover.
+        claimed = IdempotencyKey.objects.filter(
+            id=record.id,
+            state=IdempotencyKey.STATE_PENDING,
+            reserved_at=record.reserved_at,
+        ).update(reserved_at=now)
+        if claimed:
+            record.reserved_at = now
+            return record, True
+    return record, False
+
+
+def _await_completion(record: IdempotencyKey, cache_key: str):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL_SECONDS)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached["body"], cached["status"]
+        current = (
+            IdempotencyKey.objects.filter(id=record.id)
+            .values("state", "response_body", "status_code")
+            .first()
+        )
+        if current is None:
+            raise ConflictError("The first request with this Idempotency-Key failed; retry it.")
+        if current["state"] == IdempotencyKey.STATE_COMPLETED:
+            return current["response_body"], current["status_code"]
+    raise ConflictError("A request with this Idempotency-Key is still in progress.")
+
+
+def _remember(cache_key: str, body, status_code: int) -> None:
+    # Retention bounds the cache too: a replay must not outlive the row it mirrors.
+    timeout = min(settings.IDEMPOTENCY_CACHE_SECONDS, settings.IDEMPOTENCY_RETENTION_DAYS * 86400)
+    entry = {"body": body, "status": status_code}
+    # Only cache what committed; a rolled-back executor must be allowed to run again.
+    transaction.on_commit(lambda: cache.set(cache_key, entry, timeout=timeout))
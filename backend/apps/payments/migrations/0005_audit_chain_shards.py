@@ -0,0 +1,85 @@
+from django.db import migrations, models
+
+LEGACY_CHAIN_KEY = "global"
+BATCH_SIZE = 2000
+
+
+def backfill_legacy_chain(apps, schema_editor):
+    """Number the pre-sharding rows as one chain, in the order they were hashed."""
+    FinancialAuditLog = apps.get_model("payments", "FinancialAuditLog")
+    AuditChainHead = apps.get_model("payments", "AuditChainHead")
+
+    seq = 0
+    prev_hash = "GENESIS"
+    batch = []
+    for entry in FinancialAuditLog.objects.order_by("id").only("id", "hash_chain").iterator(chunk_size=BATCH_SIZE):
+        seq += 1
+        entry.chain_key = LEGACY_CHAIN_KEY
+        entry.chain_seq = seq
+        entry.prev_hash = prev_hash
+        prev_hash = entry.hash_chain
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            FinancialAuditLog.objects.bulk_update(batch, ["chain_key", "chain_seq", "prev_hash"])
+            batch = []
+    if batch:
+        FinancialAuditLog.objects.bulk_update(batch, ["chain_key", "chain_seq", "prev_hash"])
+    if seq:
+        AuditChainHead.objects.create(chain_key=LEGACY_CHAIN_KEY, seq=seq, last_hash=prev_hash)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0004_payment_and_escrow_fee_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditChainHead",
+            fields=[
+                ("chain_key", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("seq", models.PositiveBigIntegerField(default=0)),
+                ("last_hash", models.CharField(max_length=128)),
+                ("anchored_seq", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FinancialAuditAnchor",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("merkle_root", models.CharField(max_length=64)),
+                ("prev_hash", models.CharField(max_length=128)),
+                ("hash_chain", models.CharField(max_length=128)),
+                ("leaves", models.JSONField(default=list)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("prev_hash",), name="uq_fin_audit_anchor_prev")],
+            },
+        ),
+        migrations.AddField(
+            model_name="financialauditlog",
+            name="chain_key",
+            field=models.CharField(default=LEGACY_CHAIN_KEY, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="financialauditlog",
+            name="chain_seq",
+            field=models.PositiveBigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="financialauditlog",
+            name="prev_hash",
+            field=models.CharField(default="", max_length=128),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_legacy_chain, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="financialauditlog",
+            constraint=models.UniqueConstraint(fields=("chain_key", "chain_seq"), name="uq_fin_audit_chain_seq"),
+        ),
+    ]
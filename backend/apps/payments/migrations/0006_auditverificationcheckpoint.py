@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0005_audit_chain_shards"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditVerificationCheckpoint",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("last_log_id", models.PositiveBigIntegerField()),
+                ("last_anchor_id", models.PositiveBigIntegerField(default=0)),
+                ("last_anchor_hash", models.CharField(max_length=128)),
+                ("rows_verified", models.PositiveBigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_auditverificationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('client_funds', 'Client funds'), ('escrow_held', 'Escrow held'), ('platform_revenue', 'Platform revenue'), ('freelancer_payable', 'Freelancer payable')], max_length=32)),
+                ('balance', models.BigIntegerField(default=0)),
+                ('debits', models.PositiveBigIntegerField(default=0)),
+                ('credits', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('escrow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_accounts', to='payments.escrow')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('credit_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='credit_postings', to='payments.ledgeraccount')),
+                ('debit_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='debit_postings', to='payments.ledgeraccount')),
+                ('entry', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='posting', to='payments.ledgerentry')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ledgeraccount',
+            constraint=models.UniqueConstraint(fields=('escrow', 'kind'), name='uq_ledger_account_escrow_kind'),
+        ),
+    ]
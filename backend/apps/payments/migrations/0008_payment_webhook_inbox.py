@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_ledger_accounts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_id', models.CharField(max_length=128)),
+                ('body_digest', models.CharField(max_length=64, unique=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('dead', 'Dead')], default='pending', max_length=16)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='idx_webhook_inbox_due'), models.Index(fields=['invoice_id', '-created_at'], name='idx_webhook_inbox_invoice')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_idempotency_reservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='invoice_id',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('creating', 'Creating invoice'), ('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed')], default='pending', max_length=16),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_payment_creating_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentInvoiceArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qr_text', models.TextField(blank=True, default='')),
+                ('qr_image', models.TextField(blank=True, default='')),
+                ('invoice_url', models.CharField(blank=True, default='', max_length=500)),
+                ('short_url', models.CharField(blank=True, default='', max_length=500)),
+                ('urls', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_artifact', to='payments.payment')),
+            ],
+        ),
+    ]
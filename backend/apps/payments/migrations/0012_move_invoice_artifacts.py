@@ -0,0 +1,73 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 500
+# raw_response key -> PaymentInvoiceArtifact field
+ARTIFACT_FIELDS = {
+    "qr_text": "qr_text",
+    "qr_image": "qr_image",
+    "invoice_url": "invoice_url",
+    "qPay_shortUrl": "short_url",
+    "urls": "urls",
+}
+
+
+def move_artifacts(apps, schema_editor):
+    """Copy QR data into PaymentInvoiceArtifact and strip it from raw_response, one committed batch at a time."""
+    Payment = apps.get_model("payments", "Payment")
+    PaymentInvoiceArtifact = apps.get_model("payments", "PaymentInvoiceArtifact")
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Payment.objects.select_for_update()
+                .filter(raw_response__has_any_keys=list(ARTIFACT_FIELDS))
+                .only("id", "raw_response")[:BATCH_SIZE]
+            )
+            if not batch:
+                return
+            artifacts = []
+            for payment in batch:
+                raw = dict(payment.raw_response)
+                values = {field: raw.pop(key) or _empty(field) for key, field in ARTIFACT_FIELDS.items() if key in raw}
+                artifacts.append(PaymentInvoiceArtifact(payment_id=payment.id, **values))
+                payment.raw_response = raw
+            PaymentInvoiceArtifact.objects.bulk_create(artifacts, ignore_conflicts=True)
+            Payment.objects.bulk_update(batch, ["raw_response"])
+
+
+def restore_artifacts(apps, schema_editor):
+    Payment = apps.get_model("payments", "Payment")
+    PaymentInvoiceArtifact = apps.get_model("payments", "PaymentInvoiceArtifact")
+
+    while True:
+        with transaction.atomic():
+            batch = list(PaymentInvoiceArtifact.objects.select_related("payment").order_by("id")[:BATCH_SIZE])
+            if not batch:
+                return
+            payments = []
+            for artifact in batch:
+                payment = artifact.payment
+                payment.raw_response = {
+                    **(payment.raw_response or {}),
+                    **{key: getattr(artifact, field) for key, field in ARTIFACT_FIELDS.items()},
+                }
+                payments.append(payment)
+            Payment.objects.bulk_update(payments, ["raw_response"])
+            PaymentInvoiceArtifact.objects.filter(id__in=[artifact.id for artifact in batch]).delete()
+
+
+def _empty(field: str):
+    return [] if field == "urls" else ""
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so a large payments table is never locked as a whole.
+    atomic = False
+
+    dependencies = [
+        ("payments", "0011_payment_invoice_artifact"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_artifacts, restore_artifacts),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0012_move_invoice_artifacts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=64)),
+                ('gross_volume', models.PositiveBigIntegerField(default=0)),
+                ('deposits', models.PositiveIntegerField(default=0)),
+                ('platform_fees', models.PositiveBigIntegerField(default=0)),
+                ('releases', models.PositiveBigIntegerField(default=0)),
+                ('refunds', models.PositiveBigIntegerField(default=0)),
+                ('disputes', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'category'), name='uq_revenue_rollup_day_category')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0013_revenue_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
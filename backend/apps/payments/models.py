@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.db import models
 from django.db.models import Q
+from django.utils import timezone
 
 from apps.projects.models import Project
 
@@ -64,12 +65,69 @@ class LedgerEntry(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+class LedgerAccount(models.Model):
+    """Running balance of one side of an escrow's double-entry ledger (debits positive)."""
+
+    KIND_CLIENT_FUNDS = "client_funds"
+    KIND_ESCROW_HELD = "escrow_held"
+    KIND_PLATFORM_REVENUE = "platform_revenue"
+    KIND_FREELANCER_PAYABLE = "freelancer_payable"
+
+    KIND_CHOICES = (
+        (KIND_CLIENT_FUNDS, "Client funds"),
+        (KIND_ESCROW_HELD, "Escrow held"),
+        (KIND_PLATFORM_REVENUE, "Platform revenue"),
+        (KIND_FREELANCER_PAYABLE, "Freelancer payable"),
+    )
+
+    escrow = models.ForeignKey(Escrow, on_delete=models.CASCADE, related_name="ledger_accounts")
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    balance = models.BigIntegerField(default=0)
+    debits = models.PositiveBigIntegerField(default=0)
+    credits = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["escrow", "kind"], name="uq_ledger_account_escrow_kind"),
+        ]
+
+
+class LedgerPosting(models.Model):
+    entry = models.OneToOneField(LedgerEntry, on_delete=models.CASCADE, related_name="posting")
+    debit_account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name="debit_postings")
+    credit_account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name="credit_postings")
+    amount = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class RevenueRollup(models.Model):
+    """Per-day, per-category ledger totals, kept current by ``post_ledger_entry`` for admin reporting."""
+
+    day = models.DateField()
+    category = models.CharField(max_length=64)
+    gross_volume = models.PositiveBigIntegerField(default=0)
+    deposits = models.PositiveIntegerField(default=0)
+    platform_fees = models.PositiveBigIntegerField(default=0)
+    releases = models.PositiveBigIntegerField(default=0)
+    refunds = models.PositiveBigIntegerField(default=0)
+    disputes = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "category"], name="uq_revenue_rollup_day_category"),
+        ]
+
+
 class Payment(models.Model):
+    STATUS_CREATING = "creating"
     STATUS_PENDING = "pending"
     STATUS_PAID = "paid"
     STATUS_FAILED = "failed"
 
     STATUS_CHOICES = (
+        (STATUS_CREATING, "Creating invoice"),
         (STATUS_PENDING, "Pending"),
         (STATUS_PAID, "Paid"),
         (STATUS_FAILED, "Failed"),
@@ -77,11 +135,14 @@ class Payment(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="payments")
-    invoice_id = models.CharField(max_length=128, unique=True)
+    # Null while an async checkout waits for its QPay invoice; NULLs do not collide on unique.
+    invoice_id = models.CharField(max_length=128, unique=True, null=True, blank=True)
     amount = models.PositiveIntegerField()
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
     raw_response = models.JSONField(default=dict)
     paid_at = models.DateTimeField(null=True, blank=True)
+    # Async checkouts only: invoice workers leave the row alone until then (retry backoff).
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -91,6 +152,51 @@ class Payment(models.Model):
         ]
 
 
+class PaymentInvoiceArtifact(models.Model):
+    """QR and deep-link data of a QPay invoice, kept out of ``Payment.raw_response`` and list payloads."""
+
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name="invoice_artifact")
+    qr_text = models.TextField(blank=True, default="")
+    # Base64 PNG as returned by QPay; tens of kilobytes.
+    qr_image = models.TextField(blank=True, default="")
+    invoice_url = models.CharField(max_length=500, blank=True, default="")
+    short_url = models.CharField(max_length=500, blank=True, default="")
+    urls = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class PaymentWebhookInbox(models.Model):
+    """Signed QPay callback waiting for a worker; ``next_attempt_at`` doubles as the claim lease."""
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_DEAD = "dead"
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_DONE, "Done"),
+        (STATUS_DEAD, "Dead"),
+    )
+
+    invoice_id = models.CharField(max_length=128)
+    body_digest = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="idx_webhook_inbox_due"),
+            models.Index(fields=["invoice_id", "-created_at"], name="idx_webhook_inbox_invoice"),
+        ]
+
+
 class Dispute(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="disputes")
     raised_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="disputes")
@@ -110,9 +216,19 @@ class Dispute(models.Model):
 
 
 class IdempotencyKey(models.Model):
+    STATE_PENDING = "pending"
+    STATE_COMPLETED = "completed"
+
+    STATE_CHOICES = (
+        (STATE_PENDING, "Pending"),
+        (STATE_COMPLETED, "Completed"),
+    )
+
     actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys")
     endpoint = models.CharField(max_length=128)
     key = models.CharField(max_length=128)
+    state = models.CharField(max_length=16, choices=STATE_CHOICES, default=STATE_COMPLETED)
+    reserved_at = models.DateTimeField(null=True, blank=True)
     response_hash = models.CharField(max_length=64)
     response_body = models.JSONField(default=dict)
     status_code = models.PositiveSmallIntegerField(default=200)
@@ -146,10 +262,16 @@ class FinancialAuditLog(models.Model):
     before_state = models.JSONField(default=dict)
     after_state = models.JSONField(default=dict)
     reason = models.TextField(blank=True)
+    chain_key = models.CharField(max_length=64)
+    chain_seq = models.PositiveBigIntegerField()
+    prev_hash = models.CharField(max_length=128)
     hash_chain = models.CharField(max_length=128)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["chain_key", "chain_seq"], name="uq_fin_audit_chain_seq"),
+        ]
         indexes = [
             models.Index(fields=["entity_type", "entity_id", "-created_at"], name="idx_fin_audit_entity_created"),
         ]
@@ -161,3 +283,46 @@ class FinancialAuditLog(models.Model):
 
     def delete(self, *args, **kwargs):
         raise ValidationError("FinancialAuditLog is immutable and cannot be deleted.")
+
+
+class AuditChainHead(models.Model):
+    """Tip of one audit shard; its row lock orders appends to that shard only."""
+
+    chain_key = models.CharField(max_length=64, primary_key=True)
+    seq = models.PositiveBigIntegerField(default=0)
+    last_hash = models.CharField(max_length=128)
+    anchored_seq = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class FinancialAuditAnchor(models.Model):
+    """Merkle root over the shard heads that advanced since the previous anchor."""
+
+    merkle_root = models.CharField(max_length=64)
+    prev_hash = models.CharField(max_length=128)
+    hash_chain = models.CharField(max_length=128)
+    leaves = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["prev_hash"], name="uq_fin_audit_anchor_prev"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValidationError("FinancialAuditAnchor is immutable and cannot be updated.")
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("FinancialAuditAnchor is immutable and cannot be deleted.")
+
+
+class AuditVerificationCheckpoint(models.Model):
+    """Verified prefix of the audit log and anchor chain, so later runs only check what is new."""
+
+    last_log_id = models.PositiveBigIntegerField()
+    last_anchor_id = models.PositiveBigIntegerField(default=0)
+    last_anchor_hash = models.CharField(max_length=128)
+    rows_verified = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -1,7 +1,8 @@
 """Payments serializers."""
+from django.urls import reverse
 from rest_framework import serializers
 
-from .models import Dispute, Escrow, LedgerEntry, Payment
+from .models import Dispute, Escrow, LedgerAccount, LedgerEntry, LedgerPosting, Payment
 
 
 class EscrowSerializer(serializers.ModelSerializer):
@@ -18,6 +19,24 @@ class LedgerEntrySerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "escrow", "created_at")
 
 
+class LedgerAccountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LedgerAccount
+        fields = ("id", "kind", "balance", "debits", "credits", "updated_at")
+        read_only_fields = fields
+
+
+class LedgerPostingSerializer(serializers.ModelSerializer):
+    entry_type = serializers.CharField(source="entry.entry_type", read_only=True)
+    debit = serializers.CharField(source="debit_account.kind", read_only=True)
+    credit = serializers.CharField(source="credit_account.kind", read_only=True)
+
+    class Meta:
+        model = LedgerPosting
+        fields = ("id", "entry", "entry_type", "debit", "credit", "amount", "created_at")
+        read_only_fields = fields
+
+
 class DisputeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Dispute
@@ -35,7 +54,11 @@ class DisputeSerializer(serializers.ModelSerializer):
 
 
 class PaymentSerializer(serializers.ModelSerializer):
+    """List/status shape; QR data is served by ``payment-invoice-artifact`` and the raw QPay payloads stay internal."""
+
     escrow_status = serializers.SerializerMethodField()
+    failure_reason = serializers.SerializerMethodField()
+    invoice_artifact_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Payment
@@ -45,7 +68,8 @@ class PaymentSerializer(serializers.ModelSerializer):
             "invoice_id",
             "amount",
             "status",
-            "raw_response",
+            "failure_reason",
+            "invoice_artifact_url",
             "created_at",
             "paid_at",
             "escrow_status",
@@ -56,6 +80,14 @@ class PaymentSerializer(serializers.ModelSerializer):
         escrow = getattr(obj.project, "escrow", None)
         return getattr(escrow, "status", None)
 
+    def get_failure_reason(self, obj: Payment):
+        return (obj.raw_response or {}).get("failure_reason")
+
+    def get_invoice_artifact_url(self, obj: Payment):
+        if not obj.invoice_id:
+            return None
+        return reverse("payment-invoice-artifact", kwargs={"payment_id": obj.id})
+
 
 class PaymentCreateSerializer(serializers.Serializer):
     project_id = serializers.IntegerField(min_value=1)
@@ -1,6 +1,6 @@
 """Payments service exports."""
+from .audit_service import anchor_audit_chains, record_financial_event
 from .escrow_service import (
-    _build_hash_chain,
     approve_escrow,
     calculate_commission,
     confirm_completion,
@@ -12,21 +12,45 @@ from .escrow_service import (
     resolve_dispute,
     submit_result,
 )
-from .qpay_service import authenticate, create_invoice, verify_webhook
+from .invoice_artifacts import invoice_artifact_payload, slim_invoice_response, store_invoice_artifact
+from .invoice_service import create_pending_invoices, request_invoice
+from .ledger_service import escrow_balances, is_escrow_funded, record_ledger_entry
+from .qpay_service import authenticate, authenticate_webhook, create_invoice, verify_webhook
+from .reconciliation import reconcile_pending_payments
+from .status_events import subscribe_payment_status, unsubscribe_payment_status
+from .webhook_cache import known_final_status, webhook_verification_stats
+from .webhook_inbox import enqueue_webhook, process_webhook_inbox
 
 __all__ = [
-    "_build_hash_chain",
+    "anchor_audit_chains",
     "approve_escrow",
     "authenticate",
+    "authenticate_webhook",
     "calculate_commission",
     "confirm_completion",
     "create_dispute",
     "create_invoice",
+    "create_pending_invoices",
     "deposit_to_escrow",
+    "enqueue_webhook",
+    "escrow_balances",
     "expire_stale_pending_payments",
+    "invoice_artifact_payload",
+    "is_escrow_funded",
+    "known_final_status",
     "mark_payment_failed",
     "mark_payment_paid_and_hold_escrow",
+    "process_webhook_inbox",
+    "reconcile_pending_payments",
+    "record_financial_event",
+    "record_ledger_entry",
+    "request_invoice",
     "resolve_dispute",
+    "slim_invoice_response",
+    "store_invoice_artifact",
     "submit_result",
+    "subscribe_payment_status",
+    "unsubscribe_payment_status",
     "verify_webhook",
+    "webhook_verification_stats",
 ]
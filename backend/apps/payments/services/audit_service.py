@@ -0,0 +1,133 @@
+"""Sharded financial audit chains and the Merkle anchors that tie them together."""
+import hashlib
+import json
+
+from django.db import transaction
+from django.db.models import F
+
+from apps.payments.models import AuditChainHead, FinancialAuditAnchor, FinancialAuditLog
+
+GENESIS_HASH = "GENESIS"
+# Rows written before sharding form one chain under this key and hash the bare event payload.
+LEGACY_CHAIN_KEY = "global"
+ANCHOR_BATCH_SIZE = 1000
+
+
+def chain_key_for(entity_type: str, entity_id: int) -> str:
+    return f"{entity_type}:{entity_id}"
+
+
+def canonical_json(payload: dict) -> str:
+    return json.dumps(payload, sort_keys=True, default=str)
+
+
+def audit_payload(entry: FinancialAuditLog) -> dict:
+    payload = {
+        "actor_id": entry.actor_id,
+        "action_type": entry.action_type,
+        "entity_type": entry.entity_type,
+        "entity_id": entry.entity_id,
+        "before_state": entry.before_state,
+        "after_state": entry.after_state,
+        "reason": entry.reason,
+    }
+    if entry.chain_key != LEGACY_CHAIN_KEY:
+        payload["chain_key"] = entry.chain_key
+        payload["chain_seq"] = entry.chain_seq
+    return payload
+
+
+def link_hash(prev_hash: str, payload: dict) -> str:
+    return hashlib.sha256(f"{prev_hash}:{canonical_json(payload)}".encode("utf-8")).hexdigest()
+
+
+@transaction.atomic
+def record_financial_event(
+    *,
+    actor,
+    action_type: str,
+    entity_type: str,
+    entity_id: int,
+    before_state: dict,
+    after_state: dict,
+    reason: str,
+) -> FinancialAuditLog:
+    """Append an event to its entity's chain; only writers on the same entity wait for each other."""
+    chain_key = chain_key_for(entity_type, entity_id)
+    head, _created = AuditChainHead.objects.select_for_update().get_or_create(
+        chain_key=chain_key,
+        defaults={"last_hash": GENESIS_HASH},
+    )
+    entry = FinancialAuditLog(
+        actor=actor,
+        action_type=action_type,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        before_state=before_state,
+        after_state=after_state,
+        reason=reason,
+        chain_key=chain_key,
+        chain_seq=head.seq + 1,
+        prev_hash=head.last_hash,
+    )
+    entry.hash_chain = link_hash(entry.prev_hash, audit_payload(entry))
+    entry.save()
+
+    head.seq = entry.chain_seq
+    head.last_hash = entry.hash_chain
+    head.save(update_fields=["seq", "last_hash", "updated_at"])
+    return entry
+
+
+def merkle_leaf(chain_key: str, seq: int, head_hash: str) -> str:
+    return hashlib.sha256(f"leaf:{chain_key}:{seq}:{head_hash}".encode("utf-8")).hexdigest()
+
+
+def merkle_root(leaves: list[str]) -> str:
+    if not leaves:
+        return hashlib.sha256(b"empty").hexdigest()
+    level = list(leaves)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [
+            hashlib.sha256(f"node:{level[index]}{level[index + 1]}".encode("utf-8")).hexdigest()
+            for index in range(0, len(level), 2)
+        ]
+    return level[0]
+
+
+def anchor_hash(prev_hash: str, root: str) -> str:
+    return hashlib.sha256(f"{prev_hash}:{root}".encode("utf-8")).hexdigest()
+
+
+@transaction.atomic
+def anchor_audit_chains() -> FinancialAuditAnchor | None:
+    """Record a Merkle root over every shard head that advanced since the last anchor.
+
+    Anchors chain to each other and ``prev_hash`` is unique, so two concurrent runs cannot
+    fork the anchor sequence: the loser fails and its heads stay pending for the next run.
+    """
+    heads = list(
+        AuditChainHead.objects.filter(seq__gt=F("anchored_seq"))
+        .order_by("chain_key")
+        .values_list("chain_key", "seq", "last_hash")
+    )
+    if not heads:
+        return None
+
+    previous = FinancialAuditAnchor.objects.order_by("-id").values_list("hash_chain", flat=True).first()
+    prev_hash = previous or GENESIS_HASH
+    root = merkle_root([merkle_leaf(*head) for head in heads])
+    anchor = FinancialAuditAnchor.objects.create(
+        merkle_root=root,
+        prev_hash=prev_hash,
+        hash_chain=anchor_hash(prev_hash, root),
+        leaves=[[chain_key, seq] for chain_key, seq, _hash in heads],
+    )
+    AuditChainHead.objects.bulk_update(
+        [AuditChainHead(chain_key=chain_key, anchored_seq=seq) for chain_key, seq, _hash in heads],
+        ["anchored_seq"],
+        batch_size=ANCHOR_BATCH_SIZE,
+    )
+    return anchor
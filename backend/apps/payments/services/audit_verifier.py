@@ -0,0 +1,234 @@
+"""Streaming, parallel verification of the financial audit chains and their anchors."""
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+from types import SimpleNamespace
+
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from apps.payments.models import AuditVerificationCheckpoint, FinancialAuditAnchor, FinancialAuditLog
+from apps.payments.services.audit_service import (
+    GENESIS_HASH,
+    anchor_hash,
+    audit_payload,
+    link_hash,
+    merkle_leaf,
+    merkle_root,
+)
+
+SEGMENT_SIZE = 5000
+CHECKPOINT_EVERY = 100_000
+SETTLE_SECONDS = 300
+LEAF_BATCH_SIZE = 500
+
+VERIFY_FIELDS = (
+    "id",
+    "actor_id",
+    "action_type",
+    "entity_type",
+    "entity_id",
+    "before_state",
+    "after_state",
+    "reason",
+    "chain_key",
+    "chain_seq",
+    "prev_hash",
+    "hash_chain",
+    "stored_prev_hash",
+)
+
+
+@dataclass
+class BrokenLink:
+    record: str
+    record_id: int
+    chain_key: str
+    chain_seq: int | None
+    reason: str
+
+
+@dataclass
+class VerificationReport:
+    rows_verified: int = 0
+    anchors_verified: int = 0
+    segments: int = 0
+    workers: int = 1
+    start_after_id: int = 0
+    last_log_id: int = 0
+    elapsed_seconds: float = 0.0
+    broken: BrokenLink | None = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_verified / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def verify_segment(rows: list[tuple]) -> BrokenLink | None:
+    """Check a run of audit rows; each row carries the stored hash of its predecessor in the chain."""
+    for row in rows:
+        entry = SimpleNamespace(**dict(zip(VERIFY_FIELDS, row)))
+        reason = _link_error(entry)
+        if reason:
+            return BrokenLink("log", entry.id, entry.chain_key, entry.chain_seq, reason)
+    return None
+
+
+def verify_audit_log(
+    *,
+    resume: bool = False,
+    workers: int = 1,
+    segment_size: int = SEGMENT_SIZE,
+    checkpoint_every: int = CHECKPOINT_EVERY,
+    settle_seconds: int = SETTLE_SECONDS,
+    progress=None,
+) -> VerificationReport:
+    """Verify every audit row and anchor written more than ``settle_seconds`` ago.
+
+    Rows stream through a server-side cursor in id order and are checked in segments on a
+    process pool (``workers`` > 1). Results are consumed in order, so the report names the
+    first broken link by id. Checkpoints are only written for a verified prefix; ``resume``
+    continues after the latest one.
+    """
+    started = time.monotonic()
+    checkpoint = AuditVerificationCheckpoint.objects.order_by("-id").first() if resume else None
+    report = VerificationReport(workers=workers, start_after_id=checkpoint.last_log_id if checkpoint else 0)
+    report.last_log_id = report.start_after_id
+    anchor_id = checkpoint.last_anchor_id if checkpoint else 0
+    anchor_prev = checkpoint.last_anchor_hash if checkpoint else GENESIS_HASH
+
+    # Ids are allocated before commit; stopping at rows that have settled keeps a concurrent
+    # writer's lower id from landing behind a checkpoint.
+    cutoff = timezone.now() - timezone.timedelta(seconds=settle_seconds)
+    upper_id = (
+        FinancialAuditLog.objects.filter(created_at__lte=cutoff).order_by("-id").values_list("id", flat=True).first()
+    ) or report.start_after_id
+
+    rows_since_checkpoint = 0
+    for segment_last_id, segment_rows, broken in _verify_stream(report.start_after_id, upper_id, workers, segment_size):
+        report.segments += 1
+        if broken is not None:
+            report.broken = broken
+            break
+        report.rows_verified += segment_rows
+        report.last_log_id = segment_last_id
+        rows_since_checkpoint += segment_rows
+        if progress:
+            progress(report)
+        if rows_since_checkpoint >= checkpoint_every:
+            _save_checkpoint(report, anchor_id, anchor_prev)
+            rows_since_checkpoint = 0
+
+    if report.broken is None:
+        anchor_id, anchor_prev = _verify_anchors(report, anchor_id, anchor_prev, cutoff)
+    if report.broken is None and (report.rows_verified or report.anchors_verified):
+        _save_checkpoint(report, anchor_id, anchor_prev)
+    report.elapsed_seconds = time.monotonic() - started
+    return report
+
+
+def _link_error(entry) -> str | None:
+    if entry.chain_seq == 1:
+        if entry.prev_hash != GENESIS_HASH:
+            return "first link does not start from GENESIS"
+    elif entry.stored_prev_hash is None:
+        return f"link {entry.chain_seq - 1} is missing"
+    elif entry.stored_prev_hash != entry.prev_hash:
+        return "prev_hash does not match the previous link"
+    if link_hash(entry.prev_hash, audit_payload(entry)) != entry.hash_chain:
+        return "hash_chain does not match the entry contents"
+    return None
+
+
+def _stream_rows(start_after_id: int, upper_id: int):
+    previous_link = FinancialAuditLog.objects.filter(
+        chain_key=OuterRef("chain_key"),
+        chain_seq=OuterRef("chain_seq") - 1,
+    ).values("hash_chain")[:1]
+    return (
+        FinancialAuditLog.objects.filter(id__gt=start_after_id, id__lte=upper_id)
+        .order_by("id")
+        .annotate(stored_prev_hash=Subquery(previous_link))
+        .values_list(*VERIFY_FIELDS)
+    )
+
+
+def _segments(start_after_id: int, upper_id: int, segment_size: int):
+    segment = []
+    for row in _stream_rows(start_after_id, upper_id).iterator(chunk_size=segment_size):
+        segment.append(row)
+        if len(segment) >= segment_size:
+            yield segment
+            segment = []
+    if segment:
+        yield segment
+
+
+def _verify_stream(start_after_id: int, upper_id: int, workers: int, segment_size: int):
+    """Yield ``(last_id, row_count, broken)`` per segment, in id order."""
+    if workers <= 1:
+        for segment in _segments(start_after_id, upper_id, segment_size):
+            yield segment[-1][0], len(segment), verify_segment(segment)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        pending = deque()
+        for segment in _segments(start_after_id, upper_id, segment_size):
+            pending.append((segment[-1][0], len(segment), pool.submit(verify_segment, segment)))
+            # Bound the rows held in memory to a couple of segments per worker.
+            while len(pending) >= workers * 2:
+                last_id, count, future = pending.popleft()
+                yield last_id, count, future.result()
+        while pending:
+            last_id, count, future = pending.popleft()
+            yield last_id, count, future.result()
+
+
+def _setup_worker() -> None:
+    import django
+
+    django.setup()
+
+
+def _verify_anchors(report: VerificationReport, anchor_id: int, anchor_prev: str, cutoff) -> tuple[int, str]:
+    anchors = FinancialAuditAnchor.objects.filter(id__gt=anchor_id, created_at__lte=cutoff).order_by("id")
+    for anchor in anchors.iterator(chunk_size=100):
+        reason = _anchor_error(anchor, anchor_prev)
+        if reason:
+            report.broken = BrokenLink("anchor", anchor.id, "", None, reason)
+            break
+        report.anchors_verified += 1
+        anchor_id, anchor_prev = anchor.id, anchor.hash_chain
+    return anchor_id, anchor_prev
+
+
+def _anchor_error(anchor: FinancialAuditAnchor, expected_prev: str) -> str | None:
+    if anchor.prev_hash != expected_prev:
+        return "prev_hash does not match the previous anchor"
+    if anchor.hash_chain != anchor_hash(anchor.prev_hash, anchor.merkle_root):
+        return "hash_chain does not match the anchor root"
+    leaves = []
+    for offset in range(0, len(anchor.leaves), LEAF_BATCH_SIZE):
+        batch = anchor.leaves[offset:offset + LEAF_BATCH_SIZE]
+        condition = reduce(or_, (Q(chain_key=chain_key, chain_seq=seq) for chain_key, seq in batch))
+        rows = FinancialAuditLog.objects.filter(condition).values_list("chain_key", "chain_seq", "hash_chain")
+        hashes = {(chain_key, seq): hash_chain for chain_key, seq, hash_chain in rows}
+        for chain_key, seq in batch:
+            if (chain_key, seq) not in hashes:
+                return f"anchored link {chain_key}#{seq} is missing"
+            leaves.append(merkle_leaf(chain_key, seq, hashes[(chain_key, seq)]))
+    if merkle_root(leaves) != anchor.merkle_root:
+        return "merkle_root does not match the anchored links"
+    return None
+
+
+def _save_checkpoint(report: VerificationReport, anchor_id: int, anchor_prev: str) -> None:
+    AuditVerificationCheckpoint.objects.create(
+        last_log_id=report.last_log_id,
+        last_anchor_id=anchor_id,
+        last_anchor_hash=anchor_prev,
+        rows_verified=report.rows_verified,
+    )
@@ -1,13 +1,18 @@
 """Escrow and payment domain services."""
-import hashlib
-import json
 from decimal import Decimal, ROUND_HALF_UP
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Case, F, JSONField, Value, When
+from django.db.models.expressions import CombinedExpression
 from django.utils import timezone
 
-from common.cache_utils import bump_admin_resource_version, bump_project_version
+from common.cache_utils import (
+    bump_admin_resource_version,
+    bump_payment_status_version,
+    bump_project_list_facets,
+    bump_project_version,
+)
 from common.exceptions import DomainError
 from common.models import PlatformSetting
 from common.state_guards import guard_escrow_transition, guard_project_transition
@@ -15,9 +20,15 @@ from apps.projects.models import Project
 from apps.projects.models import ProjectDeliverable
 
 from apps.payments.models import Dispute, Escrow, FinancialAuditLog, LedgerEntry, Payment
+from apps.payments.services.audit_service import record_financial_event
+from apps.payments.services.ledger_service import is_escrow_funded, record_ledger_entry
+from apps.payments.services.revenue_rollups import record_dispute_rollup
+from apps.payments.services.status_events import publish_payment_status_change
+from apps.payments.services.webhook_cache import remember_final_status
 
 
 COMMISSION_RATE = Decimal("0.12")
+EXPIRY_CHUNK_SIZE = 500
 
 
 def calculate_commission(amount: int) -> tuple[int, int]:
@@ -55,12 +66,6 @@ def _serialize_project(project: Project) -> dict:
     }
 
 
-def _build_hash_chain(payload: dict) -> str:
-    previous = FinancialAuditLog.objects.order_by("-id").values_list("hash_chain", flat=True).first() or "GENESIS"
-    raw = f"{previous}:{json.dumps(payload, sort_keys=True, default=str)}".encode("utf-8")
-    return hashlib.sha256(raw).hexdigest()
-
-
 def _log_financial_event(
     *,
     actor,
@@ -71,16 +76,7 @@ def _log_financial_event(
     after_state: dict,
     reason: str,
 ) -> None:
-    payload = {
-        "actor_id": getattr(actor, "id", None),
-        "action_type": action_type,
-        "entity_type": entity_type,
-        "entity_id": entity_id,
-        "before_state": before_state,
-        "after_state": after_state,
-        "reason": reason,
-    }
-    FinancialAuditLog.objects.create(
+    record_financial_event(
         actor=actor,
         action_type=action_type,
         entity_type=entity_type,
@@ -88,10 +84,13 @@ def _log_financial_event(
         before_state=before_state,
         after_state=after_state,
         reason=reason,
-        hash_chain=_build_hash_chain(payload),
     )
 
 
+def _failure_reason(reason: str) -> Value:
+    return Value({"failure_reason": reason}, output_field=JSONField())
+
+
 @transaction.atomic
 def deposit_to_escrow(project: Project, actor, amount: int | None = None) -> Escrow:
     project = _lock_project(project)
@@ -109,7 +108,7 @@ def deposit_to_escrow(project: Project, actor, amount: int | None = None) -> Esc
         raise DomainError("Deposit amount must be positive.")
 
     escrow, created = Escrow.objects.select_for_update().get_or_create(project=project, defaults={"amount": 0})
-    if not created and escrow.ledger_entries.filter(entry_type=LedgerEntry.TYPE_DEPOSIT).exists():
+    if not created and is_escrow_funded(escrow):
         raise DomainError("Escrow is already funded.")
     if escrow.status in {Escrow.STATUS_RELEASED, Escrow.STATUS_REFUNDED}:
         raise DomainError("Escrow is already closed.")
@@ -122,7 +121,7 @@ def deposit_to_escrow(project: Project, actor, amount: int | None = None) -> Esc
         guard_escrow_transition(escrow.status, Escrow.STATUS_CREATED)
     escrow.status = Escrow.STATUS_CREATED
     escrow.save(update_fields=["amount", "platform_fee_amount", "freelancer_amount", "status", "updated_at"])
-    LedgerEntry.objects.create(
+    record_ledger_entry(
         escrow=escrow,
         entry_type=LedgerEntry.TYPE_DEPOSIT,
         amount=deposit_amount,
@@ -186,6 +185,10 @@ def mark_payment_paid_and_hold_escrow(*, invoice_id: str, paid_amount: int, veri
             "verification": verification_payload or {},
         }
         payment.save(update_fields=["status", "raw_response"])
+        bump_payment_status_version(payment.project_id)
+        publish_payment_status_change(payment.project_id)
+        remember_final_status(payment.invoice_id, payment.status)
+        bump_admin_resource_version("payments")
         return payment
 
     payment.status = Payment.STATUS_PAID
@@ -222,8 +225,8 @@ def mark_payment_paid_and_hold_escrow(*, invoice_id: str, paid_amount: int, veri
 
     escrow.save(update_fields=["amount", "platform_fee_amount", "freelancer_amount", "status", "updated_at"])
 
-    if not escrow.ledger_entries.filter(entry_type=LedgerEntry.TYPE_DEPOSIT).exists():
-        LedgerEntry.objects.create(
+    if not is_escrow_funded(escrow):
+        record_ledger_entry(
             escrow=escrow,
             entry_type=LedgerEntry.TYPE_DEPOSIT,
             amount=payment.amount,
@@ -245,6 +248,11 @@ def mark_payment_paid_and_hold_escrow(*, invoice_id: str, paid_amount: int, veri
         reason="QPay webhook verified payment and moved escrow to held",
     )
     bump_project_version(project.id)
+    bump_payment_status_version(project.id)
+    publish_payment_status_change(project.id)
+    remember_final_status(payment.invoice_id, payment.status)
+    if before_project["status"] != project.status:
+        bump_project_list_facets(statuses=(before_project["status"], project.status), categories=(project.category,))
     bump_admin_resource_version("payments")
     bump_admin_resource_version("escrow")
     bump_admin_resource_version("projects")
@@ -263,19 +271,67 @@ def mark_payment_failed(payment: Payment, reason: str, raw_payload: dict | None
         "failure_payload": raw_payload or {},
     }
     payment.save(update_fields=["status", "raw_response"])
+    bump_payment_status_version(payment.project_id)
+    publish_payment_status_change(payment.project_id)
+    remember_final_status(payment.invoice_id, payment.status)
     bump_admin_resource_version("payments")
     return payment
 
 
-@transaction.atomic
-def expire_stale_pending_payments(*, ttl_minutes: int = 30) -> int:
+def expire_stale_pending_payments(
+    *, ttl_minutes: int | None = None, chunk_size: int = EXPIRY_CHUNK_SIZE, progress=None
+) -> int:
+    """Fail pending payments older than ``ttl_minutes``, ``chunk_size`` rows per transaction.
+
+    This does not ask QPay, and a failed payment can no longer be settled, so the TTL
+    (``PAYMENT_EXPIRY_TTL_MINUTES`` by default) must be longer than
+    ``PAYMENT_RECONCILE_TTL_MINUTES``: late payments are settled by reconciliation first,
+    and only invoices QPay could not be asked about in between are failed here. Async checkouts still waiting for an invoice (``creating``) that long are failed too, so
+    a stopped or crashed invoice worker cannot leave a checkout stuck.
+
+    Rows are claimed with ``FOR UPDATE SKIP LOCKED``: a payment that a webhook worker is
+    settling right now is skipped rather than waited on, and each chunk commits (and
+    publishes its status changes) before the next is claimed. Returns the number expired.
+    """
+    ttl_minutes = settings.PAYMENT_EXPIRY_TTL_MINUTES if ttl_minutes is None else ttl_minutes
+    if ttl_minutes <= settings.PAYMENT_RECONCILE_TTL_MINUTES:
+        raise DomainError(
+            f"Expiry TTL must be longer than the reconcile TTL ({settings.PAYMENT_RECONCILE_TTL_MINUTES} minutes)."
+        )
     threshold = timezone.now() - timezone.timedelta(minutes=ttl_minutes)
-    stale = Payment.objects.select_for_update().filter(status=Payment.STATUS_PENDING, created_at__lt=threshold)
-    count = stale.count()
-    stale.update(status=Payment.STATUS_FAILED)
-    if count:
-        bump_admin_resource_version("payments")
-    return count
+    expired_total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Payment.objects.select_for_update(skip_locked=True)
+                .filter(status__in=(Payment.STATUS_PENDING, Payment.STATUS_CREATING), created_at__lt=threshold)
+                .order_by("created_at")
+                .values_list("id", "project_id", "invoice_id")[:chunk_size]
+            )
+            if not rows:
+                return expired_total
+            count = Payment.objects.filter(id__in=[payment_id for payment_id, _project, _invoice in rows]).update(
+                status=Payment.STATUS_FAILED,
+                raw_response=CombinedExpression(
+                    F("raw_response"),
+                    "||",
+                    Case(
+                        When(status=Payment.STATUS_CREATING, then=_failure_reason("invoice_creation_timeout")),
+                        default=_failure_reason("invoice_expired"),
+                    ),
+                ),
+            )
+            for project_id in {project_id for _id, project_id, _invoice in rows}:
+                bump_payment_status_version(project_id)
+                publish_payment_status_change(project_id)
+            for _id, _project, invoice_id in rows:
+                remember_final_status(invoice_id, Payment.STATUS_FAILED)
+            bump_admin_resource_version("payments")
+        expired_total += count
+        if progress:
+            progress(expired_total)
+        if len(rows) < chunk_size:
+            return expired_total
 
 
 @transaction.atomic
@@ -291,9 +347,11 @@ def submit_result(project: Project, submitter) -> Project:
         raise DomainError("At least one deliverable is required before submitting result.")
 
     guard_project_transition(project.status, Project.STATUS_AWAITING_REVIEW)
+    previous_status = project.status
     project.status = Project.STATUS_AWAITING_REVIEW
     project.save(update_fields=["status"])
     bump_project_version(project.id)
+    bump_project_list_facets(statuses=(previous_status, project.status), categories=(project.category,))
     bump_admin_resource_version("projects")
     return project
 
@@ -313,7 +371,8 @@ def confirm_completion(project: Project, approved_by) -> Escrow:
     if not project.selected_proposal:
         raise DomainError("Selected proposal is required.")
 
-    platform_setting = PlatformSetting.get_solo()
+    # The fee is booked to the ledger, so read the committed policy rather than a cached copy.
+    platform_setting = PlatformSetting.get_solo(from_db=True)
     expected_amount = project.selected_proposal.price
     if not platform_setting.partial_escrow_mode and escrow.amount != expected_amount:
         raise DomainError("Escrow amount must match selected proposal price.")
@@ -337,13 +396,13 @@ def confirm_completion(project: Project, approved_by) -> Escrow:
     before_escrow = _serialize_escrow(escrow)
     before_project = _serialize_project(project)
 
-    LedgerEntry.objects.create(
+    record_ledger_entry(
         escrow=escrow,
         entry_type=LedgerEntry.TYPE_FEE,
         amount=platform_fee,
         note=f"Platform fee {pct}%",
     )
-    LedgerEntry.objects.create(
+    record_ledger_entry(
         escrow=escrow,
         entry_type=LedgerEntry.TYPE_RELEASE,
         amount=release_amount,
@@ -366,6 +425,7 @@ def confirm_completion(project: Project, approved_by) -> Escrow:
         reason="Client confirmed completion and released escrow",
     )
     bump_project_version(project.id)
+    bump_project_list_facets(statuses=(before_project["status"], project.status), categories=(project.category,))
     bump_admin_resource_version("escrow")
     bump_admin_resource_version("projects")
     return escrow
@@ -397,6 +457,7 @@ def create_dispute(project: Project, raised_by, reason: str, evidence_files: lis
         reason=reason,
         evidence_files=evidence_files,
     )
+    record_dispute_rollup(dispute, project.category)
     _log_financial_event(
         actor=raised_by,
         action_type=FinancialAuditLog.ACTION_DISPUTE,
@@ -407,6 +468,7 @@ def create_dispute(project: Project, raised_by, reason: str, evidence_files: lis
         reason=reason,
     )
     bump_project_version(project.id)
+    bump_project_list_facets(statuses=(before_project["status"], project.status), categories=(project.category,))
     bump_admin_resource_version("escrow")
     bump_admin_resource_version("projects")
     bump_admin_resource_version("disputes")
@@ -432,20 +494,20 @@ def resolve_dispute(dispute: Dispute, action: str, release_amount: int, refund_a
         raise DomainError("Release and refund must add up to escrow amount.")
 
     if action == "release":
-        LedgerEntry.objects.create(escrow=escrow, entry_type=LedgerEntry.TYPE_RELEASE, amount=release_amount)
+        record_ledger_entry(escrow=escrow, entry_type=LedgerEntry.TYPE_RELEASE, amount=release_amount)
         guard_escrow_transition(escrow.status, Escrow.STATUS_RELEASED)
         escrow.status = Escrow.STATUS_RELEASED
         guard_project_transition(dispute.project.status, Project.STATUS_COMPLETED)
         dispute.project.status = Project.STATUS_COMPLETED
     elif action == "refund":
-        LedgerEntry.objects.create(escrow=escrow, entry_type=LedgerEntry.TYPE_REFUND, amount=refund_amount)
+        record_ledger_entry(escrow=escrow, entry_type=LedgerEntry.TYPE_REFUND, amount=refund_amount)
         guard_escrow_transition(escrow.status, Escrow.STATUS_REFUNDED)
         escrow.status = Escrow.STATUS_REFUNDED
         guard_project_transition(dispute.project.status, Project.STATUS_CLOSED_REFUNDED)
         dispute.project.status = Project.STATUS_CLOSED_REFUNDED
     elif action == "split":
-        LedgerEntry.objects.create(escrow=escrow, entry_type=LedgerEntry.TYPE_RELEASE, amount=release_amount)
-        LedgerEntry.objects.create(escrow=escrow, entry_type=LedgerEntry.TYPE_REFUND, amount=refund_amount)
+        record_ledger_entry(escrow=escrow, entry_type=LedgerEntry.TYPE_RELEASE, amount=release_amount)
+        record_ledger_entry(escrow=escrow, entry_type=LedgerEntry.TYPE_REFUND, amount=refund_amount)
         guard_escrow_transition(escrow.status, Escrow.STATUS_RELEASED)
         escrow.status = Escrow.STATUS_RELEASED
         guard_project_transition(dispute.project.status, Project.STATUS_COMPLETED)
@@ -469,6 +531,10 @@ def resolve_dispute(dispute: Dispute, action: str, release_amount: int, refund_a
         reason=note,
     )
     bump_project_version(dispute.project_id)
+    bump_project_list_facets(
+        statuses=(before_project["status"], dispute.project.status),
+        categories=(dispute.project.category,),
+    )
     bump_admin_resource_version("escrow")
     bump_admin_resource_version("projects")
     bump_admin_resource_version("disputes")
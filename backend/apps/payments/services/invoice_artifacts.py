@@ -0,0 +1,34 @@
+"""Keep QPay's QR image and deep links out of ``Payment.raw_response``."""
+from apps.payments.models import Payment, PaymentInvoiceArtifact
+
+# QPay response key -> PaymentInvoiceArtifact field
+ARTIFACT_FIELDS = {
+    "qr_text": "qr_text",
+    "qr_image": "qr_image",
+    "invoice_url": "invoice_url",
+    "qPay_shortUrl": "short_url",
+    "urls": "urls",
+}
+
+
+def slim_invoice_response(data: dict) -> dict:
+    """The QPay invoice response without its artifacts, for ``Payment.raw_response``."""
+    return {key: value for key, value in data.items() if key not in ARTIFACT_FIELDS}
+
+
+def store_invoice_artifact(payment: Payment, data: dict) -> PaymentInvoiceArtifact:
+    values = {field: data.get(key) or ([] if field == "urls" else "") for key, field in ARTIFACT_FIELDS.items()}
+    artifact, _created = PaymentInvoiceArtifact.objects.update_or_create(payment=payment, defaults=values)
+    return artifact
+
+
+def invoice_artifact_payload(payment: Payment, artifact: PaymentInvoiceArtifact | None) -> dict:
+    return {
+        "payment_id": str(payment.id),
+        "invoice_id": payment.invoice_id,
+        "qr_text": artifact.qr_text if artifact else "",
+        "qr_image": artifact.qr_image if artifact else "",
+        "invoice_url": artifact.invoice_url if artifact else "",
+        "short_url": artifact.short_url if artifact else "",
+        "urls": artifact.urls if artifact else [],
+    }
@@ -0,0 +1,141 @@
+"""Create QPay invoices for checkouts accepted in async mode."""
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.payments.models import Payment
+from apps.payments.services.escrow_service import mark_payment_failed
+from apps.payments.services.invoice_artifacts import slim_invoice_response, store_invoice_artifact
+from apps.payments.services.qpay_service import create_invoice
+from apps.payments.services.status_events import publish_payment_status_change
+from common.cache_utils import bump_admin_resource_version, bump_payment_status_version
+from common.circuit_breaker import CircuitOpenError
+from common.exceptions import DomainError
+
+logger = logging.getLogger(__name__)
+
+
+@transaction.atomic
+def request_invoice(*, project, amount: int, callback_url: str) -> Payment:
+    """Record a checkout whose invoice a worker will create."""
+    payment = Payment.objects.create(
+        project=project,
+        amount=amount,
+        status=Payment.STATUS_CREATING,
+        raw_response={"callback_url": callback_url, "invoice_attempts": 0},
+    )
+    bump_payment_status_version(project.id)
+    bump_admin_resource_version("payments")
+    return payment
+
+
+def create_next_invoice(*, exclude_ids=()) -> Payment | None:
+    """Create the invoice for the oldest waiting checkout; returns it, or None when idle.
+
+    The checkout is claimed in a short transaction that leases it for
+    ``PAYMENT_INVOICE_LEASE_SECONDS`` (its ``next_attempt_at``), and QPay is called outside
+    any transaction. The result is stored only while the lease is still ours: a checkout
+    expired or taken over meanwhile is left alone. A worker that dies mid-call leaves the
+    checkout to be retried when the lease runs out, under the same ``sender_invoice_no``.
+    """
+    with transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("project")
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()), status=Payment.STATUS_CREATING)
+            .exclude(id__in=list(exclude_ids))
+            .order_by("created_at")
+            .first()
+        )
+        if payment is None:
+            return None
+        _retry_after(payment, settings.PAYMENT_INVOICE_LEASE_SECONDS)
+
+    raw = payment.raw_response or {}
+    invoice = error = None
+    try:
+        invoice = create_invoice(
+            project=payment.project,
+            amount=payment.amount,
+            callback_url=raw.get("callback_url"),
+            sender_invoice_no=f"PAYMENT-{payment.id}",
+        )
+    except (CircuitOpenError, DomainError, requests.RequestException) as exc:
+        error = exc
+
+    with transaction.atomic():
+        locked = Payment.objects.select_for_update().get(id=payment.id)
+        if locked.status != Payment.STATUS_CREATING or locked.next_attempt_at != payment.next_attempt_at:
+            logger.warning(
+                "Payment %s was expired or taken over during its QPay call; invoice %s left unused",
+                payment.id,
+                invoice.invoice_id if invoice else None,
+            )
+            return locked
+        if isinstance(error, CircuitOpenError):
+            # Nothing reached QPay, so the checkout keeps its attempt budget for when it recovers.
+            logger.info("Invoice for payment %s deferred: %s", payment.id, error)
+            return _retry_after(locked, error.retry_after)
+        if error is not None:
+            return _record_failure(locked, error)
+
+        locked.invoice_id = invoice.invoice_id
+        locked.status = Payment.STATUS_PENDING
+        locked.next_attempt_at = None
+        locked.raw_response = slim_invoice_response(invoice.raw_response)
+        locked.save(update_fields=["invoice_id", "status", "next_attempt_at", "raw_response"])
+        store_invoice_artifact(locked, invoice.raw_response)
+        bump_payment_status_version(locked.project_id)
+        publish_payment_status_change(locked.project_id)
+        bump_admin_resource_version("payments")
+        return locked
+
+
+def create_pending_invoices() -> dict[str, int]:
+    """One pass over due checkouts; a failed one waits out its backoff (``next_attempt_at``) before the next try."""
+    counts = {"created": 0, "retrying": 0, "failed": 0}
+    attempted = set()
+    while True:
+        payment = create_next_invoice(exclude_ids=attempted)
+        if payment is None:
+            return counts
+        attempted.add(payment.id)
+        if payment.status == Payment.STATUS_PENDING:
+            counts["created"] += 1
+        elif payment.status == Payment.STATUS_FAILED:
+            counts["failed"] += 1
+        else:
+            counts["retrying"] += 1
+
+
+def run_invoice_worker(*, idle_seconds: float = 1.0, should_stop=None) -> None:
+    while not (should_stop and should_stop()):
+        close_old_connections()
+        counts = create_pending_invoices()
+        if not counts["created"]:
+            time.sleep(idle_seconds)
+
+
+def _record_failure(payment: Payment, exc: Exception) -> Payment:
+    raw = payment.raw_response or {}
+    attempts = int(raw.get("invoice_attempts", 0)) + 1
+    logger.warning("QPay invoice creation for payment %s failed (attempt %s): %s", payment.id, attempts, exc)
+    if attempts >= settings.PAYMENT_INVOICE_MAX_ATTEMPTS:
+        return mark_payment_failed(payment, reason="invoice_creation_failed", raw_payload={"error": str(exc)})
+    payment.raw_response = {**raw, "invoice_attempts": attempts, "last_error": str(exc)}
+    delay = min(
+        settings.PAYMENT_INVOICE_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.PAYMENT_INVOICE_RETRY_MAX_SECONDS,
+    )
+    return _retry_after(payment, delay, update_fields=["raw_response"])
+
+
+def _retry_after(payment: Payment, seconds: float, *, update_fields=()) -> Payment:
+    payment.next_attempt_at = timezone.now() + timezone.timedelta(seconds=seconds)
+    payment.save(update_fields=[*update_fields, "next_attempt_at"])
+    return payment
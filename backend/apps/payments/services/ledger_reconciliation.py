@@ -0,0 +1,219 @@
+"""Nightly cross-check of payments, escrows and ledger totals, one escrow-id chunk at a time.
+
+Escrow columns are streamed with a server-side cursor and compared as whole columns against
+per-chunk aggregates, so memory stays bounded by ``chunk_size`` however many escrows exist.
+"""
+import logging
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+
+from django.db.models import Sum
+
+from apps.payments.models import Escrow, LedgerAccount, LedgerEntry, Payment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_MISMATCHES = 200
+
+CHECK_DEPOSIT = "deposit_vs_escrow"
+CHECK_FEE_SPLIT = "fee_split"
+CHECK_OVERDRAWN = "overdrawn"
+CHECK_CLOSED_BALANCE = "closed_with_balance"
+CHECK_PAYMENT = "payment_vs_escrow"
+CHECK_HELD_ACCOUNT = "held_account_balance"
+CHECKS = (
+    CHECK_DEPOSIT,
+    CHECK_FEE_SPLIT,
+    CHECK_OVERDRAWN,
+    CHECK_CLOSED_BALANCE,
+    CHECK_PAYMENT,
+    CHECK_HELD_ACCOUNT,
+)
+CLOSED_STATUSES = frozenset({Escrow.STATUS_RELEASED, Escrow.STATUS_REFUNDED})
+
+_stats_lock = threading.Lock()
+_stats = {"runs": 0, "escrows_checked": 0, "mismatches": 0, "last_run": None}
+
+
+@dataclass
+class Mismatch:
+    escrow_id: int
+    project_id: int
+    check: str
+    expected: int
+    actual: int
+
+
+@dataclass
+class LedgerReconciliationReport:
+    escrows: int = 0
+    chunks: int = 0
+    mismatch_counts: dict[str, int] = field(default_factory=lambda: dict.fromkeys(CHECKS, 0))
+    mismatches: list[Mismatch] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def mismatch_total(self) -> int:
+        return sum(self.mismatch_counts.values())
+
+    def as_dict(self) -> dict:
+        return {
+            "escrows": self.escrows,
+            "chunks": self.chunks,
+            "mismatches": self.mismatch_total,
+            **{f"mismatch_{check}": count for check, count in self.mismatch_counts.items()},
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+def ledger_reconciliation_stats() -> dict:
+    """Runs since process start, their totals, and the last run's ``as_dict()``."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reconcile_ledger(
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    max_reported: int = MAX_REPORTED_MISMATCHES,
+    progress=None,
+) -> LedgerReconciliationReport:
+    """Check every escrow against its ledger entries, ledger accounts and paid payments.
+
+    Per escrow: ledger deposits equal ``amount`` once funded; ``platform_fee_amount`` plus
+    ``freelancer_amount`` equal ``amount`` once split; fee, release and refund entries never
+    exceed deposits and use them up once released or refunded; paid QPay payments add up to
+    ``amount``; and the escrow_held account balance equals deposits minus payouts.
+    Read-only; at most ``max_reported`` mismatches are kept in detail, all are counted.
+    """
+    started = time.monotonic()
+    report = LedgerReconciliationReport()
+    for chunk in _escrow_chunks(chunk_size):
+        report.chunks += 1
+        report.escrows += len(chunk["id"])
+        _check_chunk(report, chunk, max_reported)
+        if progress:
+            progress(report)
+
+    report.elapsed_seconds = time.monotonic() - started
+    summary = report.as_dict()
+    with _stats_lock:
+        _stats["runs"] += 1
+        _stats["escrows_checked"] += report.escrows
+        _stats["mismatches"] += report.mismatch_total
+        _stats["last_run"] = summary
+    log = logger.warning if report.mismatch_total else logger.info
+    log("Ledger reconciliation finished: %s", summary)
+    return report
+
+
+def _escrow_chunks(chunk_size: int):
+    rows = (
+        Escrow.objects.order_by("id")
+        .values_list("id", "project_id", "amount", "platform_fee_amount", "freelancer_amount", "status")
+        .iterator(chunk_size=chunk_size)
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield _columns(batch)
+            batch = []
+    if batch:
+        yield _columns(batch)
+
+
+def _columns(rows: list[tuple]) -> dict:
+    ids, project_ids, amounts, fees, payouts, statuses = zip(*rows)
+    return {
+        "id": array("q", ids),
+        "project_id": array("q", project_ids),
+        "amount": array("q", amounts),
+        "platform_fee_amount": array("q", fees),
+        "freelancer_amount": array("q", payouts),
+        "status": statuses,
+    }
+
+
+def _check_chunk(report: LedgerReconciliationReport, chunk: dict, max_reported: int) -> None:
+    ids = chunk["id"]
+    # Escrow ids are ascending within a chunk, so a range filter walks the escrow_id indexes.
+    in_range = {"escrow_id__gte": ids[0], "escrow_id__lte": ids[-1]}
+
+    ledger = {entry_type: {} for entry_type, _label in LedgerEntry.TYPE_CHOICES}
+    for escrow_id, entry_type, total in (
+        LedgerEntry.objects.filter(**in_range)
+        .values_list("escrow_id", "entry_type")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    ):
+        ledger[entry_type][escrow_id] = total
+    held = dict(
+        LedgerAccount.objects.filter(kind=LedgerAccount.KIND_ESCROW_HELD, **in_range).values_list("escrow_id", "balance")
+    )
+    paid = dict(
+        Payment.objects.filter(project_id__in=list(chunk["project_id"]), status=Payment.STATUS_PAID)
+        .values_list("project_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+
+    deposits = _gather(ledger[LedgerEntry.TYPE_DEPOSIT], ids)
+    outflows = _add(
+        _gather(ledger[LedgerEntry.TYPE_FEE], ids),
+        _gather(ledger[LedgerEntry.TYPE_RELEASE], ids),
+        _gather(ledger[LedgerEntry.TYPE_REFUND], ids),
+    )
+    amounts = chunk["amount"]
+    split = _add(chunk["platform_fee_amount"], chunk["freelancer_amount"])
+    funded = [status != Escrow.STATUS_CREATED or deposit > 0 for status, deposit in zip(chunk["status"], deposits)]
+    closed = [status in CLOSED_STATUSES for status in chunk["status"]]
+    has_split = [value > 0 for value in split]
+    has_paid = [project_id in paid for project_id in chunk["project_id"]]
+    has_held = [escrow_id in held for escrow_id in ids]
+    expected_held = array("q", (deposit - outflow for deposit, outflow in zip(deposits, outflows)))
+
+    checks = (
+        (CHECK_DEPOSIT, funded, amounts, deposits, _ne),
+        (CHECK_FEE_SPLIT, has_split, amounts, split, _ne),
+        (CHECK_OVERDRAWN, None, deposits, outflows, _gt_actual),
+        (CHECK_CLOSED_BALANCE, closed, deposits, outflows, _ne),
+        (CHECK_PAYMENT, has_paid, amounts, _gather(paid, chunk["project_id"]), _ne),
+        (CHECK_HELD_ACCOUNT, has_held, expected_held, _gather(held, ids), _ne),
+    )
+    for check, mask, expected, actual, differs in checks:
+        for index in _mismatched(mask, expected, actual, differs):
+            report.mismatch_counts[check] += 1
+            if len(report.mismatches) < max_reported:
+                report.mismatches.append(
+                    Mismatch(ids[index], chunk["project_id"][index], check, expected[index], actual[index])
+                )
+
+
+def _gather(values: dict[int, int], keys) -> array:
+    return array("q", (values.get(key) or 0 for key in keys))
+
+
+def _add(*columns) -> array:
+    return array("q", map(sum, zip(*columns)))
+
+
+def _ne(expected: int, actual: int) -> bool:
+    return expected != actual
+
+
+def _gt_actual(expected: int, actual: int) -> bool:
+    return actual > expected
+
+
+def _mismatched(mask, expected, actual, differs) -> list[int]:
+    if mask is None:
+        return [index for index, (want, got) in enumerate(zip(expected, actual)) if differs(want, got)]
+    return [
+        index
+        for index, (applies, want, got) in enumerate(zip(mask, expected, actual))
+        if applies and differs(want, got)
+    ]
@@ -0,0 +1,96 @@
+"""Double-entry postings and running account balances for escrow ledgers."""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.payments.models import Escrow, LedgerAccount, LedgerEntry, LedgerPosting
+from apps.payments.services.revenue_rollups import record_entry_rollup
+
+# entry_type -> (debit account, credit account)
+POSTING_RULES = {
+    LedgerEntry.TYPE_DEPOSIT: (LedgerAccount.KIND_ESCROW_HELD, LedgerAccount.KIND_CLIENT_FUNDS),
+    LedgerEntry.TYPE_FEE: (LedgerAccount.KIND_PLATFORM_REVENUE, LedgerAccount.KIND_ESCROW_HELD),
+    LedgerEntry.TYPE_RELEASE: (LedgerAccount.KIND_FREELANCER_PAYABLE, LedgerAccount.KIND_ESCROW_HELD),
+    LedgerEntry.TYPE_REFUND: (LedgerAccount.KIND_CLIENT_FUNDS, LedgerAccount.KIND_ESCROW_HELD),
+}
+
+
+@transaction.atomic
+def record_ledger_entry(*, escrow: Escrow, entry_type: str, amount: int, note: str = "") -> LedgerEntry:
+    entry = LedgerEntry.objects.create(escrow=escrow, entry_type=entry_type, amount=amount, note=note)
+    post_ledger_entry(entry)
+    return entry
+
+
+@transaction.atomic
+def post_ledger_entry(entry: LedgerEntry) -> LedgerPosting:
+    """Post ``entry`` to its debit and credit accounts; both balances and the revenue rollup move in the same transaction."""
+    debit_kind, credit_kind = POSTING_RULES[entry.entry_type]
+    accounts = _ensure_accounts(entry.escrow_id)
+    posting = LedgerPosting.objects.create(
+        entry=entry,
+        debit_account_id=accounts[debit_kind],
+        credit_account_id=accounts[credit_kind],
+        amount=entry.amount,
+    )
+    now = timezone.now()
+    LedgerAccount.objects.filter(id=accounts[debit_kind]).update(
+        balance=F("balance") + entry.amount,
+        debits=F("debits") + entry.amount,
+        updated_at=now,
+    )
+    LedgerAccount.objects.filter(id=accounts[credit_kind]).update(
+        balance=F("balance") - entry.amount,
+        credits=F("credits") + entry.amount,
+        updated_at=now,
+    )
+    record_entry_rollup(entry)
+    return posting
+
+
+def backfill_ledger_postings(*, batch_size: int = 1000, progress=None) -> int:
+    """Post every entry that predates the double-entry accounts, one committed batch at a time."""
+    posted = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            entries = list(
+                LedgerEntry.objects.filter(id__gt=last_id, posting__isnull=True).order_by("id")[:batch_size]
+            )
+            for entry in entries:
+                post_ledger_entry(entry)
+        if not entries:
+            return posted
+        last_id = entries[-1].id
+        posted += len(entries)
+        if progress:
+            progress(posted)
+
+
+def escrow_balances(escrow: Escrow) -> dict[str, int]:
+    balances = {kind: 0 for kind, _label in LedgerAccount.KIND_CHOICES}
+    balances.update(LedgerAccount.objects.filter(escrow=escrow).values_list("kind", "balance"))
+    return balances
+
+
+def is_escrow_funded(escrow: Escrow) -> bool:
+    debits = (
+        LedgerAccount.objects.filter(escrow=escrow, kind=LedgerAccount.KIND_ESCROW_HELD)
+        .values_list("debits", flat=True)
+        .first()
+    )
+    if debits is None:
+        # No accounts yet: a new escrow, or history that backfill_ledger_accounts has not posted.
+        return escrow.ledger_entries.filter(entry_type=LedgerEntry.TYPE_DEPOSIT).exists()
+    return debits > 0
+
+
+def _ensure_accounts(escrow_id: int) -> dict[str, int]:
+    accounts = dict(LedgerAccount.objects.filter(escrow_id=escrow_id).values_list("kind", "id"))
+    if len(accounts) < len(LedgerAccount.KIND_CHOICES):
+        LedgerAccount.objects.bulk_create(
+            [LedgerAccount(escrow_id=escrow_id, kind=kind) for kind, _label in LedgerAccount.KIND_CHOICES],
+            ignore_conflicts=True,
+        )
+        accounts = dict(LedgerAccount.objects.filter(escrow_id=escrow_id).values_list("kind", "id"))
+    return accounts
@@ -3,18 +3,34 @@ import hashlib
 import hmac
 import json
 import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
 from dataclasses import dataclass
 
 import requests
 from django.conf import settings
 from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 
+from common.circuit_breaker import CircuitBreaker
 from common.exceptions import DomainError
 
 logger = logging.getLogger(__name__)
 
 TOKEN_CACHE_KEY = "qpay:access_token"
+TOKEN_REFRESH_LOCK_KEY = "qpay:access_token:refresh"
 TOKEN_TTL_SECONDS = 3600
+# Renew this long before expiry so no request goes out with a token that lapses in flight.
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+TOKEN_LOCK_TIMEOUT_SECONDS = 15
+TOKEN_WAIT_TIMEOUT_SECONDS = 5.0
+TOKEN_WAIT_INTERVAL_SECONDS = 0.05
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+LATENCY_SAMPLE_SIZE = 512
 
 
 @dataclass
@@ -26,6 +42,298 @@ class QPayInvoice:
     raw_response: dict
 
 
+class QPayLatencyRecorder:
+    """Process-wide call counts and latency per QPay operation, with a window for percentiles."""
+
+    def __init__(self, sample_size: int = LATENCY_SAMPLE_SIZE):
+        self._lock = threading.Lock()
+        self._sample_size = sample_size
+        self._stats = {}
+
+    def record(self, operation: str, elapsed_ms: float, *, ok: bool, retries: int = 0) -> None:
+        with self._lock:
+            stats = self._stats.get(operation)
+            if stats is None:
+                stats = self._stats[operation] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "samples": deque(maxlen=self._sample_size),
+                }
+            stats["calls"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["retries"] += retries
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["samples"].append(elapsed_ms)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {operation: _summarize(stats) for operation, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+
+
+latency_recorder = QPayLatencyRecorder()
+breaker = CircuitBreaker("qpay", settings_prefix="QPAY_BREAKER")
+
+
+def qpay_latency_stats() -> dict[str, dict]:
+    """Per operation since start: calls, errors, retries, mean/max and p50/p95/p99 in milliseconds."""
+    return latency_recorder.snapshot()
+
+
+def qpay_breaker_stats() -> dict:
+    """Breaker state plus opened/closed/probes/rejected/failures counts across all workers."""
+    return breaker.stats()
+
+
+class QPayClient:
+    """QPay API client sharing one keep-alive connection pool per process.
+
+    Idempotent calls (token issue, payment check) are retried on transport errors and
+    retryable statuses with jittered exponential backoff; invoice creation is sent once.
+    The access token is refreshed by one caller at a time across all workers, shortly
+    before it expires, while the others keep using the current token.
+
+    Every call passes through the shared circuit breaker: once QPay keeps failing, calls
+    raise ``CircuitOpenError`` (a 503 with Retry-After) without going out.
+    """
+
+    def __init__(self, *, recorder: QPayLatencyRecorder | None = None, circuit: CircuitBreaker | None = None):
+        self.recorder = recorder or latency_recorder
+        self.breaker = circuit or breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.QPAY_HTTP_POOL_SIZE,
+            max_retries=0,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._token_lock = threading.Lock()
+        self._token = None
+        self._token_expires_at = 0.0
+
+    def close(self) -> None:
+        self.session.close()
+
+    def authenticate(self, *, force_refresh: bool = False) -> str:
+        if not settings.QPAY_BASE_URL or not settings.QPAY_USERNAME or not settings.QPAY_PASSWORD:
+            raise DomainError("QPay environment configuration is incomplete")
+
+        if not force_refresh:
+            token = self._usable_token(margin=TOKEN_REFRESH_MARGIN_SECONDS)
+            if token:
+                return token
+        if not self._token_lock.acquire(blocking=False):
+            # A thread in this process is renewing early; the current token is still good.
+            current = None if force_refresh else self._usable_token(margin=0)
+            if current:
+                return current
+            self._token_lock.acquire()
+        try:
+            if not force_refresh:
+                token = self._usable_token(margin=TOKEN_REFRESH_MARGIN_SECONDS)
+                if token:
+                    return token
+            stale_token = None
+            if force_refresh:
+                stale_token, self._token = self._token, None
+            return self._refresh_token_single_flight(stale_token=stale_token)
+        finally:
+            self._token_lock.release()
+
+    def create_invoice(self, *, project, amount: int, callback_url: str, sender_invoice_no: str | None = None) -> QPayInvoice:
+        if not settings.QPAY_MERCHANT_CODE:
+            raise DomainError("QPAY_MERCHANT_CODE is missing")
+
+        payload = {
+            "invoice_code": settings.QPAY_MERCHANT_CODE,
+            "sender_invoice_no": sender_invoice_no or f"PROJECT-{project.id}",
+            "invoice_receiver_code": "terminal",
+            "invoice_description": f"Escrow payment for project {project.title}",
+            "amount": amount,
+            "callback_url": callback_url,
+        }
+        response = self._authorized_post("invoice_create", _invoice_url(), payload, timeout=12, idempotent=False)
+        if response.status_code >= 400:
+            raise DomainError("QPay invoice creation failed")
+
+        data = response.json()
+        invoice_id = data.get("invoice_id") or data.get("invoiceId")
+        if not invoice_id:
+            raise DomainError("QPay invoice response missing invoice_id")
+
+        return QPayInvoice(
+            invoice_id=invoice_id,
+            qr_text=data.get("qr_text", ""),
+            qr_image=data.get("qr_image", ""),
+            invoice_url=data.get("invoice_url", ""),
+            raw_response=data,
+        )
+
+    def get_invoice_status(self, invoice_id: str) -> dict:
+        response = self._authorized_post(
+            "payment_check",
+            _payment_check_url(),
+            {"invoice_id": invoice_id},
+            timeout=12,
+            idempotent=True,
+        )
+        if response.status_code >= 400:
+            raise DomainError("QPay payment verification failed")
+        return response.json()
+
+    def _usable_token(self, *, margin: float) -> str | None:
+        now = time.time()
+        if self._token and self._token_expires_at - now > margin:
+            return self._token
+        entry = cache.get(TOKEN_CACHE_KEY)
+        if isinstance(entry, dict) and entry.get("expires_at", 0) - now > margin:
+            self._token, self._token_expires_at = entry["token"], entry["expires_at"]
+            return self._token
+        return None
+
+    def _refresh_token_single_flight(self, *, stale_token: str | None) -> str:
+        lock_token = uuid.uuid4().hex
+        if cache.add(TOKEN_REFRESH_LOCK_KEY, lock_token, timeout=TOKEN_LOCK_TIMEOUT_SECONDS):
+            try:
+                return self._fetch_token()
+            finally:
+                if cache.get(TOKEN_REFRESH_LOCK_KEY) == lock_token:
+                    cache.delete(TOKEN_REFRESH_LOCK_KEY)
+
+        # Another worker is renewing. During early renewal the current token is still good.
+        current = self._usable_token(margin=0)
+        if current and current != stale_token:
+            return current
+        deadline = time.monotonic() + TOKEN_WAIT_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(TOKEN_WAIT_INTERVAL_SECONDS)
+            current = self._usable_token(margin=0)
+            if current and current != stale_token:
+                return current
+        logger.warning("QPay token refresh wait timed out; requesting a token locally")
+        return self._fetch_token()
+
+    def _fetch_token(self) -> str:
+        payload = {
+            "username": settings.QPAY_USERNAME,
+            "password": settings.QPAY_PASSWORD,
+        }
+        response = self._send("auth_token", _auth_url(), payload, headers=None, timeout=10, idempotent=True)
+        if response.status_code >= 400:
+            raise DomainError("QPay authentication failed")
+
+        data = response.json()
+        token = data.get("access_token") or data.get("token")
+        if not token:
+            raise DomainError("QPay auth response missing access token")
+
+        ttl = TOKEN_TTL_SECONDS
+        if data.get("expires_in"):
+            ttl = min(int(data["expires_in"]), TOKEN_TTL_SECONDS)
+        expires_at = time.time() + ttl
+        cache.set(TOKEN_CACHE_KEY, {"token": token, "expires_at": expires_at}, timeout=ttl)
+        self._token, self._token_expires_at = token, expires_at
+        return token
+
+    def _authorized_post(self, operation: str, url: str, payload: dict, *, timeout: float, idempotent: bool):
+        token = self.authenticate()
+        response = self._send(operation, url, payload, headers=_headers(token), timeout=timeout, idempotent=idempotent)
+        if response.status_code == 401:
+            # Revoked or expired early on QPay's side; a rejected call was not processed, so resend once.
+            token = self.authenticate(force_refresh=True)
+            response = self._send(operation, url, payload, headers=_headers(token), timeout=timeout, idempotent=idempotent)
+        return response
+
+    def _send(self, operation: str, url: str, payload: dict, *, headers, timeout: float, idempotent: bool):
+        self.breaker.before_call()
+        try:
+            response = self._send_with_retries(
+                operation, url, payload, headers=headers, timeout=timeout, idempotent=idempotent
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            self.breaker.record_failure()
+            raise
+        # Only outages count; a 4xx means QPay is up and answering.
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _send_with_retries(self, operation: str, url: str, payload: dict, *, headers, timeout: float, idempotent: bool):
+        attempts = 1 + (settings.QPAY_HTTP_MAX_RETRIES if idempotent else 0)
+        started = time.monotonic()
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = self.session.post(url, headers=headers, json=payload, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    self._record(operation, started, ok=False, retries=attempt)
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                    self._record(operation, started, ok=response.status_code < 400, retries=attempt)
+                    return response
+                response.close()
+            time.sleep(_backoff_delay(attempt))
+
+    def _record(self, operation: str, started: float, *, ok: bool, retries: int) -> None:
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.recorder.record(operation, elapsed_ms, ok=ok, retries=retries)
+        logger.debug("QPay %s took %.1fms (ok=%s, retries=%s)", operation, elapsed_ms, ok, retries)
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> QPayClient:
+    """Per-process client; a forked worker builds its own pool instead of sharing sockets."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client, _client_pid = QPayClient(), pid
+    return _client
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Full jitter keeps retries from many workers from arriving at QPay in lockstep.
+    ceiling = min(settings.QPAY_HTTP_RETRY_MAX_SECONDS, settings.QPAY_HTTP_RETRY_BASE_SECONDS * 2**attempt)
+    return random.uniform(0, ceiling)
+
+
+def _summarize(stats: dict) -> dict:
+    samples = sorted(stats["samples"])
+    return {
+        "calls": stats["calls"],
+        "errors": stats["errors"],
+        "retries": stats["retries"],
+        "mean_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0,
+        "max_ms": stats["max_ms"],
+        "p50_ms": _percentile(samples, 0.50),
+        "p95_ms": _percentile(samples, 0.95),
+        "p99_ms": _percentile(samples, 0.99),
+    }
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
 def _headers(token: str) -> dict:
     return {
         "Authorization": f"Bearer {token}",
@@ -46,75 +354,21 @@ def _payment_check_url() -> str:
 
 
 def authenticate() -> str:
-    if not settings.QPAY_BASE_URL or not settings.QPAY_USERNAME or not settings.QPAY_PASSWORD:
-        raise DomainError("QPay environment configuration is incomplete")
+    return get_client().authenticate()
 
-    cached_token = cache.get(TOKEN_CACHE_KEY)
-    if cached_token:
-        return cached_token
-
-    payload = {
-        "username": settings.QPAY_USERNAME,
-        "password": settings.QPAY_PASSWORD,
-    }
-    response = requests.post(_auth_url(), json=payload, timeout=10)
-    if response.status_code >= 400:
-        raise DomainError("QPay authentication failed")
-
-    data = response.json()
-    token = data.get("access_token") or data.get("token")
-    if not token:
-        raise DomainError("QPay auth response missing access token")
-
-    cache.set(TOKEN_CACHE_KEY, token, timeout=TOKEN_TTL_SECONDS)
-    return token
-
-
-def create_invoice(*, project, amount: int, callback_url: str) -> QPayInvoice:
-    if not settings.QPAY_MERCHANT_CODE:
-        raise DomainError("QPAY_MERCHANT_CODE is missing")
-
-    token = authenticate()
-    payload = {
-        "invoice_code": settings.QPAY_MERCHANT_CODE,
-        "sender_invoice_no": f"PROJECT-{project.id}",
-        "invoice_receiver_code": "terminal",
-        "invoice_description": f"Escrow payment for project {project.title}",
-        "amount": amount,
-        "callback_url": callback_url,
-    }
-    response = requests.post(_invoice_url(), headers=_headers(token), json=payload, timeout=12)
-    if response.status_code >= 400:
-        raise DomainError("QPay invoice creation failed")
 
-    data = response.json()
-    invoice_id = data.get("invoice_id") or data.get("invoiceId")
-    if not invoice_id:
-        raise DomainError("QPay invoice response missing invoice_id")
-
-    return QPayInvoice(
-        invoice_id=invoice_id,
-        qr_text=data.get("qr_text", ""),
-        qr_image=data.get("qr_image", ""),
-        invoice_url=data.get("invoice_url", ""),
-        raw_response=data,
+def create_invoice(*, project, amount: int, callback_url: str, sender_invoice_no: str | None = None) -> QPayInvoice:
+    return get_client().create_invoice(
+        project=project, amount=amount, callback_url=callback_url, sender_invoice_no=sender_invoice_no
     )
 
 
 def get_invoice_status(invoice_id: str) -> dict:
-    token = authenticate()
-    response = requests.post(
-        _payment_check_url(),
-        headers=_headers(token),
-        json={"invoice_id": invoice_id},
-        timeout=12,
-    )
-    if response.status_code >= 400:
-        raise DomainError("QPay payment verification failed")
-    return response.json()
+    return get_client().get_invoice_status(invoice_id)
 
 
-def verify_webhook(request) -> dict:
+def authenticate_webhook(request) -> dict:
+    """Check the callback signature and parse its payload; no outbound call is made."""
     if not settings.QPAY_WEBHOOK_SECRET:
         raise DomainError("QPAY_WEBHOOK_SECRET is missing")
 
@@ -142,7 +396,10 @@ def verify_webhook(request) -> dict:
     invoice_id = payload.get("invoice_id") or payload.get("invoiceId")
     if not invoice_id:
         raise DomainError("Webhook payload missing invoice_id")
+    return payload
 
+
+def verify_invoice_payment(invoice_id: str, payload: dict) -> dict:
     verification = get_invoice_status(invoice_id)
     paid_flag = str(verification.get("payment_status") or verification.get("status") or "").lower()
     is_paid = paid_flag in {"paid", "success", "succeeded"}
@@ -155,3 +412,8 @@ def verify_webhook(request) -> dict:
         "payload": payload,
         "verification": verification,
     }
+
+
+def verify_webhook(request) -> dict:
+    payload = authenticate_webhook(request)
+    return verify_invoice_payment(payload.get("invoice_id") or payload.get("invoiceId"), payload)
@@ -0,0 +1,171 @@
+"""Reconcile stale pending payments against QPay before expiring them."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.payments.models import Payment
+from apps.payments.services.escrow_service import mark_payment_failed, mark_payment_paid_and_hold_escrow
+from apps.payments.services.qpay_service import breaker, verify_invoice_payment
+from common.circuit_breaker import STATE_OPEN, CircuitOpenError
+from common.exceptions import DomainError
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200
+WORKERS = 8
+RATE_PER_SECOND = 20.0
+MAX_REPORTED_ERRORS = 50
+
+
+class RateLimiter:
+    """Token bucket shared by the pool's threads; ``burst`` calls may go out back to back."""
+
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.burst = max(burst, 1)
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_free, now - (self.burst - 1) * self.interval)
+            self._next_free = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass
+class ReconciliationReport:
+    scanned: int = 0
+    paid: int = 0
+    amount_mismatch: int = 0
+    expired: int = 0
+    already_settled: int = 0
+    errors: list[tuple[str, str]] = field(default_factory=list)
+    error_count: int = 0
+    chunks: int = 0
+    circuit_open: bool = False
+    elapsed_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "scanned": self.scanned,
+            "paid": self.paid,
+            "amount_mismatch": self.amount_mismatch,
+            "expired": self.expired,
+            "already_settled": self.already_settled,
+            "errors": self.error_count,
+            "chunks": self.chunks,
+            "circuit_open": self.circuit_open,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+def reconcile_pending_payments(
+    *,
+    ttl_minutes: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = WORKERS,
+    rate_per_second: float = RATE_PER_SECOND,
+    progress=None,
+) -> ReconciliationReport:
+    """Ask QPay about every pending payment older than ``ttl_minutes`` and settle it.
+
+    ``ttl_minutes`` defaults to ``PAYMENT_RECONCILE_TTL_MINUTES``.
+
+    Rows are read in ``(created_at, id)`` chunks. Each chunk's invoices are checked on a
+    bounded thread pool, throttled to ``rate_per_second`` across all threads; the state
+    transitions run on the calling thread. Paid invoices go through
+    ``mark_payment_paid_and_hold_escrow``, unpaid ones are expired, and invoices QPay could
+    not answer for stay pending for the next run. The run stops after the chunk in which
+    the QPay circuit breaker opened instead of walking the rest of the backlog.
+    """
+    started = time.monotonic()
+    report = ReconciliationReport()
+    ttl_minutes = settings.PAYMENT_RECONCILE_TTL_MINUTES if ttl_minutes is None else ttl_minutes
+    threshold = timezone.now() - timezone.timedelta(minutes=ttl_minutes)
+    limiter = RateLimiter(rate_per_second, burst=workers)
+
+    def _check(invoice_id: str):
+        limiter.acquire()
+        try:
+            return invoice_id, verify_invoice_payment(invoice_id, {}), None
+        except (CircuitOpenError, DomainError, requests.RequestException, ValueError) as exc:
+            return invoice_id, None, str(exc) or exc.__class__.__name__
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="qpay-reconcile") as pool:
+        for chunk in _pending_chunks(threshold, chunk_size):
+            report.chunks += 1
+            report.scanned += len(chunk)
+            for invoice_id, verified, error in pool.map(_check, [invoice_id for _id, invoice_id in chunk]):
+                if error is not None:
+                    _record_error(report, invoice_id, error)
+                    continue
+                _settle(report, invoice_id, verified)
+            if progress:
+                progress(report)
+            if breaker.state() == STATE_OPEN:
+                report.circuit_open = True
+                logger.warning("QPay circuit breaker is open; stopping reconciliation early")
+                break
+
+    report.elapsed_seconds = time.monotonic() - started
+    logger.info("Pending payment reconciliation finished: %s", report.as_dict())
+    return report
+
+
+def _pending_chunks(threshold, chunk_size: int):
+    pending = Payment.objects.filter(status=Payment.STATUS_PENDING, created_at__lt=threshold).order_by("created_at", "id")
+    after = None
+    while True:
+        page = pending
+        if after is not None:
+            page = page.filter(Q(created_at__gt=after[0]) | Q(created_at=after[0], id__gt=after[1]))
+        rows = list(page.values_list("id", "invoice_id", "created_at")[:chunk_size])
+        if not rows:
+            return
+        after = (rows[-1][2], rows[-1][0])
+        yield [(payment_id, invoice_id) for payment_id, invoice_id, _created_at in rows]
+
+
+def _settle(report: ReconciliationReport, invoice_id: str, verified: dict) -> None:
+    try:
+        if verified["is_paid"]:
+            payment = mark_payment_paid_and_hold_escrow(
+                invoice_id=invoice_id,
+                paid_amount=verified["amount"],
+                verification_payload=verified,
+            )
+            if payment.status == Payment.STATUS_PAID:
+                report.paid += 1
+            else:
+                report.amount_mismatch += 1
+            return
+
+        payment = Payment.objects.get(invoice_id=invoice_id)
+        if payment.status != Payment.STATUS_PENDING:
+            # A webhook settled it while QPay was being asked.
+            report.already_settled += 1
+            return
+        mark_payment_failed(payment, reason="invoice_expired", raw_payload=verified)
+        report.expired += 1
+    except DomainError as exc:
+        _record_error(report, invoice_id, str(exc))
+
+
+def _record_error(report: ReconciliationReport, invoice_id: str, error: str) -> None:
+    report.error_count += 1
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        report.errors.append((invoice_id, error))
+    logger.warning("Could not reconcile invoice %s: %s", invoice_id, error)
@@ -0,0 +1,187 @@
+"""Daily revenue rollups per project category, so admin reports never aggregate the ledger.
+
+``post_ledger_entry`` and ``create_dispute`` add to the ``(day, category)`` row of the entry
+once their transaction commits, so financial writes never queue behind the shared row; an
+increment lost between commit and callback is repaired by ``backfill_revenue_rollups``.
+Daily totals are the sum of a day's few category rows. Days are local dates in ``TIME_ZONE``.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.payments.models import Dispute, Escrow, LedgerEntry, RevenueRollup
+from common.cache_utils import bump_admin_resource_version
+from common.exceptions import DomainError
+
+REPORTS_RESOURCE = "reports"
+REBUILD_BATCH_DAYS = 31
+METRICS = ("gross_volume", "deposits", "platform_fees", "releases", "refunds", "disputes")
+# entry_type -> RevenueRollup amount column
+AMOUNT_COLUMNS = {
+    LedgerEntry.TYPE_DEPOSIT: "gross_volume",
+    LedgerEntry.TYPE_FEE: "platform_fees",
+    LedgerEntry.TYPE_RELEASE: "releases",
+    LedgerEntry.TYPE_REFUND: "refunds",
+}
+
+
+def record_entry_rollup(entry: LedgerEntry) -> None:
+    category = Escrow.objects.filter(id=entry.escrow_id).values_list("project__category", flat=True).get()
+    deltas = {AMOUNT_COLUMNS[entry.entry_type]: entry.amount}
+    if entry.entry_type == LedgerEntry.TYPE_DEPOSIT:
+        deltas["deposits"] = 1
+    _increment(timezone.localdate(entry.created_at), category, deltas)
+
+
+def record_dispute_rollup(dispute: Dispute, category: str) -> None:
+    _increment(timezone.localdate(dispute.created_at), category, {"disputes": 1})
+
+
+def rebuild_revenue_rollups(
+    *,
+    since: date | None = None,
+    until: date | None = None,
+    batch_days: int = REBUILD_BATCH_DAYS,
+    progress=None,
+) -> int:
+    """Recompute rollups for ``since..until`` from posted ledger entries and disputes; returns rows written.
+
+    Each ``batch_days`` window is replaced in its own transaction. Entries that have no posting
+    yet are skipped: ``backfill_ledger_accounts`` adds them when it posts them, so the two
+    commands can run in either order. Today still takes postings whose increments would race
+    the rebuild, so ``until`` defaults to yesterday and today is refused.
+    """
+    yesterday = timezone.localdate() - timedelta(days=1)
+    until = until or yesterday
+    if until > yesterday:
+        raise DomainError("Only days before today can be rebuilt.")
+    since = since or _first_day()
+    if since is None:
+        return 0
+    written = 0
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=batch_days - 1), until)
+        with transaction.atomic():
+            RevenueRollup.objects.filter(day__range=(start, end)).delete()
+            rows = _aggregate(start, end)
+            RevenueRollup.objects.bulk_create(rows)
+            bump_admin_resource_version(REPORTS_RESOURCE)
+        written += len(rows)
+        if progress:
+            progress(end, written)
+        start = end + timedelta(days=1)
+    return written
+
+
+def revenue_report(since: date, until: date) -> dict:
+    """Per-day totals for ``since..until``, zero-filled, plus totals for the range."""
+    by_day = {
+        row["day"]: row
+        for row in RevenueRollup.objects.filter(day__range=(since, until))
+        .values("day")
+        .annotate(**{metric: Sum(metric) for metric in METRICS})
+        .order_by()
+    }
+    days = []
+    day = since
+    while day <= until:
+        days.append({"day": day.isoformat(), **_metrics(by_day.get(day, {}))})
+        day += timedelta(days=1)
+    return {"from": since.isoformat(), "to": until.isoformat(), "days": days, "totals": _totals(since, until)}
+
+
+def category_report(since: date, until: date) -> dict:
+    """Per-category totals for ``since..until``, largest gross volume first."""
+    rows = (
+        RevenueRollup.objects.filter(day__range=(since, until))
+        .values("category")
+        .annotate(**{metric: Sum(metric) for metric in METRICS})
+        .order_by("-gross_volume", "category")
+    )
+    return {
+        "from": since.isoformat(),
+        "to": until.isoformat(),
+        "categories": [{"category": row["category"], **_metrics(row)} for row in rows],
+        "totals": _totals(since, until),
+    }
+
+
+def _increment(day: date, category: str, deltas: dict[str, int]) -> None:
+    # robust: the money already moved, so a failed counter update is logged rather than raised.
+    transaction.on_commit(lambda: _apply_increment(day, category, deltas), robust=True)
+
+
+def _apply_increment(day: date, category: str, deltas: dict[str, int]) -> None:
+    RevenueRollup.objects.bulk_create([RevenueRollup(day=day, category=category)], ignore_conflicts=True)
+    RevenueRollup.objects.filter(day=day, category=category).update(
+        **{column: F(column) + delta for column, delta in deltas.items()}, updated_at=timezone.now()
+    )
+    bump_admin_resource_version(REPORTS_RESOURCE)
+
+
+def _aggregate(start: date, end: date) -> list[RevenueRollup]:
+    rows: dict[tuple[date, str], RevenueRollup] = {}
+
+    def _row(day, category):
+        if (day, category) not in rows:
+            rows[day, category] = RevenueRollup(day=day, category=category)
+        return rows[day, category]
+
+    # Local-day bounds on created_at itself, so the range can use an index.
+    window = {
+        "created_at__gte": timezone.make_aware(datetime.combine(start, time.min)),
+        "created_at__lt": timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    }
+    entries = (
+        LedgerEntry.objects.filter(posting__isnull=False, **window)
+        .annotate(day=TruncDate("created_at"))
+        .values_list("day", "escrow__project__category", "entry_type")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    for day, category, entry_type, total, count in entries:
+        row = _row(day, category)
+        setattr(row, AMOUNT_COLUMNS[entry_type], total)
+        if entry_type == LedgerEntry.TYPE_DEPOSIT:
+            row.deposits = count
+    disputes = (
+        Dispute.objects.filter(**window)
+        .annotate(day=TruncDate("created_at"))
+        .values_list("day", "project__category")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for day, category, count in disputes:
+        _row(day, category).disputes = count
+    return list(rows.values())
+
+
+def _first_day() -> date | None:
+    first = min(
+        filter(
+            None,
+            (
+                LedgerEntry.objects.filter(posting__isnull=False).order_by("id").values_list("created_at", flat=True).first(),
+                Dispute.objects.order_by("id").values_list("created_at", flat=True).first(),
+            ),
+        ),
+        default=None,
+    )
+    return timezone.localdate(first) if first else None
+
+
+def _totals(since: date, until: date) -> dict:
+    return _metrics(
+        RevenueRollup.objects.filter(day__range=(since, until)).aggregate(**{metric: Sum(metric) for metric in METRICS})
+    )
+
+
+def _metrics(row: dict) -> dict:
+    metrics = {metric: row.get(metric) or 0 for metric in METRICS}
+    # Disputes opened per escrow funded in the same period.
+    metrics["dispute_rate"] = round(metrics["disputes"] / metrics["deposits"], 4) if metrics["deposits"] else 0.0
+    return metrics
@@ -0,0 +1,135 @@
+"""Wake long-polling payment status requests when a payment settles, over Redis pub/sub."""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANNEL = "payments:status:changed"
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+class PaymentStatusHub:
+    """Per-process registry of requests waiting on a project's payment status."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: dict[int, set[threading.Event]] = {}
+
+    def subscribe(self, project_id: int, *, limit: int | None = None) -> threading.Event | None:
+        """Register a waiter, or return ``None`` when the process already holds ``limit`` of them."""
+        event = threading.Event()
+        with self._lock:
+            if limit is not None and sum(len(events) for events in self._waiters.values()) >= limit:
+                return None
+            self._waiters.setdefault(project_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, project_id: int, event: threading.Event) -> None:
+        with self._lock:
+            waiters = self._waiters.get(project_id)
+            if waiters is None:
+                return
+            waiters.discard(event)
+            if not waiters:
+                del self._waiters[project_id]
+
+    def notify(self, project_id: int) -> None:
+        with self._lock:
+            waiters = list(self._waiters.get(project_id, ()))
+        for event in waiters:
+            event.set()
+
+    def notify_all(self) -> None:
+        with self._lock:
+            waiters = [event for events in self._waiters.values() for event in events]
+        for event in waiters:
+            event.set()
+
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(len(events) for events in self._waiters.values())
+
+
+hub = PaymentStatusHub()
+_listener_pid: int | None = None
+_listener_lock = threading.Lock()
+
+
+def publish_payment_status_change(project_id: int) -> None:
+    """Announce a settled payment once the surrounding transaction commits."""
+    transaction.on_commit(lambda: _publish(project_id))
+
+
+def subscribe_payment_status(project_id: int) -> threading.Event | None:
+    """Subscribe before reading the status, so a change in between still wakes the caller.
+
+    Each waiter holds a request thread, so a process holds at most ``PAYMENT_STATUS_MAX_WAITERS``
+    of them; ``None`` means the caller must not wait.
+    """
+    _ensure_listener()
+    return hub.subscribe(project_id, limit=settings.PAYMENT_STATUS_MAX_WAITERS)
+
+
+def unsubscribe_payment_status(project_id: int, event: threading.Event) -> None:
+    hub.unsubscribe(project_id, event)
+
+
+def _uses_redis() -> bool:
+    return settings.CACHES["default"]["BACKEND"] == "django_redis.cache.RedisCache"
+
+
+def _channel() -> str:
+    prefix = settings.CACHES["default"].get("KEY_PREFIX", "")
+    return f"{prefix}:{STATUS_CHANNEL}" if prefix else STATUS_CHANNEL
+
+
+def _publish(project_id: int) -> None:
+    if not _uses_redis():
+        hub.notify(project_id)
+        return
+    from django_redis import get_redis_connection
+
+    try:
+        get_redis_connection("default").publish(_channel(), str(project_id))
+    except Exception:
+        logger.warning("Failed to publish payment status change for project %s", project_id, exc_info=True)
+        hub.notify(project_id)
+
+
+def _ensure_listener() -> None:
+    global _listener_pid
+    if not _uses_redis() or _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        threading.Thread(target=_listen_for_changes, name="payment-status-listener", daemon=True).start()
+
+
+def _listen_for_changes() -> None:
+    from django_redis import get_redis_connection
+
+    while True:
+        try:
+            pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(_channel())
+            # A change published while disconnected was missed; let every waiter re-read.
+            hub.notify_all()
+            for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message["data"]
+                try:
+                    hub.notify(int(data.decode("utf-8") if isinstance(data, bytes) else data))
+                except ValueError:
+                    continue
+        except Exception:
+            logger.warning("Payment status listener disconnected; retrying", exc_info=True)
+        hub.notify_all()
+        time.sleep(RECONNECT_DELAY_SECONDS)
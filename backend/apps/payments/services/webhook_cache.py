@@ -0,0 +1,82 @@
+"""Answer duplicate QPay callbacks from cache instead of asking QPay again.
+
+QPay resends callbacks until it sees a 2xx, so most of them are for invoices we already
+settled. Final payment statuses are cached per invoice, and paid verifications per
+``(invoice_id, body digest)``, both for ``QPAY_WEBHOOK_CACHE_SECONDS``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.payments.models import Payment
+from apps.payments.services.qpay_service import verify_invoice_payment
+from common.shared_counters import SharedCounters
+
+FINAL_STATUS_KEY_PREFIX = "payments:invoice:final"
+VERIFICATION_KEY_PREFIX = "payments:webhook:verification"
+FINAL_STATUSES = frozenset({Payment.STATUS_PAID, Payment.STATUS_FAILED})
+
+STATS_KEY_PREFIX = "payments:webhook:stats"
+
+_counters = SharedCounters(
+    STATS_KEY_PREFIX,
+    ("final_cache_hits", "final_db_hits", "verification_cache_hits", "verification_cache_misses"),
+)
+
+
+def webhook_verification_stats() -> dict[str, int]:
+    """Counts across all workers; ``calls_avoided`` is how many QPay checks were skipped."""
+    stats = _counters.snapshot()
+    stats["calls_avoided"] = stats["final_cache_hits"] + stats["final_db_hits"] + stats["verification_cache_hits"]
+    return stats
+
+
+def reset_webhook_verification_stats() -> None:
+    _counters.reset()
+
+
+def remember_final_status(invoice_id: str | None, status: str) -> None:
+    """Cache a payment's terminal status once the surrounding transaction commits."""
+    if not invoice_id or status not in FINAL_STATUSES:
+        return
+    transaction.on_commit(
+        lambda: cache.set(_final_status_key(invoice_id), status, timeout=settings.QPAY_WEBHOOK_CACHE_SECONDS)
+    )
+
+
+def known_final_status(invoice_id: str, *, db_status: str | None = None) -> str | None:
+    """Return ``paid``/``failed`` when the invoice needs no further verification.
+
+    Checks the cache first, then ``db_status`` if the caller already read the payment row.
+    """
+    status = cache.get(_final_status_key(invoice_id))
+    if status is not None:
+        _count("final_cache_hits")
+        return status
+    if db_status in FINAL_STATUSES:
+        _count("final_db_hits")
+        cache.set(_final_status_key(invoice_id), db_status, timeout=settings.QPAY_WEBHOOK_CACHE_SECONDS)
+        return db_status
+    return None
+
+
+def verify_invoice_payment_cached(invoice_id: str, payload: dict, *, digest: str) -> dict:
+    """``verify_invoice_payment`` memoized per callback body; only paid answers are kept, since they cannot change."""
+    key = f"{VERIFICATION_KEY_PREFIX}:{invoice_id}:{digest}"
+    verified = cache.get(key)
+    if verified is not None:
+        _count("verification_cache_hits")
+        return verified
+    _count("verification_cache_misses")
+    verified = verify_invoice_payment(invoice_id, payload)
+    if verified["is_paid"]:
+        cache.set(key, verified, timeout=settings.QPAY_WEBHOOK_CACHE_SECONDS)
+    return verified
+
+
+def _final_status_key(invoice_id: str) -> str:
+    return f"{FINAL_STATUS_KEY_PREFIX}:{invoice_id}"
+
+
+def _count(name: str) -> None:
+    _counters.incr(name)
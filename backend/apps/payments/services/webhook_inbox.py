@@ -0,0 +1,201 @@
+"""Durable inbox for QPay callbacks, drained by worker processes outside the webhook request."""
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.payments.models import Payment, PaymentWebhookInbox
+from apps.payments.services.escrow_service import mark_payment_failed, mark_payment_paid_and_hold_escrow
+from apps.payments.services.webhook_cache import known_final_status, verify_invoice_payment_cached
+from common.circuit_breaker import CircuitOpenError
+from common.exceptions import DomainError
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 20
+
+
+class RetryableWebhookError(Exception):
+    """QPay could not confirm the invoice right now; the row is tried again later."""
+
+
+@dataclass
+class InboxRunStats:
+    claimed: int = 0
+    done: int = 0
+    retried: int = 0
+    dead: int = 0
+
+
+def body_digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def enqueue_webhook(*, body: bytes, payload: dict) -> PaymentWebhookInbox:
+    """Store a signed callback once; QPay resending the same body maps to the same row."""
+    entry, _created = PaymentWebhookInbox.objects.get_or_create(
+        body_digest=body_digest(body),
+        defaults={
+            "invoice_id": payload.get("invoice_id") or payload.get("invoiceId"),
+            "payload": payload,
+        },
+    )
+    return entry
+
+
+def claim_webhooks(*, batch_size: int = CLAIM_BATCH_SIZE) -> list[PaymentWebhookInbox]:
+    """Lease up to ``batch_size`` due rows; concurrent workers skip each other's locked rows.
+
+    A processing row whose lease ran out belongs to a worker that died mid-flight and is
+    claimed again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            PaymentWebhookInbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=PaymentWebhookInbox.STATUS_PENDING) | Q(status=PaymentWebhookInbox.STATUS_PROCESSING),
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not rows:
+            return []
+        lease_until = now + timezone.timedelta(seconds=settings.QPAY_WEBHOOK_LEASE_SECONDS)
+        PaymentWebhookInbox.objects.filter(id__in=[row.id for row in rows]).update(
+            status=PaymentWebhookInbox.STATUS_PROCESSING,
+            attempts=F("attempts") + 1,
+            next_attempt_at=lease_until,
+        )
+    for row in rows:
+        row.status = PaymentWebhookInbox.STATUS_PROCESSING
+        row.attempts += 1
+        row.next_attempt_at = lease_until
+    return rows
+
+
+def process_webhook(entry: PaymentWebhookInbox) -> str:
+    """Apply one claimed callback; returns the row's new status."""
+    try:
+        _apply(entry)
+    except CircuitOpenError as exc:
+        return _defer(entry, seconds=exc.retry_after, error=str(exc))
+    except RetryableWebhookError as exc:
+        if entry.attempts >= settings.QPAY_WEBHOOK_MAX_ATTEMPTS:
+            return _finish(entry, PaymentWebhookInbox.STATUS_DEAD, error=str(exc))
+        return _retry_later(entry, error=str(exc))
+    except DomainError as exc:
+        logger.warning("Webhook inbox row %s dead-lettered: %s", entry.id, exc)
+        return _finish(entry, PaymentWebhookInbox.STATUS_DEAD, error=str(exc))
+    except Exception as exc:  # noqa: BLE001 - keep the worker alive; the row is retried or dead-lettered
+        logger.exception("Webhook inbox row %s failed", entry.id)
+        if entry.attempts >= settings.QPAY_WEBHOOK_MAX_ATTEMPTS:
+            return _finish(entry, PaymentWebhookInbox.STATUS_DEAD, error=repr(exc))
+        return _retry_later(entry, error=repr(exc))
+    return _finish(entry, PaymentWebhookInbox.STATUS_DONE)
+
+
+def process_webhook_inbox(*, batch_size: int = CLAIM_BATCH_SIZE, max_batches: int | None = None) -> InboxRunStats:
+    """Drain due rows batch by batch until none are left (or ``max_batches`` is reached)."""
+    stats = InboxRunStats()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = claim_webhooks(batch_size=batch_size)
+        if not rows:
+            break
+        batches += 1
+        stats.claimed += len(rows)
+        for row in rows:
+            outcome = process_webhook(row)
+            if outcome == PaymentWebhookInbox.STATUS_DONE:
+                stats.done += 1
+            elif outcome == PaymentWebhookInbox.STATUS_DEAD:
+                stats.dead += 1
+            else:
+                stats.retried += 1
+    return stats
+
+
+def run_inbox_worker(*, batch_size: int = CLAIM_BATCH_SIZE, idle_seconds: float = 1.0, should_stop=None) -> None:
+    """Poll the inbox until ``should_stop()`` returns true; one call per worker process."""
+    while not (should_stop and should_stop()):
+        close_old_connections()
+        stats = process_webhook_inbox(batch_size=batch_size, max_batches=1)
+        if not stats.claimed:
+            time.sleep(idle_seconds)
+
+
+def retry_dead_webhooks(*, invoice_id: str | None = None) -> int:
+    """Put dead-lettered rows back in the queue with a fresh attempt budget."""
+    dead = PaymentWebhookInbox.objects.filter(status=PaymentWebhookInbox.STATUS_DEAD)
+    if invoice_id:
+        dead = dead.filter(invoice_id=invoice_id)
+    return dead.update(status=PaymentWebhookInbox.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now())
+
+
+def _apply(entry: PaymentWebhookInbox) -> None:
+    if known_final_status(entry.invoice_id):
+        return
+    payment = Payment.objects.filter(invoice_id=entry.invoice_id).first()
+    if payment is None:
+        raise DomainError("Unknown invoice")
+    if payment.status != Payment.STATUS_PENDING:
+        # Settled by an earlier callback or by expiry; nothing left to confirm with QPay.
+        known_final_status(entry.invoice_id, db_status=payment.status)
+        return
+
+    try:
+        verified = verify_invoice_payment_cached(entry.invoice_id, entry.payload, digest=entry.body_digest)
+    except (DomainError, requests.RequestException, ValueError) as exc:
+        raise RetryableWebhookError(f"QPay verification unavailable: {exc}") from exc
+
+    if not verified["is_paid"]:
+        mark_payment_failed(payment, reason="invoice_not_paid", raw_payload=verified)
+        return
+
+    payment = mark_payment_paid_and_hold_escrow(
+        invoice_id=entry.invoice_id,
+        paid_amount=verified["amount"],
+        verification_payload=verified,
+    )
+    if payment.status != Payment.STATUS_PAID:
+        logger.warning("Webhook payment marked as failed for invoice %s", entry.invoice_id)
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(
+        settings.QPAY_WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.QPAY_WEBHOOK_RETRY_MAX_SECONDS,
+    )
+
+
+def _retry_later(entry: PaymentWebhookInbox, *, error: str) -> str:
+    entry.status = PaymentWebhookInbox.STATUS_PENDING
+    entry.next_attempt_at = timezone.now() + timezone.timedelta(seconds=_retry_delay(entry.attempts))
+    entry.last_error = error
+    entry.save(update_fields=["status", "next_attempt_at", "last_error"])
+    return entry.status
+
+
+def _defer(entry: PaymentWebhookInbox, *, seconds: float, error: str) -> str:
+    """Park the row until QPay's circuit may close; the attempt it was claimed for is given back."""
+    entry.status = PaymentWebhookInbox.STATUS_PENDING
+    entry.attempts = max(entry.attempts - 1, 0)
+    entry.next_attempt_at = timezone.now() + timezone.timedelta(seconds=seconds)
+    entry.last_error = error
+    entry.save(update_fields=["status", "attempts", "next_attempt_at", "last_error"])
+    return entry.status
+
+
+def _finish(entry: PaymentWebhookInbox, status: str, *, error: str = "") -> str:
+    entry.status = status
+    entry.last_error = error
+    entry.processed_at = timezone.now()
+    entry.save(update_fields=["status", "last_error", "processed_at"])
+    return status
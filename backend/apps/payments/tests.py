@@ -1,13 +1,55 @@
-from django.test import TestCase
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from apps.accounts.models import User
 from apps.messaging.models import ProjectFile
-from apps.payments.models import Escrow, LedgerEntry
-from apps.payments.services import deposit_to_escrow
+from apps.payments.idempotency import execute_idempotent, idempotency_cache_key, purge_expired_idempotency_keys
+from apps.payments.models import (
+    AuditChainHead,
+    Dispute,
+    Escrow,
+    FinancialAuditLog,
+    IdempotencyKey,
+    LedgerAccount,
+    LedgerEntry,
+    Payment,
+    RevenueRollup,
+)
+from apps.payments.services import (
+    anchor_audit_chains,
+    approve_escrow,
+    confirm_completion,
+    create_dispute,
+    deposit_to_escrow,
+    escrow_balances,
+    is_escrow_funded,
+)
+from apps.payments.services.audit_service import (
+    GENESIS_HASH,
+    audit_payload,
+    link_hash,
+    merkle_leaf,
+    merkle_root,
+)
+from apps.payments.services.audit_verifier import verify_audit_log
+from apps.payments.services.ledger_reconciliation import ledger_reconciliation_stats, reconcile_ledger
+from apps.payments.services.ledger_service import backfill_ledger_postings
 from apps.projects.models import Project, ProjectDeliverable, Proposal
-from common.exceptions import DomainError
+from common.exceptions import ConflictError, DomainError
 
 
 class EscrowAbuseMatrixTests(TestCase):
@@ -157,6 +199,422 @@ class EscrowAbuseMatrixTests(TestCase):
         self.assertEqual(escrow.ledger_entries.filter(entry_type=LedgerEntry.TYPE_DEPOSIT).count(), 1)
 
 
+class AuditChainTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner-audit@test.com", role="client", password="pass1234")
+        self.freelancer = User.objects.create_user(email="freelancer-audit@test.com", role="freelancer", password="pass1234")
+        self.admin = User.objects.create_user(email="admin-audit@test.com", role="admin", password="pass1234")
+
+    def _project(self, price=400000):
+        project = Project.objects.create(
+            owner=self.owner,
+            title="Audit Project",
+            description="desc",
+            budget=price,
+            timeline_days=10,
+            category="web",
+            status=Project.STATUS_IN_PROGRESS,
+        )
+        proposal = Proposal.objects.create(
+            project=project, freelancer=self.freelancer, price=price, timeline_days=7, message="proposal"
+        )
+        project.selected_proposal = proposal
+        project.save(update_fields=["selected_proposal"])
+        return project
+
+    def test_each_escrow_gets_its_own_linked_chain(self):
+        first = deposit_to_escrow(self._project(), actor=self.owner)
+        second = deposit_to_escrow(self._project(), actor=self.owner)
+        approve_escrow(first, actor=self.admin)
+
+        first_chain = list(FinancialAuditLog.objects.filter(chain_key=f"escrow:{first.id}").order_by("chain_seq"))
+        second_chain = list(FinancialAuditLog.objects.filter(chain_key=f"escrow:{second.id}"))
+        self.assertEqual([entry.chain_seq for entry in first_chain], [1, 2])
+        self.assertEqual(first_chain[0].prev_hash, GENESIS_HASH)
+        self.assertEqual(first_chain[1].prev_hash, first_chain[0].hash_chain)
+        self.assertEqual(second_chain[0].prev_hash, GENESIS_HASH)
+        for entry in first_chain + second_chain:
+            self.assertEqual(entry.hash_chain, link_hash(entry.prev_hash, audit_payload(entry)))
+
+    def test_anchor_covers_advanced_heads_and_chains_to_previous(self):
+        escrow = deposit_to_escrow(self._project(), actor=self.owner)
+        deposit_to_escrow(self._project(), actor=self.owner)
+
+        anchor = anchor_audit_chains()
+        heads = AuditChainHead.objects.order_by("chain_key")
+        self.assertEqual(anchor.leaves, [[head.chain_key, head.seq] for head in heads])
+        self.assertEqual(anchor.merkle_root, merkle_root([merkle_leaf(h.chain_key, h.seq, h.last_hash) for h in heads]))
+        self.assertIsNone(anchor_audit_chains())
+
+        approve_escrow(escrow, actor=self.admin)
+        following = anchor_audit_chains()
+        self.assertEqual(following.prev_hash, anchor.hash_chain)
+        self.assertEqual(following.leaves, [[f"escrow:{escrow.id}", 2]])
+
+    def test_verifier_streams_chains_and_resumes_from_checkpoint(self):
+        escrow = deposit_to_escrow(self._project(), actor=self.owner)
+        deposit_to_escrow(self._project(), actor=self.owner)
+        anchor_audit_chains()
+
+        report = verify_audit_log(settle_seconds=0, segment_size=1)
+        self.assertIsNone(report.broken)
+        self.assertEqual(report.rows_verified, FinancialAuditLog.objects.count())
+        self.assertEqual(report.anchors_verified, 1)
+
+        approve_escrow(escrow, actor=self.admin)
+        resumed = verify_audit_log(resume=True, settle_seconds=0)
+        self.assertIsNone(resumed.broken)
+        self.assertEqual((resumed.rows_verified, resumed.anchors_verified), (1, 0))
+
+    def test_verifier_reports_first_broken_link_in_parallel_run(self):
+        escrow = deposit_to_escrow(self._project(), actor=self.owner)
+        approve_escrow(escrow, actor=self.admin)
+        deposit_to_escrow(self._project(), actor=self.owner)
+        tampered = FinancialAuditLog.objects.get(chain_key=f"escrow:{escrow.id}", chain_seq=2)
+        FinancialAuditLog.objects.filter(id=tampered.id).update(reason="edited")
+
+        report = verify_audit_log(workers=2, segment_size=1, settle_seconds=0)
+        self.assertEqual(report.broken.record_id, tampered.id)
+        self.assertEqual(report.rows_verified, 1)
+        with self.assertRaisesMessage(CommandError, f"log {tampered.id}"):
+            call_command("verify_audit_chain", "--workers=1", "--settle-seconds=0", stdout=StringIO())
+
+
+class LedgerAccountTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner-ledger@test.com", role="client", password="pass1234")
+        self.freelancer = User.objects.create_user(email="freelancer-ledger@test.com", role="freelancer", password="pass1234")
+        self.admin = User.objects.create_user(email="admin-ledger@test.com", role="admin", password="pass1234")
+        self.project = Project.objects.create(
+            owner=self.owner,
+            title="Ledger Project",
+            description="desc",
+            budget=1_000_000,
+            timeline_days=10,
+            category="web",
+            status=Project.STATUS_IN_PROGRESS,
+        )
+        proposal = Proposal.objects.create(
+            project=self.project, freelancer=self.freelancer, price=1_000_000, timeline_days=7, message="proposal"
+        )
+        self.project.selected_proposal = proposal
+        self.project.save(update_fields=["selected_proposal"])
+
+    def test_postings_keep_balances_and_funded_flag(self):
+        escrow = deposit_to_escrow(self.project, actor=self.owner)
+        self.assertTrue(is_escrow_funded(escrow))
+        with self.assertRaisesMessage(DomainError, "already funded"):
+            deposit_to_escrow(self.project, actor=self.owner)
+
+        approve_escrow(escrow, actor=self.admin)
+        Project.objects.filter(id=self.project.id).update(status=Project.STATUS_AWAITING_REVIEW)
+        escrow = confirm_completion(self.project, approved_by=self.owner)
+
+        balances = escrow_balances(escrow)
+        self.assertEqual(balances[LedgerAccount.KIND_CLIENT_FUNDS], -1_000_000)
+        self.assertEqual(balances[LedgerAccount.KIND_ESCROW_HELD], 0)
+        self.assertEqual(balances[LedgerAccount.KIND_PLATFORM_REVENUE], escrow.platform_fee_amount)
+        self.assertEqual(balances[LedgerAccount.KIND_FREELANCER_PAYABLE], escrow.freelancer_amount)
+        self.assertEqual(sum(balances.values()), 0)
+
+    def test_backfill_posts_legacy_entries_once(self):
+        escrow = Escrow.objects.create(project=self.project, amount=1_000_000, status=Escrow.STATUS_HELD)
+        LedgerEntry.objects.create(escrow=escrow, entry_type=LedgerEntry.TYPE_DEPOSIT, amount=1_000_000)
+        LedgerEntry.objects.create(escrow=escrow, entry_type=LedgerEntry.TYPE_REFUND, amount=1_000_000)
+        self.assertTrue(is_escrow_funded(escrow))
+
+        self.assertEqual(backfill_ledger_postings(batch_size=1), 2)
+        self.assertEqual(backfill_ledger_postings(), 0)
+        self.assertTrue(is_escrow_funded(escrow))
+        self.assertEqual(escrow_balances(escrow)[LedgerAccount.KIND_ESCROW_HELD], 0)
+
+        client_api = APIClient()
+        client_api.force_authenticate(self.admin)
+        response = client_api.get(f"/api/v1/admin/escrow/{escrow.id}/ledger")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(posting["debit"], posting["credit"]) for posting in response.json()["postings"]],
+            [("escrow_held", "client_funds"), ("client_funds", "escrow_held")],
+        )
+
+    def test_reconcile_ledger_passes_on_consistent_books(self):
+        escrow = deposit_to_escrow(self.project, actor=self.owner)
+        approve_escrow(escrow, actor=self.admin)
+        Project.objects.filter(id=self.project.id).update(status=Project.STATUS_AWAITING_REVIEW)
+        confirm_completion(self.project, approved_by=self.owner)
+        Payment.objects.create(project=self.project, invoice_id="inv-recon-ok", amount=1_000_000, status=Payment.STATUS_PAID)
+
+        report = reconcile_ledger(chunk_size=1)
+
+        self.assertEqual(report.escrows, 1)
+        self.assertEqual(report.mismatch_total, 0)
+        self.assertEqual(report.mismatches, [])
+        self.assertEqual(ledger_reconciliation_stats()["last_run"], report.as_dict())
+
+    def test_reconcile_ledger_reports_each_broken_invariant(self):
+        escrow = deposit_to_escrow(self.project, actor=self.owner)
+        Escrow.objects.filter(id=escrow.id).update(status=Escrow.STATUS_RELEASED, platform_fee_amount=1)
+        Payment.objects.create(project=self.project, invoice_id="inv-recon-short", amount=900_000, status=Payment.STATUS_PAID)
+        other = Project.objects.create(
+            owner=self.owner, title="Other", description="desc", budget=500, timeline_days=3, category="web"
+        )
+        overdrawn = Escrow.objects.create(project=other, amount=500, status=Escrow.STATUS_HELD)
+        LedgerEntry.objects.create(escrow=overdrawn, entry_type=LedgerEntry.TYPE_DEPOSIT, amount=500)
+        LedgerEntry.objects.create(escrow=overdrawn, entry_type=LedgerEntry.TYPE_REFUND, amount=600)
+
+        with self.assertLogs("apps.payments.services.ledger_reconciliation", level="WARNING"):
+            report = reconcile_ledger(chunk_size=1, max_reported=3)
+
+        self.assertEqual(report.chunks, 2)
+        self.assertEqual(
+            {check: count for check, count in report.mismatch_counts.items() if count},
+            {"fee_split": 1, "closed_with_balance": 1, "payment_vs_escrow": 1, "overdrawn": 1},
+        )
+        self.assertEqual(len(report.mismatches), 3)
+        self.assertIn(
+            (escrow.id, "payment_vs_escrow", 1_000_000, 900_000),
+            [(m.escrow_id, m.check, m.expected, m.actual) for m in report.mismatches],
+        )
+
+        stdout, stderr = StringIO(), StringIO()
+        with self.assertRaisesMessage(CommandError, "4 ledger mismatches"), self.assertLogs(level="WARNING"):
+            call_command("reconcile_ledger", "--fail-on-mismatch", stdout=stdout, stderr=stderr)
+        self.assertIn(f"escrow {overdrawn.id} (project {other.id}) overdrawn: expected 500, got 600", stderr.getvalue())
+
+
+class RevenueRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email="owner-rollup@test.com", role="client", password="pass1234")
+        self.freelancer = User.objects.create_user(email="freelancer-rollup@test.com", role="freelancer", password="pass1234")
+        self.admin = User.objects.create_user(email="admin-rollup@test.com", role="admin", password="pass1234")
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.admin)
+
+    def _funded_project(self, category: str, price: int) -> Project:
+        project = Project.objects.create(
+            owner=self.owner,
+            title=f"{category} project",
+            description="desc",
+            budget=price,
+            timeline_days=10,
+            category=category,
+            status=Project.STATUS_IN_PROGRESS,
+        )
+        proposal = Proposal.objects.create(
+            project=project, freelancer=self.freelancer, price=price, timeline_days=7, message="proposal"
+        )
+        project.selected_proposal = proposal
+        project.save(update_fields=["selected_proposal"])
+        approve_escrow(deposit_to_escrow(project, actor=self.owner), actor=self.admin)
+        return project
+
+    def _rollups(self, day):
+        return list(
+            RevenueRollup.objects.filter(day=day)
+            .order_by("category")
+            .values_list("category", "gross_volume", "deposits", "platform_fees", "releases", "refunds", "disputes")
+        )
+
+    def test_postings_and_disputes_update_rollups_and_rebuild_matches(self):
+        today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            web = self._funded_project("web", 1_000_000)
+            Project.objects.filter(id=web.id).update(status=Project.STATUS_AWAITING_REVIEW)
+            escrow = confirm_completion(web, approved_by=self.owner)
+            design = self._funded_project("design", 400_000)
+            create_dispute(design, raised_by=self.owner, reason="late", evidence_files=[])
+
+        expected = [
+            ("design", 400_000, 1, 0, 0, 0, 1),
+            ("web", 1_000_000, 1, escrow.platform_fee_amount, escrow.freelancer_amount, 0, 0),
+        ]
+        self.assertEqual(self._rollups(today), expected)
+
+        with self.assertRaisesMessage(CommandError, "Only days before today"):
+            call_command("backfill_revenue_rollups", "--until", today.isoformat(), stdout=StringIO())
+
+        # Rebuilds cover finished days only, so move the history to yesterday.
+        LedgerEntry.objects.update(created_at=F("created_at") - timedelta(days=1))
+        Dispute.objects.update(created_at=F("created_at") - timedelta(days=1))
+        call_command("backfill_revenue_rollups", stdout=StringIO())
+        self.assertEqual(self._rollups(today - timedelta(days=1)), expected)
+        self.assertEqual(self._rollups(today), expected)
+
+        response = self.client_api.get("/api/v1/admin/reports/revenue/categories")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["category"] for row in response.json()["categories"]], ["web", "design"])
+        self.assertEqual(response.json()["totals"]["gross_volume"], 2_800_000)
+        self.assertEqual(response.json()["totals"]["dispute_rate"], 0.5)
+
+    def test_rollup_increments_wait_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self._funded_project("web", 1_000_000)
+        self.assertFalse(RevenueRollup.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._rollups(timezone.localdate()), [("web", 1_000_000, 1, 0, 0, 0, 0)])
+
+    def test_revenue_report_reads_cached_rollups_until_a_posting(self):
+        today = timezone.localdate()
+        url = f"/api/v1/admin/reports/revenue?from={(today - timedelta(days=2)).isoformat()}&to={today.isoformat()}"
+        with self.captureOnCommitCallbacks(execute=True):
+            self._funded_project("web", 1_000_000)
+
+        response = self.client_api.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([day["gross_volume"] for day in response.json()["days"]], [0, 0, 1_000_000])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client_api.get(url).json(), response.json())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._funded_project("design", 500_000)
+        self.assertEqual(self.client_api.get(url).json()["totals"]["gross_volume"], 1_500_000)
+
+    def test_revenue_report_rejects_bad_ranges(self):
+        for query in ("from=yesterday", "from=2026-02-01&to=2026-01-01", "from=2024-01-01&to=2026-01-01"):
+            response = self.client_api.get(f"/api/v1/admin/reports/revenue?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+
+class IdempotencyStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.actor = User.objects.create_user(email="client-idem@test.com", role="client", password="pass1234")
+        self.calls = 0
+
+    def _request(self, key):
+        return SimpleNamespace(headers={"Idempotency-Key": key})
+
+    def _executor(self):
+        self.calls += 1
+        return {"call": self.calls}, status.HTTP_201_CREATED
+
+    def test_recent_replay_is_served_from_cache_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = execute_idempotent(self._request("k-1"), "POST:/x", self.actor, self._executor)
+
+        with self.assertNumQueries(0):
+            replay = execute_idempotent(self._request("k-1"), "POST:/x", self.actor, self._executor)
+        self.assertEqual(replay, first)
+        self.assertEqual(self.calls, 1)
+
+    def test_cache_miss_falls_back_to_postgres_and_rewarms(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = execute_idempotent(self._request("k-2"), "POST:/x", self.actor, self._executor)
+        cache.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(execute_idempotent(self._request("k-2"), "POST:/x", self.actor, self._executor), first)
+        self.assertIsNotNone(cache.get(idempotency_cache_key(self.actor.id, "POST:/x", "k-2")))
+        self.assertEqual(self.calls, 1)
+
+    def test_uncommitted_response_is_not_cached(self):
+        execute_idempotent(self._request("k-3"), "POST:/x", self.actor, self._executor)
+        self.assertIsNone(cache.get(idempotency_cache_key(self.actor.id, "POST:/x", "k-3")))
+
+    def test_purge_deletes_expired_keys_in_chunks_per_endpoint(self):
+        old = timezone.now() - timedelta(days=8)
+        for endpoint in ("POST:/a", "POST:/b"):
+            for index in range(3):
+                IdempotencyKey.objects.create(actor=self.actor, endpoint=endpoint, key=f"old-{index}", response_hash="h")
+            IdempotencyKey.objects.create(actor=self.actor, endpoint=endpoint, key="recent", response_hash="h")
+        IdempotencyKey.objects.exclude(key="recent").update(created_at=old)
+
+        progress = []
+        deleted = purge_expired_idempotency_keys(retention_days=7, chunk_size=2, progress=progress.append)
+
+        self.assertEqual(deleted, 6)
+        self.assertEqual(progress, [2, 3, 5, 6])
+        self.assertEqual(sorted(IdempotencyKey.objects.values_list("key", flat=True)), ["recent", "recent"])
+
+        out = StringIO()
+        call_command("purge_idempotency_keys", "--retention-days", "0", stdout=out)
+        self.assertIn("Deleted 2 expired idempotency keys.", out.getvalue())
+
+
+class IdempotencyReservationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.actor = User.objects.create_user(email="client-reserve@test.com", role="client", password="pass1234")
+        self.request = SimpleNamespace(headers={"Idempotency-Key": "reserve-1"})
+
+    def _pending(self, *, seconds_ago: int):
+        return IdempotencyKey.objects.create(
+            actor=self.actor,
+            endpoint="POST:/x",
+            key="reserve-1",
+            state=IdempotencyKey.STATE_PENDING,
+            reserved_at=timezone.now() - timedelta(seconds=seconds_ago),
+            response_hash="",
+        )
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.1)
+    def test_duplicate_of_in_flight_request_gets_conflict(self):
+        self._pending(seconds_ago=1)
+        executor = Mock(return_value=({}, 201))
+        with self.assertRaises(ConflictError) as raised:
+            execute_idempotent(self.request, "POST:/x", self.actor, executor)
+        self.assertEqual(raised.exception.status_code, status.HTTP_409_CONFLICT)
+        executor.assert_not_called()
+
+    def test_stale_reservation_is_taken_over(self):
+        self._pending(seconds_ago=600)
+        result = execute_idempotent(self.request, "POST:/x", self.actor, lambda: ({"ok": True}, 201))
+        self.assertEqual(result, ({"ok": True}, 201))
+        record = IdempotencyKey.objects.get(key="reserve-1")
+        self.assertEqual((record.state, record.response_body), (IdempotencyKey.STATE_COMPLETED, {"ok": True}))
+
+    def test_failed_execution_releases_the_key(self):
+        with self.assertRaises(DomainError):
+            execute_idempotent(self.request, "POST:/x", self.actor, Mock(side_effect=DomainError("boom")))
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(execute_idempotent(self.request, "POST:/x", self.actor, lambda: ({}, 200)), ({}, 200))
+
+    def test_key_released_while_reserving_is_reserved_again(self):
+        create = IdempotencyKey.objects.create
+        calls = []
+
+        def _lose_race_once(**kwargs):
+            calls.append(kwargs["key"])
+            if len(calls) == 1:
+                # Another request held the key and released it before our read.
+                raise IntegrityError("duplicate key value violates unique constraint")
+            return create(**kwargs)
+
+        with patch.object(IdempotencyKey.objects, "create", side_effect=_lose_race_once):
+            result = execute_idempotent(self.request, "POST:/x", self.actor, lambda: ({"ok": True}, 201))
+        self.assertEqual(result, ({"ok": True}, 201))
+        self.assertEqual(len(calls), 2)
+
+
+class IdempotencyConcurrencyTests(TransactionTestCase):
+    def test_concurrent_duplicates_execute_once_and_replay(self):
+        cache.clear()
+        actor = User.objects.create_user(email="client-concurrent@test.com", role="client", password="pass1234")
+        request = SimpleNamespace(headers={"Idempotency-Key": "concurrent-1"})
+        calls = []
+        barrier = threading.Barrier(4)
+
+        def _executor():
+            calls.append(1)
+            time.sleep(0.3)
+            return {"invoice": len(calls)}, 201
+
+        def _call(_index):
+            barrier.wait()
+            try:
+                return execute_idempotent(request, "POST:/api/v1/payments/create/", actor, _executor)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(_call, range(4)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [({"invoice": 1}, 201)] * 4)
+
+
 class CacheInvalidationSmokeTests(TestCase):
     def setUp(self):
         self.client_api = APIClient()
@@ -175,7 +633,8 @@ class CacheInvalidationSmokeTests(TestCase):
         first_ids = [item["id"] for item in first.json()["results"]]
         self.assertIn(target.id, first_ids)
 
-        verify = self.client_api.post(f"/api/v1/admin/users/{target.id}/verify", format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            verify = self.client_api.post(f"/api/v1/admin/users/{target.id}/verify", format="json")
         self.assertEqual(verify.status_code, status.HTTP_200_OK)
 
         second = self.client_api.get("/api/v1/admin/users", {"verified": "false"})
@@ -190,17 +649,18 @@ class CacheInvalidationSmokeTests(TestCase):
         before_count = first.json()["count"]
 
         self.client_api.force_authenticate(self.owner)
-        create = self.client_api.post(
-            "/api/v1/projects",
-            {
-                "title": "Cache Project",
-                "description": "cache test",
-                "budget": 120000,
-                "timeline_days": 7,
-                "category": "web",
-            },
-            format="json",
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            create = self.client_api.post(
+                "/api/v1/projects",
+                {
+                    "title": "Cache Project",
+                    "description": "cache test",
+                    "budget": 120000,
+                    "timeline_days": 7,
+                    "category": "web",
+                },
+                format="json",
+            )
         self.assertEqual(create.status_code, status.HTTP_201_CREATED)
 
         self.client_api.force_authenticate(self.admin)
@@ -215,7 +675,8 @@ class CacheInvalidationSmokeTests(TestCase):
         self.assertEqual(first.status_code, status.HTTP_200_OK)
         self.assertEqual(first.json()["full_name"], "")
 
-        patch = self.client_api.patch("/api/v1/profiles/me", {"full_name": "Cache Updated"}, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            patch = self.client_api.patch("/api/v1/profiles/me", {"full_name": "Cache Updated"}, format="json")
         self.assertEqual(patch.status_code, status.HTTP_200_OK)
 
         second = self.client_api.get("/api/v1/profiles/me")
@@ -252,11 +713,12 @@ class CacheInvalidationSmokeTests(TestCase):
         self.assertEqual(reviews_before.json()["count"], 0)
 
         self.client_api.force_authenticate(self.owner)
-        create = self.client_api.post(
-            f"/api/v1/projects/{project.id}/reviews",
-            {"rating": 5, "comment": "great"},
-            format="json",
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            create = self.client_api.post(
+                f"/api/v1/projects/{project.id}/reviews",
+                {"rating": 5, "comment": "great"},
+                format="json",
+            )
         self.assertEqual(create.status_code, status.HTTP_201_CREATED)
 
         summary_after = self.client_api.get(f"/api/v1/users/{self.freelancer.id}/rating-summary")
@@ -1,16 +1,51 @@
+import hashlib
+import hmac
+import importlib
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 from unittest.mock import patch
 
-from django.test import TestCase, override_settings
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from apps.accounts.models import User
-from apps.payments.models import Escrow, LedgerEntry, Payment
-from apps.payments.services.qpay_service import QPayInvoice
-from apps.payments.services import calculate_commission, mark_payment_paid_and_hold_escrow
+from apps.payments.models import Escrow, LedgerEntry, Payment, PaymentInvoiceArtifact, PaymentWebhookInbox
+from apps.payments.services import status_events
+from apps.payments.services.qpay_service import (
+    TOKEN_CACHE_KEY,
+    TOKEN_REFRESH_LOCK_KEY,
+    TOKEN_REFRESH_MARGIN_SECONDS,
+    QPayClient,
+    QPayInvoice,
+    QPayLatencyRecorder,
+    breaker,
+    qpay_breaker_stats,
+)
+from apps.payments.services.reconciliation import RateLimiter, reconcile_pending_payments
+from apps.payments.services.webhook_cache import reset_webhook_verification_stats, webhook_verification_stats
+from apps.payments.services.webhook_inbox import claim_webhooks, enqueue_webhook, retry_dead_webhooks
+from apps.payments.services import (
+    calculate_commission,
+    create_pending_invoices,
+    expire_stale_pending_payments,
+    mark_payment_failed,
+    mark_payment_paid_and_hold_escrow,
+    process_webhook_inbox,
+)
 from apps.projects.models import Project, Proposal
+from common.circuit_breaker import CircuitOpenError
+from common.exceptions import DomainError
 
 
 class QPayIntegrationTests(TestCase):
@@ -65,17 +100,23 @@ class QPayIntegrationTests(TestCase):
         self.assertEqual(create_response.status_code, status.HTTP_201_CREATED)
 
         with override_settings(DEBUG=True):
-            with patch("apps.payments.views.verify_webhook") as verify_mock:
-                verify_mock.return_value = {
-                    "invoice_id": "inv-100",
-                    "is_paid": True,
-                    "amount": 1_000_000,
-                    "payload": {"invoice_id": "inv-100"},
-                    "verification": {"status": "paid", "amount": 1_000_000},
-                }
+            with patch("apps.payments.views.authenticate_webhook", return_value={"invoice_id": "inv-100"}):
                 webhook_response = self.client_api.post("/api/v1/payments/webhook/", data={"invoice_id": "inv-100"}, format="json")
 
-        self.assertEqual(webhook_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(webhook_response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Payment.objects.get(invoice_id="inv-100").status, Payment.STATUS_PENDING)
+
+        with patch("apps.payments.services.webhook_cache.verify_invoice_payment") as verify_mock:
+            verify_mock.return_value = {
+                "invoice_id": "inv-100",
+                "is_paid": True,
+                "amount": 1_000_000,
+                "payload": {"invoice_id": "inv-100"},
+                "verification": {"status": "paid", "amount": 1_000_000},
+            }
+            stats = process_webhook_inbox()
+
+        self.assertEqual(stats.done, 1)
         payment = Payment.objects.get(invoice_id="inv-100")
         escrow = Escrow.objects.get(project=self.project)
         self.assertEqual(payment.status, Payment.STATUS_PAID)
@@ -117,18 +158,1031 @@ class QPayIntegrationTests(TestCase):
         payment.refresh_from_db()
         self.assertEqual(payment.status, Payment.STATUS_FAILED)
 
-    def test_invoice_expired_status_check_marks_failed(self):
+    def test_status_check_is_read_only_and_expiry_job_fails_lapsed_invoice(self):
         payment = Payment.objects.create(project=self.project, invoice_id="inv-expired", amount=1_000_000, status=Payment.STATUS_PENDING)
-        Payment.objects.filter(id=payment.id).update(created_at=timezone.now() - timedelta(minutes=31))
+        Payment.objects.filter(id=payment.id).update(created_at=timezone.now() - timedelta(minutes=121))
 
         self.client_api.force_authenticate(self.client_user)
-        response = self.client_api.get(f"/api/v1/payments/status/{self.project.id}")
+        url = f"/api/v1/payments/status/{self.project.id}"
+        response = self.client_api.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.STATUS_PENDING)
 
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_stale_pending_payments(), 1)
         payment.refresh_from_db()
         self.assertEqual(payment.status, Payment.STATUS_FAILED)
+        self.assertEqual(payment.raw_response["failure_reason"], "invoice_expired")
+
+        expired = self.client_api.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(expired.status_code, status.HTTP_200_OK)
+        self.assertEqual(expired.json()["failure_reason"], "invoice_expired")
+
+    def test_expiry_job_works_in_chunks_and_reports_progress(self):
+        stale = timezone.now() - timedelta(minutes=150)
+        for index in range(5):
+            Payment.objects.create(project=self.project, invoice_id=f"inv-stale-{index}", amount=1_000_000)
+        Payment.objects.create(project=self.project, invoice_id="inv-fresh", amount=1_000_000)
+        Payment.objects.create(
+            project=self.project, invoice_id="inv-done", amount=1_000_000, status=Payment.STATUS_PAID
+        )
+        Payment.objects.exclude(invoice_id="inv-fresh").update(created_at=stale)
+
+        seen = []
+        self.assertEqual(expire_stale_pending_payments(chunk_size=2, progress=seen.append), 5)
+        self.assertEqual(seen, [2, 4, 5])
+        statuses = dict(Payment.objects.values_list("invoice_id", "status"))
+        self.assertEqual(statuses["inv-fresh"], Payment.STATUS_PENDING)
+        self.assertEqual(statuses["inv-done"], Payment.STATUS_PAID)
+        self.assertEqual(Payment.objects.filter(status=Payment.STATUS_FAILED).count(), 5)
+
+    def test_payment_status_etag_is_bound_to_user_and_version(self):
+        outsider = User.objects.create_user(email="outsider-qpay@test.com", role="client", password="pass1234")
+        Payment.objects.create(project=self.project, invoice_id="inv-etag", amount=1_000_000)
+        url = f"/api/v1/payments/status/{self.project.id}"
+
+        self.client_api.force_authenticate(self.client_user)
+        first = self.client_api.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn("private", first["Cache-Control"])
+        repeat = self.client_api.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(repeat.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client_api.force_authenticate(outsider)
+        forbidden = self.client_api.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(forbidden.status_code, status.HTTP_403_FORBIDDEN)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_payment_paid_and_hold_escrow(invoice_id="inv-etag", paid_amount=1_000_000, verification_payload={})
+        self.client_api.force_authenticate(self.client_user)
+        paid = self.client_api.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(paid.status_code, status.HTTP_200_OK)
+        self.assertEqual(paid.json()["status"], Payment.STATUS_PAID)
 
     def test_commission_calculation_correct(self):
         platform_fee, freelancer_amount = calculate_commission(1_000_000)
         self.assertEqual(platform_fee, 120_000)
         self.assertEqual(freelancer_amount, 880_000)
+
+
+@override_settings(DEBUG=True, QPAY_WEBHOOK_SECRET="secret", QPAY_WEBHOOK_MAX_ATTEMPTS=2)
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        owner = User.objects.create_user(email="client-inbox@test.com", role="client", password="pass1234")
+        self.project = Project.objects.create(
+            owner=owner,
+            title="Inbox Project",
+            description="Webhook inbox test",
+            budget=500_000,
+            timeline_days=5,
+            category="web",
+            status=Project.STATUS_IN_PROGRESS,
+        )
+        self.payment = Payment.objects.create(project=self.project, invoice_id="inv-inbox", amount=500_000)
+
+    def _post_signed(self, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        signature = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+        return self.client_api.post(
+            "/api/v1/payments/webhook/",
+            data=body,
+            content_type="application/json",
+            HTTP_X_QPAY_SIGNATURE=f"sha256={signature}",
+        )
+
+    def _verified(self, *, is_paid=True, amount=500_000):
+        return {"invoice_id": "inv-inbox", "is_paid": is_paid, "amount": amount, "payload": {}, "verification": {}}
+
+    def test_signed_callback_is_stored_once_and_acknowledged_without_qpay(self):
+        with patch("apps.payments.services.qpay_service.get_invoice_status") as status_mock:
+            first = self._post_signed({"invoice_id": "inv-inbox"})
+            second = self._post_signed({"invoice_id": "inv-inbox"})
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.json()["inbox_id"], first.json()["inbox_id"])
+        self.assertEqual(PaymentWebhookInbox.objects.count(), 1)
+        status_mock.assert_not_called()
+
+    def test_unknown_invoice_is_rejected_before_queueing(self):
+        response = self._post_signed({"invoice_id": "inv-missing"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PaymentWebhookInbox.objects.exists())
+
+    def test_qpay_outage_is_retried_with_backoff_then_dead_lettered(self):
+        self._post_signed({"invoice_id": "inv-inbox"})
+        with patch(
+            "apps.payments.services.webhook_cache.verify_invoice_payment",
+            side_effect=DomainError("QPay payment verification failed"),
+        ):
+            stats = process_webhook_inbox()
+            entry = PaymentWebhookInbox.objects.get()
+            self.assertEqual((stats.retried, entry.status, entry.attempts), (1, PaymentWebhookInbox.STATUS_PENDING, 1))
+            self.assertGreater(entry.next_attempt_at, timezone.now())
+
+            # Not due yet, so a second pass leaves it alone.
+            self.assertEqual(process_webhook_inbox().claimed, 0)
+            PaymentWebhookInbox.objects.update(next_attempt_at=timezone.now())
+            stats = process_webhook_inbox()
+
+        entry.refresh_from_db()
+        self.assertEqual((stats.dead, entry.status), (1, PaymentWebhookInbox.STATUS_DEAD))
+        self.assertIn("QPay verification unavailable", entry.last_error)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PENDING)
+
+        self.assertEqual(retry_dead_webhooks(invoice_id="inv-inbox"), 1)
+        with patch("apps.payments.services.webhook_cache.verify_invoice_payment", return_value=self._verified()):
+            self.assertEqual(process_webhook_inbox().done, 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PAID)
+
+    def test_open_circuit_defers_verification_without_spending_attempts(self):
+        self._post_signed({"invoice_id": "inv-inbox"})
+        with patch(
+            "apps.payments.services.webhook_cache.verify_invoice_payment",
+            side_effect=CircuitOpenError("qpay", 30),
+        ):
+            for _ in range(3):
+                PaymentWebhookInbox.objects.update(next_attempt_at=timezone.now())
+                self.assertEqual(process_webhook_inbox().retried, 1)
+
+        entry = PaymentWebhookInbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), (PaymentWebhookInbox.STATUS_PENDING, 0))
+        self.assertGreater(entry.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        self.assertIn("unavailable", entry.last_error)
+
+    def test_expired_lease_is_reclaimed(self):
+        self._post_signed({"invoice_id": "inv-inbox"})
+        claimed = claim_webhooks()
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claim_webhooks(), [])
+
+        PaymentWebhookInbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with patch("apps.payments.services.webhook_cache.verify_invoice_payment", return_value=self._verified()):
+            stats = process_webhook_inbox()
+        self.assertEqual(stats.done, 1)
+        self.assertEqual(PaymentWebhookInbox.objects.get().attempts, 2)
+
+    def test_unpaid_invoice_fails_payment_and_settled_payment_skips_qpay(self):
+        self._post_signed({"invoice_id": "inv-inbox", "attempt": 1})
+        with patch(
+            "apps.payments.services.webhook_cache.verify_invoice_payment",
+            return_value=self._verified(is_paid=False),
+        ):
+            process_webhook_inbox()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_FAILED)
+
+        # A row queued before the payment settled is finished without asking QPay.
+        enqueue_webhook(body=b'{"invoice_id": "inv-inbox", "attempt": 2}', payload={"invoice_id": "inv-inbox"})
+        with patch("apps.payments.services.webhook_cache.verify_invoice_payment") as verify_mock:
+            stats = process_webhook_inbox()
+        verify_mock.assert_not_called()
+        self.assertEqual(stats.done, 1)
+
+    def test_callbacks_for_settled_invoices_are_answered_without_queueing(self):
+        reset_webhook_verification_stats()
+        Payment.objects.filter(id=self.payment.id).update(status=Payment.STATUS_PAID)
+
+        first = self._post_signed({"invoice_id": "inv-inbox", "attempt": 1})
+        second = self._post_signed({"invoice_id": "inv-inbox", "attempt": 2})
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json(), {"accepted": True, "status": Payment.STATUS_PAID})
+        self.assertFalse(PaymentWebhookInbox.objects.exists())
+        stats = webhook_verification_stats()
+        self.assertEqual((stats["final_db_hits"], stats["final_cache_hits"], stats["calls_avoided"]), (1, 1, 2))
+
+        admin = User.objects.create_user(email="admin-ops@test.com", role="admin", password="pass1234")
+        ops_client = APIClient()
+        ops_client.force_authenticate(admin)
+        response = ops_client.get("/api/v1/admin/ops/qpay")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["webhook_verification"], stats)
+
+    def test_settling_a_payment_caches_its_final_status_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_payment_failed(self.payment, reason="invoice_expired")
+
+        with patch("apps.payments.views.Payment.objects") as payments:
+            response = self._post_signed({"invoice_id": "inv-inbox"})
+        payments.filter.assert_not_called()
+        self.assertEqual(response.json()["status"], Payment.STATUS_FAILED)
+
+    @override_settings(QPAY_WEBHOOK_CACHE_SECONDS=60)
+    def test_paid_verification_is_reused_when_settlement_is_retried(self):
+        self._post_signed({"invoice_id": "inv-inbox"})
+        with patch(
+            "apps.payments.services.webhook_cache.verify_invoice_payment", return_value=self._verified()
+        ) as verify_mock:
+            with patch(
+                "apps.payments.services.webhook_inbox.mark_payment_paid_and_hold_escrow",
+                side_effect=RuntimeError("database hiccup"),
+            ):
+                self.assertEqual(process_webhook_inbox().retried, 1)
+            PaymentWebhookInbox.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(process_webhook_inbox().done, 1)
+
+        self.assertEqual(verify_mock.call_count, 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PAID)
+
+    def test_unpaid_verification_is_not_cached(self):
+        self._post_signed({"invoice_id": "inv-inbox"})
+        with patch(
+            "apps.payments.services.webhook_cache.verify_invoice_payment",
+            return_value=self._verified(is_paid=False),
+        ) as verify_mock:
+            with patch(
+                "apps.payments.services.webhook_inbox.mark_payment_failed",
+                side_effect=RuntimeError("database hiccup"),
+            ):
+                process_webhook_inbox()
+            PaymentWebhookInbox.objects.update(next_attempt_at=timezone.now())
+            process_webhook_inbox()
+        self.assertEqual(verify_mock.call_count, 2)
+
+
+class StubQPayServer:
+    """Local stand-in for the QPay API: scripted responses per path, plus request and connection counts."""
+
+    def __init__(self, auth_delay: float = 0.0):
+        self.auth_delay = auth_delay
+        self.check_delay = 0.0
+        self.invoices = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.scripts = {}
+        self.hits = Counter()
+        self.ports = set()
+        self.tokens_issued = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request_body = json.loads(self.rfile.read(length) or b"{}")
+                status_code, payload = stub.respond(self.path, self.headers, self.client_address[1], request_body)
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def script(self, path: str, *responses):
+        self.scripts[path] = list(responses)
+
+    def respond(self, path, headers, port, body):
+        with self._lock:
+            self.hits[path] += 1
+            self.ports.add(port)
+            scripted = self.scripts.get(path)
+            if scripted:
+                return scripted.pop(0)
+        if path == "/v2/auth/token":
+            time.sleep(self.auth_delay)
+            with self._lock:
+                self.tokens_issued += 1
+                return 200, {"access_token": f"token-{self.tokens_issued}", "expires_in": 3600}
+        if path == "/v2/payment/check":
+            return self._check(body.get("invoice_id"), headers)
+        return 200, {"invoice_id": "inv-stub", "qr_text": "qpay://stub"}
+
+    def _check(self, invoice_id, headers):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.check_delay)
+            scripted = self.invoices.get(invoice_id, (200, {"payment_status": "PAID", "amount": 500_000}))
+            status_code, payload = scripted
+            return status_code, {**payload, "token": headers.get("Authorization")}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class QPayClientTests(SimpleTestCase):
+    def setUp(self):
+        cache.delete(TOKEN_CACHE_KEY)
+        cache.delete(TOKEN_REFRESH_LOCK_KEY)
+        breaker.reset()
+        self.stub = StubQPayServer()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        settings_override = override_settings(
+            QPAY_BASE_URL=self.stub.base_url,
+            QPAY_USERNAME="merchant",
+            QPAY_PASSWORD="secret",
+            QPAY_HTTP_RETRY_BASE_SECONDS=0.01,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.recorder = QPayLatencyRecorder()
+        self.client = QPayClient(recorder=self.recorder)
+        self.addCleanup(self.client.close)
+
+    def test_calls_reuse_one_connection_and_one_token(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get_invoice_status("inv-1")["token"], "Bearer token-1")
+
+        self.assertEqual(self.stub.hits["/v2/auth/token"], 1)
+        self.assertEqual(self.stub.hits["/v2/payment/check"], 3)
+        self.assertEqual(len(self.stub.ports), 1)
+        stats = self.recorder.snapshot()
+        self.assertEqual(stats["payment_check"]["calls"], 3)
+        self.assertEqual(stats["auth_token"]["calls"], 1)
+        self.assertGreater(stats["payment_check"]["max_ms"], 0)
+
+    def test_idempotent_call_retries_transient_errors(self):
+        self.stub.script("/v2/payment/check", (503, {}), (502, {}))
+        self.assertEqual(self.client.get_invoice_status("inv-1")["payment_status"], "PAID")
+        self.assertEqual(self.stub.hits["/v2/payment/check"], 3)
+        self.assertEqual(self.recorder.snapshot()["payment_check"]["retries"], 2)
+
+        self.stub.script("/v2/payment/check", (503, {}), (503, {}), (503, {}))
+        with self.assertRaisesMessage(DomainError, "QPay payment verification failed"):
+            self.client.get_invoice_status("inv-1")
+        self.assertEqual(self.recorder.snapshot()["payment_check"]["errors"], 1)
+
+    def test_invoice_creation_is_not_retried(self):
+        self.stub.script("/v2/invoice", (503, {}))
+        project = SimpleNamespace(id=7, title="Stub")
+        with self.assertRaisesMessage(DomainError, "QPay invoice creation failed"):
+            self.client.create_invoice(project=project, amount=500_000, callback_url="https://example.test/cb")
+        self.assertEqual(self.stub.hits["/v2/invoice"], 1)
+
+    def test_rejected_token_is_renewed_once(self):
+        self.client.authenticate()
+        self.stub.script("/v2/payment/check", (401, {}))
+        self.assertEqual(self.client.get_invoice_status("inv-1")["token"], "Bearer token-2")
+        self.assertEqual(self.stub.hits["/v2/auth/token"], 2)
+
+    def test_cold_cache_refresh_is_single_flight(self):
+        self.stub.auth_delay = 0.2
+        clients = [QPayClient(recorder=self.recorder) for _ in range(4)]
+        for client in clients:
+            self.addCleanup(client.close)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            tokens = list(pool.map(lambda index: clients[index % 4].authenticate(), range(8)))
+
+        self.assertEqual(set(tokens), {"token-1"})
+        self.assertEqual(self.stub.hits["/v2/auth/token"], 1)
+
+    def test_token_is_renewed_early_but_not_before(self):
+        cache.set(TOKEN_CACHE_KEY, {"token": "cached", "expires_at": time.time() + TOKEN_REFRESH_MARGIN_SECONDS + 60})
+        self.assertEqual(self.client.authenticate(), "cached")
+        self.assertEqual(self.stub.hits["/v2/auth/token"], 0)
+
+        fresh_client = QPayClient(recorder=self.recorder)
+        self.addCleanup(fresh_client.close)
+        cache.set(TOKEN_CACHE_KEY, {"token": "cached", "expires_at": time.time() + TOKEN_REFRESH_MARGIN_SECONDS - 60})
+        self.assertEqual(fresh_client.authenticate(), "token-1")
+
+    def test_renewal_in_progress_elsewhere_keeps_current_token(self):
+        cache.set(TOKEN_CACHE_KEY, {"token": "cached", "expires_at": time.time() + 30})
+        cache.add(TOKEN_REFRESH_LOCK_KEY, "other-worker", timeout=30)
+        self.assertEqual(self.client.authenticate(), "cached")
+        self.assertEqual(self.stub.hits["/v2/auth/token"], 0)
+
+
+class QPayCircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        cache.delete(TOKEN_CACHE_KEY)
+        breaker.reset()
+        self.addCleanup(breaker.reset)
+        self.stub = StubQPayServer()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        settings_override = override_settings(
+            QPAY_BASE_URL=self.stub.base_url,
+            QPAY_USERNAME="merchant",
+            QPAY_PASSWORD="secret",
+            QPAY_HTTP_MAX_RETRIES=0,
+            QPAY_BREAKER_FAILURE_THRESHOLD=3,
+            QPAY_BREAKER_RESET_SECONDS=0.3,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = QPayClient(recorder=QPayLatencyRecorder())
+        self.addCleanup(self.client.close)
+        self.client.authenticate()
+
+    def _trip(self):
+        self.stub.script("/v2/payment/check", *[(503, {})] * 3)
+        for _ in range(3):
+            with self.assertRaises(DomainError):
+                self.client.get_invoice_status("inv-1")
+
+    def test_open_circuit_fails_fast_for_every_client(self):
+        before = qpay_breaker_stats()
+        self._trip()
+        self.assertEqual(breaker.state(), "open")
+
+        other_worker = QPayClient(recorder=QPayLatencyRecorder())
+        self.addCleanup(other_worker.close)
+        for client in (self.client, other_worker):
+            with self.assertRaises(CircuitOpenError) as raised:
+                client.get_invoice_status("inv-1")
+            self.assertEqual(raised.exception.status_code, 503)
+            self.assertGreaterEqual(raised.exception.wait, 1)
+        self.assertEqual(self.stub.hits["/v2/payment/check"], 3)
+
+        stats = qpay_breaker_stats()
+        self.assertEqual(stats["state"], "open")
+        self.assertEqual(stats["opened"] - before["opened"], 1)
+        self.assertEqual(stats["rejected"] - before["rejected"], 2)
+
+        ops_client = APIClient()
+        ops_client.force_authenticate(User(id=1, email="admin-breaker@test.com", role="admin"))
+        self.assertEqual(ops_client.get("/api/v1/admin/ops/qpay").json()["breaker"], stats)
+
+    def test_successful_probe_closes_the_circuit(self):
+        self._trip()
+        time.sleep(0.35)
+        self.assertEqual(breaker.state(), "half_open")
+
+        self.assertEqual(self.client.get_invoice_status("inv-1")["payment_status"], "PAID")
+        self.assertEqual(breaker.state(), "closed")
+        self.assertEqual(self.stub.hits["/v2/payment/check"], 4)
+
+    def test_failed_probe_reopens_and_admits_one_caller(self):
+        self._trip()
+        time.sleep(0.35)
+        self.stub.script("/v2/payment/check", (503, {}))
+        with self.assertRaises(DomainError):
+            self.client.get_invoice_status("inv-1")
+        self.assertEqual(breaker.state(), "open")
+        with self.assertRaises(CircuitOpenError):
+            self.client.get_invoice_status("inv-1")
+        self.assertEqual(self.stub.hits["/v2/payment/check"], 4)
+
+    def test_client_errors_do_not_count_as_outages(self):
+        self.stub.script("/v2/payment/check", *[(400, {})] * 5)
+        for _ in range(5):
+            with self.assertRaises(DomainError):
+                self.client.get_invoice_status("inv-1")
+        self.assertEqual(breaker.state(), "closed")
+
+
+class PendingPaymentReconciliationTests(TestCase):
+    def setUp(self):
+        cache.delete(TOKEN_CACHE_KEY)
+        breaker.reset()
+        self.stub = StubQPayServer()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        settings_override = override_settings(
+            QPAY_BASE_URL=self.stub.base_url,
+            QPAY_USERNAME="merchant",
+            QPAY_PASSWORD="secret",
+            QPAY_HTTP_RETRY_BASE_SECONDS=0.01,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.owner = User.objects.create_user(email="client-reconcile@test.com", role="client", password="pass1234")
+
+    def _stale_payment(self, invoice_id: str, *, minutes_old: int = 45) -> Payment:
+        project = Project.objects.create(
+            owner=self.owner,
+            title=f"Reconcile {invoice_id}",
+            description="Reconciliation test",
+            budget=500_000,
+            timeline_days=5,
+            category="web",
+            status=Project.STATUS_OPEN,
+        )
+        payment = Payment.objects.create(project=project, invoice_id=invoice_id, amount=500_000)
+        Payment.objects.filter(id=payment.id).update(created_at=timezone.now() - timedelta(minutes=minutes_old))
+        return payment
+
+    def test_late_payments_are_settled_and_the_rest_expired(self):
+        for index in range(3):
+            self._stale_payment(f"inv-late-{index}")
+        self._stale_payment("inv-short")
+        self._stale_payment("inv-unpaid-0")
+        self._stale_payment("inv-unpaid-1")
+        self._stale_payment("inv-qpay-down")
+        recent = self._stale_payment("inv-recent", minutes_old=5)
+        self.stub.invoices.update(
+            {
+                "inv-short": (200, {"payment_status": "PAID", "amount": 100_000}),
+                "inv-unpaid-0": (200, {"payment_status": "NEW"}),
+                "inv-unpaid-1": (200, {"payment_status": "NEW"}),
+                "inv-qpay-down": (503, {}),
+            }
+        )
+
+        report = reconcile_pending_payments(chunk_size=3, workers=4, rate_per_second=0)
+
+        self.assertEqual(
+            (report.scanned, report.paid, report.amount_mismatch, report.expired, report.error_count, report.chunks),
+            (7, 3, 1, 2, 1, 3),
+        )
+        self.assertEqual(report.errors, [("inv-qpay-down", "QPay payment verification failed")])
+        statuses = dict(Payment.objects.values_list("invoice_id", "status"))
+        self.assertEqual(statuses["inv-late-0"], Payment.STATUS_PAID)
+        self.assertEqual(statuses["inv-short"], Payment.STATUS_FAILED)
+        self.assertEqual(statuses["inv-unpaid-1"], Payment.STATUS_FAILED)
+        self.assertEqual(statuses["inv-qpay-down"], Payment.STATUS_PENDING)
+        self.assertEqual(statuses[recent.invoice_id], Payment.STATUS_PENDING)
+        self.assertEqual(Escrow.objects.filter(status=Escrow.STATUS_HELD).count(), 3)
+        self.assertEqual(
+            Payment.objects.get(invoice_id="inv-unpaid-0").raw_response["failure_reason"],
+            "invoice_expired",
+        )
+
+    def test_late_payment_survives_expiry_until_reconciled(self):
+        late = self._stale_payment("inv-paid-late")
+
+        self.assertEqual(expire_stale_pending_payments(), 0)
+        self.assertEqual(reconcile_pending_payments(rate_per_second=0).paid, 1)
+        late.refresh_from_db()
+        self.assertEqual(late.status, Payment.STATUS_PAID)
+
+    def test_expiry_must_wait_longer_than_reconciliation(self):
+        self._stale_payment("inv-not-asked")
+        with self.assertRaises(DomainError):
+            expire_stale_pending_payments(ttl_minutes=30)
+        with override_settings(PAYMENT_EXPIRY_TTL_MINUTES=20), self.assertRaises(DomainError):
+            expire_stale_pending_payments()
+        self.assertEqual(Payment.objects.get(invoice_id="inv-not-asked").status, Payment.STATUS_PENDING)
+
+    @override_settings(QPAY_HTTP_MAX_RETRIES=0, QPAY_BREAKER_FAILURE_THRESHOLD=2)
+    def test_run_stops_once_the_circuit_opens(self):
+        self.addCleanup(breaker.reset)
+        for index in range(6):
+            self._stale_payment(f"inv-down-{index}")
+            self.stub.invoices[f"inv-down-{index}"] = (503, {})
+
+        report = reconcile_pending_payments(chunk_size=2, workers=1, rate_per_second=0)
+
+        self.assertTrue(report.circuit_open)
+        self.assertEqual((report.chunks, report.scanned, report.error_count), (1, 2, 2))
+        self.assertEqual(self.stub.hits["/v2/payment/check"], 2)
+        self.assertEqual(Payment.objects.filter(status=Payment.STATUS_PENDING).count(), 6)
+
+    def test_checks_run_concurrently_within_the_pool_bound(self):
+        for index in range(6):
+            self._stale_payment(f"inv-pool-{index}")
+        self.stub.check_delay = 0.1
+
+        report = reconcile_pending_payments(workers=3, rate_per_second=0)
+
+        self.assertEqual(report.paid, 6)
+        self.assertEqual(self.stub.max_in_flight, 3)
+
+    def test_rate_limiter_spaces_calls_after_the_burst(self):
+        limiter = RateLimiter(50, burst=2)
+        started = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 50 - 0.01)
+
+
+class PaymentStatusWaitTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(email="client-wait@test.com", role="client", password="pass1234")
+        self.project = Project.objects.create(
+            owner=self.owner,
+            title="Wait Project",
+            description="Long-poll test",
+            budget=500_000,
+            timeline_days=5,
+            category="web",
+        )
+        self.url = f"/api/v1/payments/status/{self.project.id}/wait"
+        self.client_api.force_authenticate(self.owner)
+
+    def test_settled_payment_is_returned_without_waiting(self):
+        Payment.objects.create(project=self.project, invoice_id="inv-wait-paid", amount=500_000, status=Payment.STATUS_PAID)
+        response = self.client_api.get(self.url, {"since": "pending", "timeout": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.json()["status"], response.json()["changed"]), ("paid", True))
+
+    def test_unchanged_payment_returns_after_timeout(self):
+        Payment.objects.create(project=self.project, invoice_id="inv-wait-pending", amount=500_000)
+        started = time.monotonic()
+        response = self.client_api.get(self.url, {"timeout": 0.2})
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual((response.json()["status"], response.json()["changed"]), ("pending", False))
+        self.assertEqual(status_events.hub.waiting(), 0)
+
+    def test_wait_is_limited_to_participants_and_known_statuses(self):
+        Payment.objects.create(project=self.project, invoice_id="inv-wait-403", amount=500_000)
+        self.assertEqual(self.client_api.get(self.url, {"since": "bogus"}).status_code, status.HTTP_400_BAD_REQUEST)
+        outsider = User.objects.create_user(email="outsider-wait@test.com", role="client", password="pass1234")
+        self.client_api.force_authenticate(outsider)
+        self.assertEqual(self.client_api.get(self.url, {"timeout": 0}).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(PAYMENT_STATUS_MAX_WAITERS=1)
+    def test_waiters_above_the_process_cap_are_sent_back(self):
+        held = status_events.hub.subscribe(0)
+        self.addCleanup(status_events.hub.unsubscribe, 0, held)
+        payment = Payment.objects.create(project=self.project, invoice_id="inv-wait-full", amount=500_000)
+
+        started = time.monotonic()
+        response = self.client_api.get(self.url, {"timeout": 5})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "2")
+
+        Payment.objects.filter(id=payment.id).update(status=Payment.STATUS_PAID)
+        response = self.client_api.get(self.url, {"timeout": 5})
+        self.assertEqual((response.json()["status"], response.json()["changed"]), ("paid", True))
+        self.assertEqual(status_events.hub.waiting(), 1)
+
+
+class PaymentStatusPushTests(TransactionTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email="client-push@test.com", role="client", password="pass1234")
+        self.project = Project.objects.create(
+            owner=self.owner,
+            title="Push Project",
+            description="Long-poll wake test",
+            budget=500_000,
+            timeline_days=5,
+            category="web",
+        )
+        self.payment = Payment.objects.create(project=self.project, invoice_id="inv-push", amount=500_000)
+
+    def _long_poll_while(self, change):
+        def _long_poll():
+            client_api = APIClient()
+            client_api.force_authenticate(self.owner)
+            try:
+                started = time.monotonic()
+                response = client_api.get(f"/api/v1/payments/status/{self.project.id}/wait", {"timeout": 20})
+                return response, time.monotonic() - started
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(_long_poll)
+            deadline = time.monotonic() + 5
+            while status_events.hub.waiting() == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            change()
+            return future.result(timeout=20)
+
+    def test_settling_a_payment_wakes_the_waiting_request(self):
+        response, elapsed = self._long_poll_while(
+            lambda: mark_payment_paid_and_hold_escrow(invoice_id="inv-push", paid_amount=500_000, verification_payload={})
+        )
+        self.assertEqual((response.json()["status"], response.json()["changed"]), ("paid", True))
+        self.assertLess(elapsed, 10)
+
+    def test_expiring_a_payment_wakes_the_waiting_request(self):
+        Payment.objects.filter(id=self.payment.id).update(created_at=timezone.now() - timedelta(minutes=150))
+        response, elapsed = self._long_poll_while(expire_stale_pending_payments)
+        self.assertEqual((response.json()["status"], response.json()["changed"]), ("failed", True))
+        self.assertLess(elapsed, 10)
+
+
+class PaymentExpiryLockingTests(TransactionTestCase):
+    def test_row_being_settled_is_skipped_not_waited_on(self):
+        owner = User.objects.create_user(email="client-expiry@test.com", role="client", password="pass1234")
+        project = Project.objects.create(
+            owner=owner,
+            title="Expiry Project",
+            description="Expiry locking test",
+            budget=500_000,
+            timeline_days=5,
+            category="web",
+            status=Project.STATUS_OPEN,
+        )
+        busy = Payment.objects.create(project=project, invoice_id="inv-busy", amount=500_000)
+        Payment.objects.create(project=project, invoice_id="inv-idle", amount=500_000)
+        Payment.objects.update(created_at=timezone.now() - timedelta(minutes=150))
+
+        locked = threading.Event()
+        release = threading.Event()
+
+        def _hold_lock():
+            try:
+                with transaction.atomic():
+                    Payment.objects.select_for_update().get(id=busy.id)
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=_hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(locked.wait(5))
+            started = time.monotonic()
+            self.assertEqual(expire_stale_pending_payments(), 1)
+            self.assertLess(time.monotonic() - started, 2)
+        finally:
+            release.set()
+            holder.join()
+
+        statuses = dict(Payment.objects.values_list("invoice_id", "status"))
+        self.assertEqual(statuses, {"inv-busy": Payment.STATUS_PENDING, "inv-idle": Payment.STATUS_FAILED})
+
+
+@override_settings(DEBUG=True, PAYMENT_INVOICE_MODE="async", PAYMENT_INVOICE_MAX_ATTEMPTS=2)
+class AsyncInvoiceCreationTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(email="client-async@test.com", role="client", password="pass1234")
+        freelancer = User.objects.create_user(email="freelancer-async@test.com", role="freelancer", password="pass1234")
+        self.project = Project.objects.create(
+            owner=self.owner,
+            title="Async Project",
+            description="Async invoice test",
+            budget=700_000,
+            timeline_days=5,
+            category="web",
+            status=Project.STATUS_IN_PROGRESS,
+        )
+        proposal = Proposal.objects.create(
+            project=self.project,
+            freelancer=freelancer,
+            price=700_000,
+            timeline_days=5,
+            message="proposal",
+            status=Proposal.STATUS_ACCEPTED,
+        )
+        self.project.selected_proposal = proposal
+        self.project.save(update_fields=["selected_proposal"])
+        self.client_api.force_authenticate(self.owner)
+
+    def _checkout(self, key):
+        return self.client_api.post(
+            "/api/v1/payments/create/",
+            {"project_id": self.project.id},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    @patch("apps.payments.views.create_invoice")
+    def test_checkout_is_accepted_without_calling_qpay(self, view_create_invoice):
+        response = self._checkout("async-1")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        view_create_invoice.assert_not_called()
+        body = response.json()
+        self.assertEqual(body["payment"]["status"], Payment.STATUS_CREATING)
+        self.assertIsNone(body["payment"]["invoice_id"])
+        self.assertTrue(body["status_url"].endswith(f"/api/v1/payments/status/{self.project.id}"))
+        self.assertTrue(body["wait_url"].endswith(f"/api/v1/payments/status/{self.project.id}/wait?since=creating"))
+
+        repeat = self._checkout("async-2")
+        self.assertEqual(repeat.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(repeat.json()["payment"]["id"], body["payment"]["id"])
+
+        invoice = QPayInvoice(
+            invoice_id="inv-async",
+            qr_text="qpay://async",
+            qr_image="",
+            invoice_url="https://qpay.mn/inv-async",
+            raw_response={"invoice_id": "inv-async", "qr_text": "qpay://async"},
+        )
+        with patch("apps.payments.services.invoice_service.create_invoice", return_value=invoice) as worker_call:
+            self.assertEqual(create_pending_invoices()["created"], 1)
+        self.assertTrue(worker_call.call_args.kwargs["callback_url"].endswith("/api/v1/payments/webhook/"))
+
+        status_response = self.client_api.get(f"/api/v1/payments/status/{self.project.id}")
+        self.assertEqual(status_response.json()["status"], Payment.STATUS_PENDING)
+        self.assertEqual(status_response.json()["invoice_id"], "inv-async")
+        self.assertNotIn("raw_response", status_response.json())
+        artifact = self.client_api.get(status_response.json()["invoice_artifact_url"])
+        self.assertEqual(artifact.json()["qr_text"], "qpay://async")
+
+    def test_invoice_failures_are_retried_then_fail_the_payment(self):
+        self._checkout("async-fail")
+        with patch(
+            "apps.payments.services.invoice_service.create_invoice",
+            side_effect=DomainError("QPay invoice creation failed"),
+        ) as worker_call:
+            self.assertEqual(create_pending_invoices(), {"created": 0, "retrying": 1, "failed": 0})
+            # Backing off: the next pass leaves the checkout alone until next_attempt_at.
+            self.assertEqual(create_pending_invoices(), {"created": 0, "retrying": 0, "failed": 0})
+            payment = Payment.objects.get(project=self.project)
+            self.assertGreater(payment.next_attempt_at, timezone.now() + timedelta(seconds=5))
+            Payment.objects.filter(id=payment.id).update(next_attempt_at=timezone.now())
+            self.assertEqual(create_pending_invoices(), {"created": 0, "retrying": 0, "failed": 1})
+        self.assertEqual(worker_call.call_count, 2)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.STATUS_FAILED)
+        self.assertEqual(payment.raw_response["failure_reason"], "invoice_creation_failed")
+
+    def test_checkout_is_leased_while_qpay_is_called(self):
+        self._checkout("async-lease")
+        invoice = QPayInvoice(invoice_id="inv-lease", qr_text="", qr_image="", invoice_url="", raw_response={})
+
+        def _create(**kwargs):
+            # A second worker finds nothing due while the call is in flight.
+            self.assertEqual(create_pending_invoices(), {"created": 0, "retrying": 0, "failed": 0})
+            return invoice
+
+        with patch("apps.payments.services.invoice_service.create_invoice", side_effect=_create) as worker_call:
+            self.assertEqual(create_pending_invoices()["created"], 1)
+        payment = Payment.objects.get(project=self.project)
+        self.assertEqual(worker_call.call_args.kwargs["sender_invoice_no"], f"PAYMENT-{payment.id}")
+        self.assertEqual((payment.status, payment.invoice_id, payment.next_attempt_at), (Payment.STATUS_PENDING, "inv-lease", None))
+
+    def test_checkout_expired_during_the_qpay_call_is_left_alone(self):
+        self._checkout("async-expired-mid-call")
+        invoice = QPayInvoice(invoice_id="inv-orphan", qr_text="", qr_image="", invoice_url="", raw_response={})
+
+        def _create(**kwargs):
+            Payment.objects.update(status=Payment.STATUS_FAILED)
+            return invoice
+
+        with patch("apps.payments.services.invoice_service.create_invoice", side_effect=_create):
+            self.assertEqual(create_pending_invoices()["failed"], 1)
+        payment = Payment.objects.get(project=self.project)
+        self.assertEqual((payment.status, payment.invoice_id), (Payment.STATUS_FAILED, None))
+
+    def test_checkout_stuck_waiting_for_an_invoice_is_expired(self):
+        self._checkout("async-stuck")
+        Payment.objects.update(created_at=timezone.now() - timedelta(minutes=150))
+        self.assertEqual(expire_stale_pending_payments(), 1)
+        payment = Payment.objects.get(project=self.project)
+        self.assertEqual(payment.status, Payment.STATUS_FAILED)
+        self.assertEqual(payment.raw_response["failure_reason"], "invoice_creation_timeout")
+
+    def test_open_circuit_defers_invoice_without_spending_attempts(self):
+        self._checkout("async-open")
+        with patch(
+            "apps.payments.services.invoice_service.create_invoice",
+            side_effect=CircuitOpenError("qpay", 30),
+        ):
+            self.assertEqual(create_pending_invoices(), {"created": 0, "retrying": 1, "failed": 0})
+            self.assertEqual(create_pending_invoices(), {"created": 0, "retrying": 0, "failed": 0})
+        payment = Payment.objects.get(project=self.project)
+        self.assertEqual(payment.status, Payment.STATUS_CREATING)
+        self.assertEqual(payment.raw_response["invoice_attempts"], 0)
+        self.assertGreater(payment.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+    @override_settings(PAYMENT_INVOICE_MODE="sync")
+    @patch("apps.payments.views.create_invoice", side_effect=CircuitOpenError("qpay", 12))
+    def test_sync_checkout_returns_retriable_503_while_circuit_is_open(self, view_create_invoice):
+        response = self._checkout("sync-open")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "12")
+        self.assertFalse(Payment.objects.filter(project=self.project).exists())
+
+        # The idempotency reservation was released, so the same key can be retried.
+        view_create_invoice.side_effect = None
+        view_create_invoice.return_value = QPayInvoice(
+            invoice_id="inv-retry", qr_text="", qr_image="", invoice_url="", raw_response={"invoice_id": "inv-retry"}
+        )
+        self.assertEqual(self._checkout("sync-open").status_code, status.HTTP_201_CREATED)
+
+    @override_settings(PAYMENT_INVOICE_MODE="sync")
+    @patch("apps.payments.views.create_invoice")
+    def test_sync_mode_still_creates_the_invoice_inline(self, view_create_invoice):
+        view_create_invoice.return_value = QPayInvoice(
+            invoice_id="inv-sync", qr_text="", qr_image="", invoice_url="", raw_response={"invoice_id": "inv-sync"}
+        )
+        response = self._checkout("sync-1")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["invoice_id"], "inv-sync")
+
+
+@override_settings(DEBUG=True)
+class InvoiceArtifactTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(email="client-qr@test.com", role="client", password="pass1234")
+        freelancer = User.objects.create_user(email="freelancer-qr@test.com", role="freelancer", password="pass1234")
+        self.project = Project.objects.create(
+            owner=self.owner,
+            title="QR Project",
+            description="Invoice artifact test",
+            budget=600_000,
+            timeline_days=5,
+            category="web",
+            status=Project.STATUS_IN_PROGRESS,
+        )
+        proposal = Proposal.objects.create(
+            project=self.project,
+            freelancer=freelancer,
+            price=600_000,
+            timeline_days=5,
+            message="proposal",
+            status=Proposal.STATUS_ACCEPTED,
+        )
+        self.project.selected_proposal = proposal
+        self.project.save(update_fields=["selected_proposal"])
+        self.client_api.force_authenticate(self.owner)
+        self.qr_image = "iVBORw0KGgo" * 2000
+
+    @patch("apps.payments.views.create_invoice")
+    def test_qr_data_is_stored_apart_and_served_cacheable(self, view_create_invoice):
+        raw = {
+            "invoice_id": "inv-qr",
+            "qr_text": "qpay://qr",
+            "qr_image": self.qr_image,
+            "qPay_shortUrl": "https://s.qpay.mn/abc",
+            "urls": [{"name": "Khan bank", "link": "khanbank://q?qPay_QRcode=qpay://qr"}],
+        }
+        view_create_invoice.return_value = QPayInvoice(
+            invoice_id="inv-qr", qr_text="qpay://qr", qr_image=self.qr_image, invoice_url="", raw_response=raw
+        )
+        created = self.client_api.post(
+            "/api/v1/payments/create/", {"project_id": self.project.id}, format="json", HTTP_IDEMPOTENCY_KEY="qr-1"
+        )
+        self.assertEqual(created.json()["qr_image"], self.qr_image)
+
+        payment = Payment.objects.get(invoice_id="inv-qr")
+        self.assertEqual(payment.raw_response, {"invoice_id": "inv-qr"})
+        self.assertEqual(payment.invoice_artifact.short_url, "https://s.qpay.mn/abc")
+
+        status_body = self.client_api.get(f"/api/v1/payments/status/{self.project.id}").json()
+        self.assertNotIn(self.qr_image, json.dumps(status_body))
+        url = status_body["invoice_artifact_url"]
+        self.assertEqual(url, f"/api/v1/payments/{payment.id}/invoice")
+
+        response = self.client_api.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["qr_image"], self.qr_image)
+        self.assertEqual(response.json()["urls"][0]["name"], "Khan bank")
+        self.assertIn("max-age=86400", response["Cache-Control"])
+        self.assertIn("immutable", response["Cache-Control"])
+
+        revalidated = self.client_api.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("immutable", revalidated["Cache-Control"])
+
+        repeat = self.client_api.post(
+            "/api/v1/payments/create/", {"project_id": self.project.id}, format="json", HTTP_IDEMPOTENCY_KEY="qr-2"
+        )
+        self.assertEqual(repeat.json()["qr_text"], "qpay://qr")
+
+    def test_artifacts_are_only_served_to_participants(self):
+        payment = Payment.objects.create(project=self.project, invoice_id="inv-private", amount=600_000)
+        PaymentInvoiceArtifact.objects.create(payment=payment, qr_text="qpay://private")
+        stranger = User.objects.create_user(email="stranger-qr@test.com", role="client", password="pass1234")
+        self.client_api.force_authenticate(stranger)
+        response = self.client_api.get(f"/api/v1/payments/{payment.id}/invoice")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_payment_list_excludes_raw_payloads(self):
+        payment = Payment.objects.create(
+            project=self.project,
+            invoice_id="inv-admin",
+            amount=600_000,
+            raw_response={"verification": {"blob": "x" * 1000}},
+        )
+        PaymentInvoiceArtifact.objects.create(payment=payment, qr_image=self.qr_image)
+        admin = User.objects.create_user(email="admin-qr@test.com", role="admin", password="pass1234")
+        self.client_api.force_authenticate(admin)
+        body = self.client_api.get("/api/v1/admin/payments").content.decode("utf-8")
+        self.assertIn("inv-admin", body)
+        self.assertNotIn("iVBORw0KGgo", body)
+        self.assertNotIn("blob", body)
+
+    def test_migration_moves_existing_artifacts_in_batches(self):
+        migration = importlib.import_module("apps.payments.migrations.0012_move_invoice_artifacts")
+        payments = [
+            Payment.objects.create(
+                project=self.project,
+                invoice_id=f"inv-legacy-{index}",
+                amount=600_000,
+                raw_response={"invoice_id": f"inv-legacy-{index}", "qr_text": f"qpay://{index}", "qr_image": "abc"},
+            )
+            for index in range(3)
+        ]
+        untouched = Payment.objects.create(project=self.project, invoice_id="inv-plain", amount=1, raw_response={"a": 1})
+
+        with patch.object(migration, "BATCH_SIZE", 2):
+            migration.move_artifacts(django_apps, None)
+
+        for index, payment in enumerate(payments):
+            payment.refresh_from_db()
+            self.assertEqual(payment.raw_response, {"invoice_id": f"inv-legacy-{index}"})
+            self.assertEqual(payment.invoice_artifact.qr_text, f"qpay://{index}")
+        self.assertFalse(PaymentInvoiceArtifact.objects.filter(payment=untouched).exists())
+
+        migration.restore_artifacts(django_apps, None)
+        payments[0].refresh_from_db()
+        self.assertEqual(payments[0].raw_response["qr_image"], "abc")
+        self.assertFalse(PaymentInvoiceArtifact.objects.exists())
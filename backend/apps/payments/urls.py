@@ -6,7 +6,9 @@ from .views import (
     EscrowDepositView,
     EscrowReleaseView,
     PaymentCreateView,
+    PaymentInvoiceArtifactView,
     PaymentStatusView,
+    PaymentStatusWaitView,
     PaymentWebhookView,
     ProjectConfirmCompletionView,
     ProjectDisputeView,
@@ -16,7 +18,9 @@ from .views import (
 urlpatterns = [
     path("payments/create/", PaymentCreateView.as_view(), name="payment-create"),
     path("payments/webhook/", PaymentWebhookView.as_view(), name="payment-webhook"),
+    path("payments/<uuid:payment_id>/invoice", PaymentInvoiceArtifactView.as_view(), name="payment-invoice-artifact"),
     path("payments/status/<int:project_id>", PaymentStatusView.as_view(), name="payment-status"),
+    path("payments/status/<int:project_id>/wait", PaymentStatusWaitView.as_view(), name="payment-status-wait"),
     path("projects/<int:project_id>/escrow/deposit", EscrowDepositView.as_view(), name="escrow-deposit"),
     path("escrow/<int:escrow_id>/admin/approve", EscrowAdminApproveView.as_view(), name="escrow-approve"),
     path("escrow/<int:escrow_id>/release", EscrowReleaseView.as_view(), name="escrow-release"),
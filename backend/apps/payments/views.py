@@ -1,8 +1,10 @@
 """Escrow and dispute views."""
 import logging
+import time
 
 from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -13,25 +15,40 @@ from rest_framework.views import APIView
 from apps.accounts.permissions import IsAdminUser
 from apps.projects.models import Project
 from apps.projects.permissions import IsClient, IsFreelancer
-from common.exceptions import DomainError
+from common.cache_utils import (
+    bump_payment_status_version,
+    payment_status_version_key,
+    project_version_key,
+    read_tag_versions,
+)
+from common.conditional import apply_etag, matching_etag, not_modified, version_etag
+from common.exceptions import DomainError, ServiceUnavailableError
 
-from .models import Dispute, Escrow, Payment
+from .models import Dispute, Escrow, Payment, PaymentInvoiceArtifact
 from .idempotency import execute_idempotent
 from .serializers import DisputeSerializer, EscrowSerializer, PaymentCreateSerializer, PaymentSerializer
 from .services import (
     approve_escrow,
+    authenticate_webhook,
     confirm_completion,
     create_dispute,
     create_invoice,
     deposit_to_escrow,
-    mark_payment_failed,
-    mark_payment_paid_and_hold_escrow,
+    enqueue_webhook,
+    invoice_artifact_payload,
+    known_final_status,
+    request_invoice,
+    slim_invoice_response,
+    store_invoice_artifact,
     submit_result,
-    verify_webhook,
+    subscribe_payment_status,
+    unsubscribe_payment_status,
 )
 
 logger = logging.getLogger(__name__)
 
+STATUS_WAIT_RETRY_AFTER_SECONDS = 2
+
 
 class EscrowDepositView(APIView):
     permission_classes = [IsClient]
@@ -155,31 +172,41 @@ class PaymentCreateView(APIView):
         def _executor():
             existing_payment = (
                 Payment.objects.select_related("project")
-                .filter(project=project, status=Payment.STATUS_PENDING)
+                .filter(project=project, status__in=(Payment.STATUS_CREATING, Payment.STATUS_PENDING))
                 .order_by("-created_at")
                 .first()
             )
             if existing_payment and existing_payment.created_at > timezone.now() - timezone.timedelta(minutes=30):
+                if existing_payment.status == Payment.STATUS_CREATING:
+                    return _invoice_requested_payload(request, existing_payment), status.HTTP_202_ACCEPTED
+                artifact = PaymentInvoiceArtifact.objects.filter(payment=existing_payment).first()
                 return (
                     {
                         "payment": PaymentSerializer(existing_payment).data,
                         "invoice_id": existing_payment.invoice_id,
-                        "qr_text": existing_payment.raw_response.get("qr_text", ""),
-                        "qr_image": existing_payment.raw_response.get("qr_image", ""),
-                        "invoice_url": existing_payment.raw_response.get("invoice_url", ""),
+                        "qr_text": artifact.qr_text if artifact else "",
+                        "qr_image": artifact.qr_image if artifact else "",
+                        "invoice_url": artifact.invoice_url if artifact else "",
                         "expires_in_seconds": 1800,
                     },
                     status.HTTP_200_OK,
                 )
 
+            if settings.PAYMENT_INVOICE_MODE == "async":
+                # create_pending_invoices workers talk to QPay; checkout does not wait on the provider.
+                payment = request_invoice(project=project, amount=amount, callback_url=callback_url)
+                return _invoice_requested_payload(request, payment), status.HTTP_202_ACCEPTED
+
             invoice = create_invoice(project=project, amount=amount, callback_url=callback_url)
             payment = Payment.objects.create(
                 project=project,
                 invoice_id=invoice.invoice_id,
                 amount=amount,
                 status=Payment.STATUS_PENDING,
-                raw_response=invoice.raw_response,
+                raw_response=slim_invoice_response(invoice.raw_response),
             )
+            store_invoice_artifact(payment, invoice.raw_response)
+            bump_payment_status_version(project.id)
             return (
                 {
                     "payment": PaymentSerializer(payment).data,
@@ -201,6 +228,17 @@ class PaymentCreateView(APIView):
         return Response(payload, status=status_code)
 
 
+def _invoice_requested_payload(request, payment: Payment) -> dict:
+    status_url = reverse("payment-status", kwargs={"project_id": payment.project_id})
+    wait_url = reverse("payment-status-wait", kwargs={"project_id": payment.project_id})
+    return {
+        "payment": PaymentSerializer(payment).data,
+        "status_url": request.build_absolute_uri(status_url),
+        "wait_url": request.build_absolute_uri(f"{wait_url}?since={Payment.STATUS_CREATING}"),
+        "expires_in_seconds": 1800,
+    }
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class PaymentWebhookView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -212,55 +250,139 @@ class PaymentWebhookView(APIView):
             return Response({"detail": "HTTPS required"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            verified = verify_webhook(request)
+            payload = authenticate_webhook(request)
         except DomainError as exc:
             logger.warning("Invalid payment webhook: %s", exc)
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            payment = Payment.objects.get(invoice_id=verified["invoice_id"])
-        except Payment.DoesNotExist:
-            logger.warning("Webhook invoice not found: %s", verified.get("invoice_id"))
-            return Response({"detail": "Unknown invoice"}, status=status.HTTP_400_BAD_REQUEST)
-
-        if not verified["is_paid"]:
-            mark_payment_failed(payment, reason="invoice_not_paid", raw_payload=verified)
-            return Response({"detail": "Invoice not paid"}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            payment = mark_payment_paid_and_hold_escrow(
-                invoice_id=verified["invoice_id"],
-                paid_amount=verified["amount"],
-                verification_payload=verified,
-            )
-        except DomainError as exc:
-            logger.warning("Webhook payment processing failed for invoice %s: %s", verified["invoice_id"], exc)
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-
-        if payment.status != Payment.STATUS_PAID:
-            logger.warning("Webhook payment marked as failed for invoice %s", verified["invoice_id"])
-            return Response({"detail": "Payment verification failed"}, status=status.HTTP_400_BAD_REQUEST)
+        invoice_id = payload.get("invoice_id") or payload.get("invoiceId")
+        # QPay keeps resending callbacks; one for a settled invoice is answered without queueing.
+        final_status = known_final_status(invoice_id)
+        if final_status is None:
+            payment_status = Payment.objects.filter(invoice_id=invoice_id).values_list("status", flat=True).first()
+            if payment_status is None:
+                logger.warning("Webhook invoice not found: %s", invoice_id)
+                return Response({"detail": "Unknown invoice"}, status=status.HTTP_400_BAD_REQUEST)
+            final_status = known_final_status(invoice_id, db_status=payment_status)
+        if final_status is not None:
+            return Response({"accepted": True, "status": final_status}, status=status.HTTP_200_OK)
 
-        return Response({"verified": True, "payment": PaymentSerializer(payment).data}, status=status.HTTP_200_OK)
+        # QPay verification and the escrow transition run in process_webhook_inbox workers, so
+        # acknowledging a callback never waits on QPay.
+        entry = enqueue_webhook(body=request.body, payload=payload)
+        return Response({"accepted": True, "inbox_id": entry.id}, status=status.HTTP_202_ACCEPTED)
 
 
 class PaymentStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, project_id):
+        # Project versions cover participants and escrow status; the tag is bound to the user, so a
+        # 304 is only possible for someone who passed the participant check below before.
+        versions = read_tag_versions([project_version_key(project_id), payment_status_version_key(project_id)])
+        etag = matching_etag(request, versions, per_user=True)
+        if etag:
+            return not_modified(etag, per_user=True)
+
         project = get_object_or_404(Project.objects.select_related("selected_proposal", "owner"), id=project_id)
-        is_participant = request.user.id in {
-            project.owner_id,
-            getattr(getattr(project, "selected_proposal", None), "freelancer_id", None),
-        }
-        if not is_participant and request.user.role != "admin":
+        if not _can_view_payments(request.user, project):
             return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
         payment = project.payments.order_by("-created_at").first()
         if payment is None:
             return Response({"detail": "No payment found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if payment.status == Payment.STATUS_PENDING and payment.created_at < timezone.now() - timezone.timedelta(minutes=30):
-            payment = mark_payment_failed(payment, reason="invoice_expired")
+        # Read-only: lapsed invoices are failed by expire_stale_payments, whose version bump
+        # invalidates this tag.
+        response = Response(PaymentSerializer(payment).data, status=status.HTTP_200_OK)
+        etag = version_etag(request, versions, per_user=True)
+        return apply_etag(response, etag, per_user=True)
+
+
+class PaymentInvoiceArtifactView(APIView):
+    """QR image and deep links of one invoice; they never change, so clients and proxies keep them."""
+
+    permission_classes = [permissions.IsAuthenticated]
 
-        return Response(PaymentSerializer(payment).data, status=status.HTTP_200_OK)
+    def get(self, request, payment_id):
+        payment = get_object_or_404(
+            Payment.objects.select_related("project__selected_proposal").only(
+                "id",
+                "invoice_id",
+                "project__owner_id",
+                "project__selected_proposal__freelancer_id",
+            ),
+            id=payment_id,
+        )
+        if not _can_view_payments(request.user, payment.project):
+            return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+        if not payment.invoice_id:
+            return Response({"detail": "Invoice is not created yet."}, status=status.HTTP_404_NOT_FOUND)
+
+        # The path names the payment, and its artifacts are written once, so no version is needed.
+        etag = matching_etag(request, {}, per_user=True)
+        if etag:
+            return _cache_artifact(not_modified(etag, per_user=True))
+        artifact = PaymentInvoiceArtifact.objects.filter(payment=payment).first()
+        response = Response(invoice_artifact_payload(payment, artifact), status=status.HTTP_200_OK)
+        return _cache_artifact(apply_etag(response, version_etag(request, {}, per_user=True), per_user=True))
+
+
+def _cache_artifact(response):
+    response["Cache-Control"] = f"private, max-age={settings.PAYMENT_INVOICE_ARTIFACT_MAX_AGE}, immutable"
+    return response
+
+
+class PaymentStatusWaitView(APIView):
+    """Long-poll: answer as soon as the latest payment leaves ``since`` or the timeout passes."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, project_id):
+        since = request.query_params.get("since", Payment.STATUS_PENDING)
+        if since not in dict(Payment.STATUS_CHOICES):
+            return Response({"detail": "Unknown payment status."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            timeout = float(request.query_params.get("timeout", settings.PAYMENT_STATUS_WAIT_SECONDS))
+        except ValueError:
+            return Response({"detail": "timeout must be a number of seconds."}, status=status.HTTP_400_BAD_REQUEST)
+        deadline = time.monotonic() + min(max(timeout, 0), settings.PAYMENT_STATUS_WAIT_SECONDS)
+
+        project = get_object_or_404(Project.objects.select_related("selected_proposal"), id=project_id)
+        if not _can_view_payments(request.user, project):
+            return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        event = subscribe_payment_status(project.id)
+        if event is None:
+            # Every waiting slot in this process is taken: answer a change now, otherwise send the client back.
+            payment = project.payments.order_by("-created_at").first()
+            if payment is None:
+                return Response({"detail": "No payment found"}, status=status.HTTP_404_NOT_FOUND)
+            if payment.status == since:
+                raise ServiceUnavailableError(
+                    "Too many status waiters; retry shortly.", wait=STATUS_WAIT_RETRY_AFTER_SECONDS
+                )
+            return Response({**PaymentSerializer(payment).data, "changed": True})
+        try:
+            while True:
+                payment = project.payments.order_by("-created_at").first()
+                if payment is None:
+                    return Response({"detail": "No payment found"}, status=status.HTTP_404_NOT_FOUND)
+                # Settling, reconciliation and expiry all publish, so the event covers lapsed invoices too.
+                remaining = deadline - time.monotonic()
+                if payment.status != since or remaining <= 0:
+                    break
+                event.wait(remaining)
+                event.clear()
+        finally:
+            unsubscribe_payment_status(project.id, event)
+
+        return Response({**PaymentSerializer(payment).data, "changed": payment.status != since})
+
+
+def _can_view_payments(user, project) -> bool:
+    is_participant = user.id in {
+        project.owner_id,
+        getattr(getattr(project, "selected_proposal", None), "freelancer_id", None),
+    }
+    return is_participant or user.role == "admin"
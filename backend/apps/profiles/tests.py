@@ -94,6 +94,21 @@ class ProfileDetailApiTests(TestCase):
         self.assertEqual(data["full_name"], "Public Freelancer")
         self.assertEqual(data["skills"], ["React", "Node"])
 
+    def test_etag_revalidates_until_profile_changes(self):
+        self.client_api.force_authenticate(self.viewer)
+        first = self.client_api.get(f"/api/v1/profiles/{self.user.id}")
+        not_modified = self.client_api.get(f"/api/v1/profiles/{self.user.id}", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client_api.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_api.patch("/api/v1/profiles/me", {"full_name": "Renamed"}, format="json")
+        self.client_api.force_authenticate(self.viewer)
+
+        changed = self.client_api.get(f"/api/v1/profiles/{self.user.id}", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.json()["full_name"], "Renamed")
+
     def test_get_nonexistent_profile_returns_404(self):
         self.client_api.force_authenticate(self.viewer)
         response = self.client_api.get("/api/v1/profiles/99999")
@@ -1,8 +1,7 @@
 """Profile views."""
-from django.core.cache import cache
 from rest_framework import generics
-from rest_framework.response import Response
-from common.cache_utils import bump_user_public_version, profile_cache_key
+from common.cache_utils import bump_user_public_version, profile_cache_key, stale_cache_key, user_public_version_key
+from common.cached_read import cached_json_response
 
 from .models import Profile
 from .serializers import ProfileSerializer
@@ -14,15 +13,19 @@ class ProfileDetailView(generics.RetrieveAPIView):
     lookup_field = "user_id"
 
     def retrieve(self, request, *args, **kwargs):
-        user_id = kwargs["user_id"]
-        cache_key = profile_cache_key(user_id)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
+        cache_key = profile_cache_key(kwargs["user_id"])
 
-        response = super().retrieve(request, *args, **kwargs)
-        cache.set(cache_key, response.data, timeout=120)
-        return response
+        def _compute():
+            return super(ProfileDetailView, self).retrieve(request, *args, **kwargs).data
+
+        return cached_json_response(
+            request,
+            cache_key,
+            _compute,
+            timeout=120,
+            stale_key=stale_cache_key(cache_key),
+            etag_keys=[user_public_version_key(kwargs["user_id"])],
+        )
 
 
 class ProfileMeView(generics.RetrieveUpdateAPIView):
@@ -34,14 +37,12 @@ class ProfileMeView(generics.RetrieveUpdateAPIView):
 
     def get(self, request, *args, **kwargs):
         profile = self.get_object()
-        cache_key = profile_cache_key(request.user.id)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
-
-        payload = self.get_serializer(profile).data
-        cache.set(cache_key, payload, timeout=120)
-        return Response(payload)
+        return cached_json_response(
+            request,
+            profile_cache_key(request.user.id),
+            lambda: self.get_serializer(profile).data,
+            timeout=120,
+        )
 
     def perform_update(self, serializer):
         serializer.save()
@@ -1,8 +1,12 @@
 """Project and proposal models."""
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.db.models import Q
 
+from common.search import SEARCH_CONFIG
+
 
 class Project(models.Model):
     STATUS_OPEN = "open"
@@ -31,6 +35,14 @@ class Project(models.Model):
     selected_proposal = models.ForeignKey(
         "Proposal", null=True, blank=True, on_delete=models.SET_NULL, related_name="selected_for"
     )
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -52,6 +64,7 @@ class Project(models.Model):
             models.Index(fields=["status", "category", "-created_at"], name="idx_project_status_cat_created"),
             models.Index(fields=["status", "-created_at"], name="idx_project_status_created"),
             models.Index(fields=["-created_at"], name="idx_project_created"),
+            GinIndex(fields=["search_vector"], name="idx_project_search_gin"),
         ]
 
 
@@ -1,7 +1,7 @@
 """Project domain services."""
 from django.db import transaction
 
-from common.cache_utils import bump_admin_resource_version, bump_project_version
+from common.cache_utils import bump_admin_resource_version, bump_project_list_facets, bump_project_version
 from common.exceptions import DomainError
 from common.state_guards import guard_project_transition
 
@@ -15,12 +15,14 @@ def select_freelancer(project: Project, proposal: Proposal) -> Project:
     if proposal.project_id != project.id:
         raise DomainError("Selected proposal must belong to the project")
     guard_project_transition(project.status, Project.STATUS_IN_PROGRESS)
+    previous_status = project.status
     project.status = Project.STATUS_IN_PROGRESS
     project.selected_proposal = proposal
     proposal.status = Proposal.STATUS_ACCEPTED
     proposal.save(update_fields=["status"])
     project.save(update_fields=["status", "selected_proposal"])
     bump_project_version(project.id)
+    bump_project_list_facets(statuses=(previous_status, project.status), categories=(project.category,))
     bump_admin_resource_version("projects")
     return project
 
@@ -29,9 +31,11 @@ def close_project(project: Project) -> Project:
     if project.status != Project.STATUS_OPEN:
         raise DomainError("Project is not open")
     guard_project_transition(project.status, Project.STATUS_CLOSED_REFUNDED)
+    previous_status = project.status
     project.status = Project.STATUS_CLOSED_REFUNDED
     project.save(update_fields=["status"])
     bump_project_version(project.id)
+    bump_project_list_facets(statuses=(previous_status, project.status), categories=(project.category,))
     bump_admin_resource_version("projects")
     return project
 
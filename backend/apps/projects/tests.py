@@ -1,8 +1,12 @@
+import gzip
+import json
+
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from apps.accounts.models import User
+from apps.projects.models import Project
 
 
 class AiDescriptionSuggestTests(TestCase):
@@ -40,3 +44,228 @@ class AiDescriptionSuggestTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("description", response.json())
         self.assertIn("Build marketplace", response.json()["description"])
+
+
+class ProjectSearchTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(email="client-search@test.com", password="Pass12345", role="client")
+
+    def _create_project(self, title, description, status="open", category="web"):
+        return Project.objects.create(
+            owner=self.owner,
+            title=title,
+            description=description,
+            budget=500000,
+            timeline_days=10,
+            category=category,
+            status=status,
+        )
+
+    def _search_ids(self, **params):
+        response = self.client_api.get("/api/v1/projects", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_cyrillic_prefix_search_matches_title_and_description(self):
+        in_title = self._create_project("Вэб сайт хөгжүүлэлт", "Landing page")
+        in_description = self._create_project("Landing page", "Шинэ вэб сайтын дизайн")
+        self._create_project("POS засвар", "Сүлжээтэй холболтын алдаа")
+
+        self.assertEqual(self._search_ids(search="ВЭБ"), [in_title.id, in_description.id])
+
+    def test_latin_search_combines_with_status_filter(self):
+        open_project = self._create_project("React dashboard", "Admin UI")
+        self._create_project("React landing", "Marketing", status="closed_refunded")
+
+        self.assertEqual(self._search_ids(search="react, dash!", status="open"), [open_project.id])
+
+    def test_punctuation_only_search_returns_empty(self):
+        self._create_project("React dashboard", "Admin UI")
+
+        self.assertEqual(self._search_ids(search="!!!"), [])
+
+
+class ProjectCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(email="client-cursor@test.com", password="Pass12345", role="client")
+        self.projects = [
+            Project.objects.create(
+                owner=self.owner,
+                title=f"Cursor project {index}",
+                description="desc",
+                budget=100000,
+                timeline_days=5,
+                category="cursor",
+            )
+            for index in range(21)
+        ]
+
+    def test_cursor_mode_walks_pages_without_count(self):
+        newest_first = [project.id for project in reversed(self.projects)]
+
+        first = self.client_api.get("/api/v1/projects", {"category": "cursor", "pagination": "cursor"})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        body = first.json()
+        self.assertNotIn("count", body)
+        self.assertIsNone(body["previous"])
+        self.assertEqual([item["id"] for item in body["results"]], newest_first[:20])
+
+        seen = [item["id"] for item in body["results"]]
+        next_url = body["next"]
+        while next_url:
+            page = self.client_api.get(next_url).json()
+            seen.extend(item["id"] for item in page["results"])
+            last_page, next_url = page, page["next"]
+        self.assertEqual(seen, newest_first)
+
+        previous = self.client_api.get(last_page["previous"]).json()
+        self.assertEqual([item["id"] for item in previous["results"]], newest_first[:20])
+
+    def test_offset_mode_is_default(self):
+        response = self.client_api.get("/api/v1/projects", {"category": "cursor"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 21)
+
+    def test_cursor_mode_is_refused_for_ranked_search(self):
+        response = self.client_api.get("/api/v1/projects", {"search": "cursor", "pagination": "cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        ranked = self.client_api.get("/api/v1/projects", {"search": "cursor"})
+        self.assertEqual(ranked.status_code, status.HTTP_200_OK)
+        self.assertEqual(ranked.json()["count"], 21)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client_api.get("/api/v1/projects", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProjectListTagInvalidationTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(email="client-tags@test.com", password="Pass12345", role="client")
+
+    def _list_ids(self, **params):
+        response = self.client_api.get("/api/v1/projects", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_new_project_invalidates_matching_facet_pages(self):
+        self.assertEqual(self._list_ids(category="tags-design"), [])
+
+        self.client_api.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            create = self.client_api.post(
+                "/api/v1/projects",
+                {
+                    "title": "Logo",
+                    "description": "Brand kit",
+                    "budget": 90000,
+                    "timeline_days": 5,
+                    "category": "tags-design",
+                },
+                format="json",
+            )
+        self.assertEqual(create.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self._list_ids(category="tags-design"), [create.json()["id"]])
+
+    def test_edit_invalidates_pages_listing_the_project(self):
+        project = Project.objects.create(
+            owner=self.owner, title="Old title", description="desc", budget=90000, timeline_days=5, category="tags-web"
+        )
+        first = self.client_api.get("/api/v1/projects", {"category": "tags-web"})
+        self.assertEqual(first.json()["results"][0]["title"], "Old title")
+
+        self.client_api.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            patch = self.client_api.patch(f"/api/v1/projects/{project.id}", {"title": "New title"}, format="json")
+        self.assertEqual(patch.status_code, status.HTTP_200_OK)
+
+        second = self.client_api.get("/api/v1/projects", {"category": "tags-web"})
+        self.assertEqual(second.json()["results"][0]["title"], "New title")
+
+
+class ProjectListRenderedCacheTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        owner = User.objects.create_user(email="client-bytes@test.com", password="Pass12345", role="client")
+        for index in range(10):
+            Project.objects.create(
+                owner=owner,
+                title=f"Rendered cache {index}",
+                description="x" * 200,
+                budget=100000,
+                timeline_days=5,
+                category="bytes",
+            )
+
+    def test_hit_serves_cached_bytes_with_etag_and_gzip(self):
+        first = self.client_api.get("/api/v1/projects", {"category": "bytes"})
+        second = self.client_api.get("/api/v1/projects", {"category": "bytes"}, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first["Content-Type"], "application/json")
+        self.assertEqual(first.json()["count"], 10)
+        self.assertEqual(second["Content-Encoding"], "gzip")
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(json.loads(gzip.decompress(second.content)), first.json())
+
+    def test_gzip_follows_accept_encoding_quality_values(self):
+        self.client_api.get("/api/v1/projects", {"category": "bytes"})
+        for accept, encoding in (
+            ("gzip;q=0", None),
+            ("gzip;q=0, *", None),
+            ("*;q=0.5", "gzip"),
+            ("br, gzip;q=0.3", "gzip"),
+            ("br", None),
+        ):
+            with self.subTest(accept=accept):
+                response = self.client_api.get("/api/v1/projects", {"category": "bytes"}, HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertIn("Accept-Encoding", response["Vary"])
+        browsable = self.client_api.get("/api/v1/projects", {"category": "bytes", "format": "api"})
+        self.assertIn("Accept-Encoding", browsable["Vary"])
+
+
+class ProjectDetailConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(email="client-etag@test.com", password="Pass12345", role="client")
+        self.project = Project.objects.create(
+            owner=self.owner,
+            title="Conditional project",
+            description="ETag",
+            budget=100000,
+            timeline_days=5,
+            category="etag",
+        )
+
+    def test_matching_etag_returns_304_without_queries(self):
+        first = self.client_api.get(f"/api/v1/projects/{self.project.id}")
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn("no-cache", first["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            second = self.client_api.get(f"/api/v1/projects/{self.project.id}", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.content, b"")
+
+    def test_edit_changes_etag(self):
+        first = self.client_api.get(f"/api/v1/projects/{self.project.id}")
+
+        self.client_api.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_api.patch(f"/api/v1/projects/{self.project.id}", {"title": "Edited"}, format="json")
+        self.client_api.force_authenticate(None)
+
+        second = self.client_api.get(f"/api/v1/projects/{self.project.id}", HTTP_IF_NONE_MATCH=f'W/{first["ETag"]}')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json()["title"], "Edited")
+        self.assertNotEqual(second["ETag"], first["ETag"])
+
+    def test_forged_etag_is_ignored(self):
+        response = self.client_api.get(f"/api/v1/projects/{self.project.id}", HTTP_IF_NONE_MATCH='"0123456789abcdef", *')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
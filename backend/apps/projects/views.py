@@ -1,6 +1,6 @@
 """Project and proposal views."""
-from django.db.models import Q
-from django.core.cache import cache
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
 from rest_framework.exceptions import ValidationError
@@ -8,7 +8,19 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.messaging.models import ProjectFile
-from common.cache_utils import bump_admin_resource_version, bump_project_version, project_detail_cache_key, project_list_cache_key
+from common.cache_utils import (
+    bump_admin_resource_version,
+    bump_project_list_facets,
+    bump_project_version,
+    project_detail_cache_key,
+    project_list_cache_key,
+    project_list_facet_tags,
+    project_list_item_tags,
+    project_version_key,
+    stale_cache_key,
+)
+from common.cached_read import cached_json_response
+from common.search import SEARCH_CONFIG, build_prefix_tsquery, normalize_search_terms
 
 from .models import Project, ProjectDeliverable, Proposal
 from .permissions import IsClient, IsFreelancer
@@ -40,7 +52,15 @@ class ProjectListCreateView(generics.ListCreateAPIView):
         if category_filter:
             queryset = queryset.filter(category=category_filter)
         if search:
-            queryset = queryset.filter(Q(title__icontains=search) | Q(description__icontains=search))
+            terms = normalize_search_terms(search)
+            if not terms:
+                return queryset.none()
+            query = SearchQuery(build_prefix_tsquery(terms), search_type="raw", config=SEARCH_CONFIG)
+            queryset = (
+                queryset.filter(search_vector=query)
+                .annotate(search_rank=SearchRank(F("search_vector"), query))
+                .order_by("-search_rank", "-created_at")
+            )
         return queryset
 
     def get_permissions(self):
@@ -51,17 +71,21 @@ class ProjectListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         project = serializer.save(owner=self.request.user)
         bump_project_version(project.id)
+        bump_project_list_facets(statuses=(project.status,), categories=(project.category,))
         bump_admin_resource_version("projects")
 
     def list(self, request, *args, **kwargs):
-        cache_key = project_list_cache_key(request.query_params)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
-
-        response = super().list(request, *args, **kwargs)
-        cache.set(cache_key, response.data, timeout=60)
-        return response
+        def _compute():
+            return super(ProjectListCreateView, self).list(request, *args, **kwargs).data
+
+        return cached_json_response(
+            request,
+            project_list_cache_key(request.query_params),
+            _compute,
+            timeout=600,
+            tags=project_list_facet_tags(request.query_params),
+            result_tags=lambda data: project_list_item_tags(item["id"] for item in data["results"]),
+        )
 
 
 class ProjectDetailView(generics.RetrieveUpdateAPIView):
@@ -81,19 +105,24 @@ class ProjectDetailView(generics.RetrieveUpdateAPIView):
             return Response({"detail": "Project is not open"}, status=status.HTTP_400_BAD_REQUEST)
         response = super().patch(request, *args, **kwargs)
         bump_project_version(project.id)
+        bump_project_list_facets(statuses=(project.status,), categories=(project.category, response.data["category"]))
         bump_admin_resource_version("projects")
         return response
 
     def retrieve(self, request, *args, **kwargs):
-        project_id = kwargs["pk"]
-        cache_key = project_detail_cache_key(project_id)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
-
-        response = super().retrieve(request, *args, **kwargs)
-        cache.set(cache_key, response.data, timeout=60)
-        return response
+        cache_key = project_detail_cache_key(kwargs["pk"])
+
+        def _compute():
+            return super(ProjectDetailView, self).retrieve(request, *args, **kwargs).data
+
+        return cached_json_response(
+            request,
+            cache_key,
+            _compute,
+            timeout=60,
+            stale_key=stale_cache_key(cache_key),
+            etag_keys=[project_version_key(kwargs["pk"])],
+        )
 
 
 class ProjectCloseView(APIView):
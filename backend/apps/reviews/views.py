@@ -1,13 +1,18 @@
 """Review views."""
 from django.db.models import Avg, Count
-from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
 from rest_framework.exceptions import PermissionDenied, ValidationError
-from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from common.cache_utils import bump_user_public_version, rating_summary_cache_key, user_reviews_cache_key
+from common.cache_utils import (
+    bump_user_public_version,
+    rating_summary_cache_key,
+    stale_cache_key,
+    user_public_version_key,
+    user_reviews_cache_key,
+)
+from common.cached_read import cached_json_response
 from apps.projects.models import Project
 
 from .models import Review
@@ -46,28 +51,32 @@ class UserReviewsListView(generics.ListAPIView):
         return Review.objects.filter(reviewee_id=self.kwargs["user_id"]).order_by("-created_at")
 
     def list(self, request, *args, **kwargs):
-        user_id = kwargs["user_id"]
-        cache_key = user_reviews_cache_key(user_id, request.query_params)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
+        cache_key = user_reviews_cache_key(kwargs["user_id"], request.query_params)
 
-        response = super().list(request, *args, **kwargs)
-        cache.set(cache_key, response.data, timeout=180)
-        return response
+        def _compute():
+            return super(UserReviewsListView, self).list(request, *args, **kwargs).data
+
+        return cached_json_response(request, cache_key, _compute, timeout=180, stale_key=stale_cache_key(cache_key))
+
+
+def _rating_summary(user_id):
+    summary = Review.objects.filter(reviewee_id=user_id).aggregate(
+        avg_rating=Avg("rating"),
+        total=Count("id"),
+    )
+    return {"average": summary["avg_rating"] or 0, "total": summary["total"]}
 
 
 class UserRatingSummaryView(APIView):
     def get(self, request, user_id):
         cache_key = rating_summary_cache_key(user_id)
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
-
-        summary = Review.objects.filter(reviewee_id=user_id).aggregate(
-            avg_rating=Avg("rating"),
-            total=Count("id"),
+        return cached_json_response(
+            request,
+            cache_key,
+            _rating_summary,
+            args=(user_id,),
+            timeout=300,
+            soft_timeout=240,
+            stale_key=stale_cache_key(cache_key),
+            etag_keys=[user_public_version_key(user_id)],
         )
-        payload = {"average": summary["avg_rating"] or 0, "total": summary["total"]}
-        cache.set(cache_key, payload, timeout=300)
-        return Response(payload)
@@ -1,13 +1,21 @@
 """Cache key and invalidation helpers for read scalability."""
 import hashlib
 import json
+import re
 
-from django.core.cache import cache
+from common.invalidation import bump_version
+from common.search import normalize_search_terms
+from common.version_cache import get_version, get_versions
 
 
 PROJECT_VERSION_PREFIX = "project:version"
 USER_PUBLIC_VERSION_PREFIX = "user_public:version"
 ADMIN_RESOURCE_VERSION_PREFIX = "admin:resource:version"
+PAYMENT_STATUS_VERSION_PREFIX = "payment_status:version"
+PROJECT_LIST_TAG_PREFIX = "projects:list:tag"
+PLATFORM_SETTINGS_VERSION_KEY = "platform_settings:version"
+
+_VERSION_SEGMENT = re.compile(r":v\d+(?=:|$)")
 
 
 def _stable_query_fingerprint(query_params) -> str:
@@ -19,58 +27,102 @@ def _stable_query_fingerprint(query_params) -> str:
 
 
 def project_list_cache_key(query_params) -> str:
-    return f"projects:list:{_stable_query_fingerprint(query_params)}"
+    params = query_params.copy()
+    if "search" in params:
+        params.setlist("search", [" ".join(normalize_search_terms(params.get("search")))])
+    return f"projects:list:{_stable_query_fingerprint(params)}"
+
+
+def project_list_facet_tags(query_params) -> list[str]:
+    return [
+        f"{PROJECT_LIST_TAG_PREFIX}:status:{query_params.get('status') or '*'}",
+        f"{PROJECT_LIST_TAG_PREFIX}:category:{query_params.get('category') or '*'}",
+    ]
+
+
+def project_list_item_tags(project_ids) -> list[str]:
+    return [project_version_key(project_id) for project_id in project_ids]
+
+
+def bump_project_list_facets(*, statuses, categories) -> None:
+    tags = {f"{PROJECT_LIST_TAG_PREFIX}:status:*", f"{PROJECT_LIST_TAG_PREFIX}:category:*"}
+    tags.update(f"{PROJECT_LIST_TAG_PREFIX}:status:{value}" for value in statuses if value)
+    tags.update(f"{PROJECT_LIST_TAG_PREFIX}:category:{value}" for value in categories if value)
+    for tag in tags:
+        bump_version(tag)
+
+
+def read_tag_versions(tags) -> dict[str, int]:
+    return get_versions(tags)
+
+
+def stale_cache_key(versioned_key: str) -> str:
+    """Map a versioned key to the slot that keeps the last payload across version bumps."""
+    return _VERSION_SEGMENT.sub(":stale", versioned_key, count=1)
+
+
+def project_version_key(project_id: int) -> str:
+    return f"{PROJECT_VERSION_PREFIX}:{project_id}"
 
 
 def project_detail_cache_key(project_id: int) -> str:
-    version = cache.get(f"{PROJECT_VERSION_PREFIX}:{project_id}") or 1
+    version = get_version(project_version_key(project_id))
     return f"projects:detail:{project_id}:v{version}"
 
 
 def bump_project_version(project_id: int) -> None:
-    version_key = f"{PROJECT_VERSION_PREFIX}:{project_id}"
-    try:
-        cache.incr(version_key)
-    except ValueError:
-        cache.set(version_key, 2, timeout=None)
+    bump_version(project_version_key(project_id))
+
+
+def payment_status_version_key(project_id: int) -> str:
+    return f"{PAYMENT_STATUS_VERSION_PREFIX}:{project_id}"
+
+
+def bump_payment_status_version(project_id: int) -> None:
+    bump_version(payment_status_version_key(project_id))
+
+
+def user_public_version_key(user_id: int) -> str:
+    return f"{USER_PUBLIC_VERSION_PREFIX}:{user_id}"
 
 
 def rating_summary_cache_key(user_id: int) -> str:
-    version = cache.get(f"{USER_PUBLIC_VERSION_PREFIX}:{user_id}") or 1
+    version = get_version(user_public_version_key(user_id))
     return f"reviews:summary:{user_id}:v{version}"
 
 
 def user_reviews_cache_key(user_id: int, query_params) -> str:
-    version = cache.get(f"{USER_PUBLIC_VERSION_PREFIX}:{user_id}") or 1
+    version = get_version(user_public_version_key(user_id))
     return f"reviews:list:{user_id}:v{version}:{_stable_query_fingerprint(query_params)}"
 
 
 def profile_cache_key(user_id: int) -> str:
-    version = cache.get(f"{USER_PUBLIC_VERSION_PREFIX}:{user_id}") or 1
+    version = get_version(user_public_version_key(user_id))
     return f"profiles:detail:{user_id}:v{version}"
 
 
 def bump_user_public_version(user_id: int) -> None:
-    version_key = f"{USER_PUBLIC_VERSION_PREFIX}:{user_id}"
-    try:
-        cache.incr(version_key)
-    except ValueError:
-        cache.set(version_key, 2, timeout=None)
+    bump_version(user_public_version_key(user_id))
 
 
 def admin_list_cache_key(resource: str, query_params) -> str:
-    version = cache.get(f"{ADMIN_RESOURCE_VERSION_PREFIX}:{resource}") or 1
+    version = get_version(f"{ADMIN_RESOURCE_VERSION_PREFIX}:{resource}")
     return f"admin:list:{resource}:v{version}:{_stable_query_fingerprint(query_params)}"
 
 
 def admin_detail_cache_key(resource: str) -> str:
-    version = cache.get(f"{ADMIN_RESOURCE_VERSION_PREFIX}:{resource}") or 1
+    version = get_version(f"{ADMIN_RESOURCE_VERSION_PREFIX}:{resource}")
     return f"admin:detail:{resource}:v{version}"
 
 
 def bump_admin_resource_version(resource: str) -> None:
-    version_key = f"{ADMIN_RESOURCE_VERSION_PREFIX}:{resource}"
-    try:
-        cache.incr(version_key)
-    except ValueError:
-        cache.set(version_key, 2, timeout=None)
+    bump_version(f"{ADMIN_RESOURCE_VERSION_PREFIX}:{resource}")
+
+
+def platform_settings_cache_key() -> str:
+    version = get_version(PLATFORM_SETTINGS_VERSION_KEY)
+    return f"platform_settings:solo:v{version}"
+
+
+def bump_platform_settings_version() -> None:
+    bump_version(PLATFORM_SETTINGS_VERSION_KEY)
@@ -0,0 +1,254 @@
+"""Read-through cache helpers with single-flight recompute and stale-while-revalidate."""
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from common.cache_utils import read_tag_versions
+from common.conditional import apply_etag, matching_etag, not_modified, version_etag
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT_SECONDS = 10
+WAIT_TIMEOUT_SECONDS = 2.0
+WAIT_INTERVAL_SECONDS = 0.05
+STALE_TIMEOUT_SECONDS = 3600
+GZIP_MIN_BYTES = 1024
+# Deletes the lock only while it still holds our token, in one round trip.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def cached_read(
+    cache_key: str,
+    compute,
+    *,
+    args=(),
+    timeout: int,
+    soft_timeout: int | None = None,
+    stale_key: str | None = None,
+    tags=(),
+    result_tags=None,
+):
+    """Return the cached payload for ``cache_key`` or compute it once across all workers.
+
+    Only the worker holding the recompute lock calls ``compute(*args)``; the others are served
+    the previous payload (an invalidated entry or ``stale_key``) or wait briefly for the
+    winner. With ``soft_timeout`` an entry older than that is still served while a single
+    background refresh runs after the response, so ``compute`` must then be a module-level
+    function of plain ``args`` (ids, query values) rather than a closure over the request or view.
+    ``tags``/``result_tags`` record tag versions for validation.
+    """
+    if soft_timeout is not None:
+        _require_detached(compute)
+    entry = cache.get(cache_key)
+    stale_entry = None
+    if entry is not None:
+        if _tags_current(entry):
+            if entry["fresh_until"] > time.time():
+                return entry["payload"]
+            token = _acquire_lock(cache_key)
+            if token:
+                _refresh_in_background(
+                    cache_key, compute, args, token, timeout, soft_timeout, stale_key, tags, result_tags
+                )
+            return entry["payload"]
+        stale_entry = entry
+    if stale_entry is None and stale_key:
+        stale_entry = cache.get(stale_key)
+
+    token = _acquire_lock(cache_key)
+    if token:
+        try:
+            return _compute_and_store(cache_key, compute, args, timeout, soft_timeout, stale_key, tags, result_tags)
+        finally:
+            _release_lock(cache_key, token)
+
+    if stale_entry is not None:
+        return stale_entry["payload"]
+    deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL_SECONDS)
+        entry = cache.get(cache_key)
+        if entry is not None and _tags_current(entry):
+            return entry["payload"]
+    logger.warning("Single-flight wait timed out for %s; computing locally", cache_key)
+    return _compute_and_store(cache_key, compute, args, timeout, soft_timeout, stale_key, tags, result_tags)
+
+
+def cached_json_response(request, cache_key: str, compute, *, args=(), result_tags=None, etag_keys=(), **options):
+    """Serve ``compute(*args)`` as JSON, caching the rendered (and gzipped) bytes instead of the data.
+
+    Hits skip serializers and renderers entirely. Accepts the same options as ``cached_read``;
+    ``result_tags`` still receives the computed data rather than the rendered entry. With
+    ``etag_keys`` the response carries a version ETag and a matching ``If-None-Match`` is
+    answered with 304 from the version counters alone, before the cache is read.
+    """
+    if options.get("soft_timeout") is not None:
+        _require_detached(compute)
+    versions = read_tag_versions(etag_keys) if etag_keys else None
+    if versions:
+        etag = matching_etag(request, versions)
+        if etag:
+            return not_modified(etag)
+
+    computed = {}
+
+    def _entry_tags(_entry):
+        return result_tags(computed["data"])
+
+    rendered = cached_read(
+        cache_key,
+        _render_entry,
+        args=(compute, tuple(args), tuple(etag_keys), computed),
+        result_tags=_entry_tags if result_tags else None,
+        **options,
+    )
+    response = rendered_json_response(request, rendered)
+    # A stale payload served during a recompute predates these versions and keeps its body ETag.
+    if versions and rendered.get("versions") == versions:
+        apply_etag(response, version_etag(request, versions))
+    return response
+
+
+def _render_entry(compute, args, etag_keys, computed: dict) -> dict:
+    entry_versions = read_tag_versions(etag_keys) if etag_keys else None
+    data = computed["data"] = compute(*args)
+    entry = render_json_entry(data)
+    if entry_versions:
+        entry["versions"] = entry_versions
+    return entry
+
+
+def render_json_entry(data) -> dict:
+    body = JSONRenderer().render(data)
+    return {
+        "body": body,
+        "gzip": gzip.compress(body) if len(body) >= GZIP_MIN_BYTES else None,
+        "content_type": JSONRenderer.media_type,
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+    }
+
+
+def rendered_json_response(request, rendered: dict):
+    accepted = getattr(request, "accepted_renderer", None)
+    if accepted is not None and accepted.format != "json":
+        # The browsable API and other renderers still need the data itself.
+        response = Response(json.loads(rendered["body"]))
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    if rendered["gzip"] is not None and _accepts_gzip(request):
+        response = HttpResponse(rendered["gzip"], content_type=rendered["content_type"])
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(rendered["body"], content_type=rendered["content_type"])
+    response["ETag"] = f'"{rendered["etag"]}"'
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def _accepts_gzip(request) -> bool:
+    """Whether Accept-Encoding allows gzip: an explicit ``gzip;q=0`` refuses it even next to ``*``."""
+    qualities = {}
+    for coding in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, *params = coding.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _compute_and_store(cache_key, compute, args, timeout, soft_timeout, stale_key, tags, result_tags):
+    tag_versions = read_tag_versions(tags)
+    payload = compute(*args)
+    if result_tags is not None:
+        tag_versions.update(read_tag_versions(result_tags(payload)))
+    fresh_for = soft_timeout if soft_timeout is not None else timeout
+    entry = {"payload": payload, "fresh_until": time.time() + fresh_for, "tags": tag_versions}
+    cache.set(cache_key, entry, timeout=timeout)
+    if stale_key:
+        cache.set(stale_key, entry, timeout=STALE_TIMEOUT_SECONDS)
+    return payload
+
+
+def _require_detached(compute) -> None:
+    # Bound methods, partials and nested functions can all carry request state into the refresh.
+    if not inspect.isfunction(compute) or compute.__closure__ or "<locals>" in compute.__qualname__:
+        raise TypeError(
+            f"{compute!r} is not a module-level function; a soft_timeout refresh runs after the "
+            "response, so pass a module-level function and its plain args instead."
+        )
+
+
+def _refresh_in_background(cache_key, compute, args, token, *options) -> None:
+    def _run():
+        try:
+            _compute_and_store(cache_key, compute, args, *options)
+        except Exception:
+            logger.exception("Background cache refresh failed for %s", cache_key)
+        finally:
+            _release_lock(cache_key, token)
+            connections.close_all()
+
+    threading.Thread(target=_run, name=f"cache-refresh:{cache_key}", daemon=True).start()
+
+
+def _tags_current(entry) -> bool:
+    tags = entry.get("tags")
+    return not tags or read_tag_versions(tags) == tags
+
+
+def _lock_key(cache_key: str) -> str:
+    return f"{cache_key}:lock"
+
+
+def _acquire_lock(cache_key: str) -> str | None:
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(cache_key), token, timeout=LOCK_TIMEOUT_SECONDS):
+        return token
+    return None
+
+
+def _release_lock(cache_key: str, token: str) -> None:
+    lock_key = _lock_key(cache_key)
+    if not _uses_redis():
+        # Local-memory cache: one process, so no other worker can take the lock in between.
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+        return
+    from django_redis import get_redis_connection
+
+    try:
+        get_redis_connection("default").eval(
+            RELEASE_LOCK_SCRIPT, 1, str(cache.make_key(lock_key)), cache.client.encode(token)
+        )
+    except Exception:
+        # The lock still expires after LOCK_TIMEOUT_SECONDS.
+        logger.warning("Failed to release cache lock %s", lock_key, exc_info=True)
+
+
+def _uses_redis() -> bool:
+    return settings.CACHES["default"]["BACKEND"] == "django_redis.cache.RedisCache"
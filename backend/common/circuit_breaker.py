@@ -0,0 +1,111 @@
+"""Circuit breaker whose state lives in the shared cache, so every worker trips and recovers together."""
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common.exceptions import ServiceUnavailableError
+from common.shared_counters import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    default_detail = "Upstream service is unavailable; retry later."
+    default_code = "circuit_open"
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable; retry in {math.ceil(retry_after)}s.")
+        self.name = name
+        self.retry_after = retry_after
+        self.wait = max(math.ceil(retry_after), 1)
+
+
+class CircuitBreaker:
+    """Open after ``FAILURE_THRESHOLD`` failures within ``WINDOW_SECONDS``; probe after ``RESET_SECONDS``.
+
+    Thresholds are read from ``{settings_prefix}_*`` on every call. While open, calls fail
+    fast with ``CircuitOpenError``. Once the reset period passes, one caller across all
+    workers is let through as a probe: success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name: str, *, settings_prefix: str):
+        self.name = name
+        self.settings_prefix = settings_prefix
+        self._state_key = f"circuit:{name}:state"
+        self._failures_key = f"circuit:{name}:failures"
+        self._probe_key = f"circuit:{name}:probe"
+        self._counters = SharedCounters(
+            f"circuit:{name}:stats", ("opened", "closed", "probes", "rejected", "failures")
+        )
+
+    def before_call(self) -> None:
+        """Raise ``CircuitOpenError`` unless the call may go out."""
+        opened = cache.get(self._state_key)
+        if opened is None:
+            return
+        remaining = opened["until"] - time.time()
+        if remaining <= 0 and cache.add(self._probe_key, 1, timeout=self._setting("RESET_SECONDS")):
+            self._count("probes")
+            logger.info("Circuit %s half-open; sending a probe", self.name)
+            return
+        self._count("rejected")
+        raise CircuitOpenError(self.name, max(remaining, 0) or self._setting("RESET_SECONDS"))
+
+    def record_success(self) -> None:
+        if cache.get(self._state_key) is None:
+            return
+        cache.delete_many([self._state_key, self._failures_key, self._probe_key])
+        self._count("closed")
+        logger.warning("Circuit %s closed", self.name)
+
+    def record_failure(self) -> None:
+        self._count("failures")
+        if cache.get(self._state_key) is not None:
+            # A failed probe: stay open for another reset period.
+            self._open()
+            return
+        window = self._setting("WINDOW_SECONDS")
+        cache.add(self._failures_key, 0, timeout=window)
+        try:
+            failures = cache.incr(self._failures_key)
+        except ValueError:
+            cache.set(self._failures_key, 1, timeout=window)
+            failures = 1
+        if failures >= self._setting("FAILURE_THRESHOLD"):
+            self._open()
+
+    def state(self) -> str:
+        opened = cache.get(self._state_key)
+        if opened is None:
+            return STATE_CLOSED
+        return STATE_OPEN if opened["until"] > time.time() else STATE_HALF_OPEN
+
+    def stats(self) -> dict:
+        """Current state plus transition and rejection counts, both shared by every worker."""
+        stats = self._counters.snapshot()
+        stats["state"] = self.state()
+        return stats
+
+    def reset(self) -> None:
+        cache.delete_many([self._state_key, self._failures_key, self._probe_key])
+
+    def _open(self) -> None:
+        reset_seconds = self._setting("RESET_SECONDS")
+        now = time.time()
+        cache.set(self._state_key, {"opened_at": now, "until": now + reset_seconds}, timeout=None)
+        cache.delete_many([self._failures_key, self._probe_key])
+        self._count("opened")
+        logger.warning("Circuit %s opened for %ss", self.name, reset_seconds)
+
+    def _setting(self, name: str):
+        return getattr(settings, f"{self.settings_prefix}_{name}")
+
+    def _count(self, name: str) -> None:
+        self._counters.incr(name)
@@ -0,0 +1,78 @@
+"""Conditional GETs with strong ETags derived from cache version counters."""
+import time
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+ETAG_SALT = "common.conditional.version_etag"
+
+
+def version_etag(request, versions: dict[str, int], *, per_user: bool = False, valid_until: int | None = None) -> str:
+    """Build the ETag for ``request.path`` at the given version counter values.
+
+    The tag is an HMAC, so it cannot be forged for a version or user the client never saw.
+    ``per_user`` binds it to the authenticated user; ``valid_until`` (a unix timestamp) is
+    carried in the tag and stops it matching once the state may have changed by time alone.
+    """
+    return _etag(request, versions, per_user, valid_until)
+
+
+def matching_etag(request, versions: dict[str, int], *, per_user: bool = False) -> str | None:
+    """Return the client's ``If-None-Match`` tag if it was issued for these versions and has not lapsed."""
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return None
+    for candidate in _parse_etags(header):
+        valid_until = _valid_until(candidate)
+        if valid_until is not None and valid_until <= time.time():
+            continue
+        current = _etag(request, versions, per_user, valid_until)
+        if constant_time_compare(candidate, current):
+            return current
+    return None
+
+
+def not_modified(etag: str, *, per_user: bool = False) -> HttpResponseNotModified:
+    return apply_etag(HttpResponseNotModified(), etag, per_user=per_user)
+
+
+def apply_etag(response, etag: str, *, per_user: bool = False):
+    response["ETag"] = etag
+    # Clients must revalidate every time; the 304 path is what keeps that cheap.
+    patch_cache_control(response, no_cache=True, private=per_user or None)
+    if per_user:
+        patch_vary_headers(response, ("Authorization", "Cookie"))
+    return response
+
+
+def _etag(request, versions: dict[str, int], per_user: bool, valid_until: int | None) -> str:
+    parts = [request.path, *(f"{key}={versions[key]}" for key in sorted(versions))]
+    if per_user:
+        parts.append(f"user={request.user.pk}")
+    if valid_until is not None:
+        parts.append(f"until={valid_until}")
+    digest = salted_hmac(ETAG_SALT, "|".join(parts), algorithm="sha256").hexdigest()[:32]
+    return f'"{digest}-{valid_until}"' if valid_until is not None else f'"{digest}"'
+
+
+def _parse_etags(header: str) -> list[str]:
+    tags = []
+    for raw in header.split(","):
+        tag = raw.strip()
+        # Proxies that compress responses (nginx gzip) weaken strong tags; If-None-Match compares weakly anyway.
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if len(tag) >= 2 and tag.startswith('"') and tag.endswith('"'):
+            tags.append(tag)
+    return tags
+
+
+def _valid_until(tag: str) -> int | None:
+    _digest, sep, suffix = tag.strip('"').partition("-")
+    if not sep:
+        return None
+    try:
+        return int(suffix)
+    except ValueError:
+        return None
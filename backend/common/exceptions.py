@@ -6,3 +6,23 @@ class DomainError(APIException):
     status_code = 400
     default_detail = "Domain error"
     default_code = "domain_error"
+
+
+class ConflictError(APIException):
+    status_code = 409
+    default_detail = "Conflicting request in progress"
+    default_code = "conflict"
+    # Surfaced by DRF's exception handler as a Retry-After header.
+    wait = 1
+
+
+class ServiceUnavailableError(APIException):
+    status_code = 503
+    default_detail = "Service temporarily unavailable, try again later."
+    default_code = "service_unavailable"
+    wait = 1
+
+    def __init__(self, detail=None, code=None, *, wait=None):
+        super().__init__(detail, code)
+        if wait is not None:
+            self.wait = wait
@@ -0,0 +1,112 @@
+"""Collect cache version bumps and flush them once, after the writes they describe are committed."""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from common.version_cache import bump_versions
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"requested": 0, "flushed": 0, "coalesced": 0, "batches": 0}
+
+
+class InvalidationBatch:
+    """Distinct version keys plus how many bumps were requested for them."""
+
+    def __init__(self):
+        self.keys: set[str] = set()
+        self.requested = 0
+
+    def add(self, keys, requested: int | None = None) -> None:
+        keys = list(keys)
+        self.keys.update(keys)
+        self.requested += len(keys) if requested is None else requested
+
+    def __bool__(self) -> bool:
+        return bool(self.keys)
+
+
+def bump_version(key: str) -> None:
+    """Schedule a version bump for ``key``.
+
+    Inside ``transaction.atomic`` the bump waits for the outermost commit, so readers cannot
+    re-cache pre-commit state under the new version. Inside ``collect_invalidations`` (every
+    request, via the middleware) committed bumps are held until the request finishes.
+    """
+    if transaction.get_connection().in_atomic_block:
+        batch = getattr(_state, "pending", None)
+        if batch is None:
+            batch = _state.pending = InvalidationBatch()
+        batch.add([key])
+        # Registered per bump: callbacks of a rolled-back savepoint are dropped, and the survivors
+        # flush whatever is pending. Keys left behind by a full rollback are dropped when the
+        # surrounding collect_invalidations block (the request) exits.
+        transaction.on_commit(_flush_pending)
+        return
+    batch = InvalidationBatch()
+    batch.add([key])
+    _dispatch(batch)
+
+
+@contextmanager
+def collect_invalidations():
+    """Hold bumps made inside the block and flush them in one call when it exits."""
+    if getattr(_state, "request", None) is not None:
+        yield _state.request
+        return
+    batch = _state.request = InvalidationBatch()
+    try:
+        yield batch
+    finally:
+        _state.request = None
+        if not transaction.get_connection().in_atomic_block:
+            # Committed bumps were flushed by their on_commit callbacks; the rest were rolled back.
+            _state.pending = None
+        flush(batch)
+
+
+def flush(batch: InvalidationBatch) -> None:
+    if not batch:
+        return
+    bump_versions(batch.keys)
+    coalesced = batch.requested - len(batch.keys)
+    with _stats_lock:
+        _stats["requested"] += batch.requested
+        _stats["flushed"] += len(batch.keys)
+        _stats["coalesced"] += coalesced
+        _stats["batches"] += 1
+    logger.debug("Flushed %s cache version bumps (%s coalesced)", len(batch.keys), coalesced)
+
+
+def invalidation_stats() -> dict[str, int]:
+    """Process-wide totals since start: requested bumps, keys flushed, bumps coalesced, batches."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _flush_pending() -> None:
+    batch = getattr(_state, "pending", None)
+    _state.pending = None
+    if batch:
+        _dispatch(batch)
+
+
+def _dispatch(batch: InvalidationBatch) -> None:
+    request_batch = getattr(_state, "request", None)
+    if request_batch is not None:
+        request_batch.add(batch.keys, requested=batch.requested)
+        return
+    flush(batch)
+
+
+class InvalidationCollectorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_invalidations():
+            return self.get_response(request)
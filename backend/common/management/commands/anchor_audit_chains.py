@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.services import anchor_audit_chains
+
+
+class Command(BaseCommand):
+    help = "Record a Merkle anchor over financial audit chains that advanced since the last anchor"
+
+    def handle(self, *args, **options):
+        anchor = anchor_audit_chains()
+        if anchor is None:
+            self.stdout.write("No audit chains advanced since the last anchor.")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"Anchor {anchor.id}: root {anchor.merkle_root} over {len(anchor.leaves)} chains")
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.ledger_service import backfill_ledger_postings
+
+
+class Command(BaseCommand):
+    help = "Build double-entry postings and account balances from LedgerEntry history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+
+        def _progress(posted):
+            if verbosity > 1:
+                self.stdout.write(f"posted {posted} entries")
+
+        posted = backfill_ledger_postings(batch_size=options["batch_size"], progress=_progress)
+        self.stdout.write(self.style.SUCCESS(f"Posted {posted} ledger entries."))
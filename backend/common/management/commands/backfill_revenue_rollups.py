@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.services.revenue_rollups import REBUILD_BATCH_DAYS, rebuild_revenue_rollups
+from common.exceptions import DomainError
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily per-category revenue rollups from posted ledger entries and disputes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="First day to rebuild (default: earliest entry)")
+        parser.add_argument("--until", type=date.fromisoformat, help="Last day to rebuild (default: yesterday)")
+        parser.add_argument("--batch-days", type=int, default=REBUILD_BATCH_DAYS)
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+
+        def _progress(day, written):
+            if verbosity > 1:
+                self.stdout.write(f"rebuilt through {day.isoformat()} ({written} rows)")
+
+        try:
+            written = rebuild_revenue_rollups(
+                since=options["since"],
+                until=options["until"],
+                batch_days=options["batch_days"],
+                progress=_progress,
+            )
+        except DomainError as exc:
+            raise CommandError(str(exc.detail))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} revenue rollup rows."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.invoice_service import create_pending_invoices, run_invoice_worker
+from common.workers import run_worker_processes
+
+
+class Command(BaseCommand):
+    help = "Create QPay invoices for checkouts accepted in async invoice mode"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Make one pass over waiting checkouts and exit")
+        parser.add_argument("--workers", type=int, default=1, help="Worker processes to run until interrupted")
+        parser.add_argument("--idle-seconds", type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            counts = create_pending_invoices()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Invoices created: {counts['created']}, retrying: {counts['retrying']}, failed: {counts['failed']}."
+                )
+            )
+            return
+
+        self.stdout.write(f"Starting {max(options['workers'], 1)} invoice workers.")
+        run_worker_processes(run_invoice_worker, count=options["workers"], idle_seconds=options["idle_seconds"])
+        self.stdout.write(self.style.SUCCESS("Invoice workers stopped."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.services.escrow_service import EXPIRY_CHUNK_SIZE, expire_stale_pending_payments
+from common.exceptions import DomainError
+
+
+class Command(BaseCommand):
+    help = "Fail pending payments whose QPay invoice lapsed, and checkouts stuck creating one, in SKIP LOCKED chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl-minutes",
+            type=int,
+            help="Defaults to PAYMENT_EXPIRY_TTL_MINUTES; must exceed PAYMENT_RECONCILE_TTL_MINUTES",
+        )
+        parser.add_argument("--chunk-size", type=int, default=EXPIRY_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+
+        def _progress(expired):
+            if verbosity > 1:
+                self.stdout.write(f"expired {expired} so far")
+
+        try:
+            expired = expire_stale_pending_payments(
+                ttl_minutes=options["ttl_minutes"],
+                chunk_size=options["chunk_size"],
+                progress=_progress,
+            )
+        except DomainError as exc:
+            raise CommandError(str(exc.detail))
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} stale pending payments."))
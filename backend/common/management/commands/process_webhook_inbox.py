@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.webhook_inbox import (
+    CLAIM_BATCH_SIZE,
+    process_webhook_inbox,
+    retry_dead_webhooks,
+    run_inbox_worker,
+)
+from common.workers import run_worker_processes
+
+
+class Command(BaseCommand):
+    help = "Verify queued QPay callbacks and settle their payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the due rows and exit")
+        parser.add_argument("--workers", type=int, default=1, help="Worker processes to run until interrupted")
+        parser.add_argument("--batch-size", type=int, default=CLAIM_BATCH_SIZE)
+        parser.add_argument("--idle-seconds", type=float, default=1.0)
+        parser.add_argument("--retry-dead", action="store_true", help="Requeue dead-lettered rows first")
+        parser.add_argument("--invoice", help="Limit --retry-dead to one invoice id")
+
+    def handle(self, *args, **options):
+        if options["retry_dead"]:
+            requeued = retry_dead_webhooks(invoice_id=options["invoice"])
+            self.stdout.write(f"Requeued {requeued} dead-lettered callbacks.")
+
+        if options["once"]:
+            stats = process_webhook_inbox(batch_size=options["batch_size"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Claimed {stats.claimed}: {stats.done} done, {stats.retried} retrying, {stats.dead} dead."
+                )
+            )
+            return
+
+        self.stdout.write(f"Starting {max(options['workers'], 1)} webhook inbox workers.")
+        run_worker_processes(
+            run_inbox_worker,
+            count=options["workers"],
+            batch_size=options["batch_size"],
+            idle_seconds=options["idle_seconds"],
+        )
+        self.stdout.write(self.style.SUCCESS("Webhook inbox workers stopped."))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.payments.idempotency import PURGE_CHUNK_SIZE, purge_expired_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than the retention window, in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=int, default=settings.IDEMPOTENCY_RETENTION_DAYS)
+        parser.add_argument("--chunk-size", type=int, default=PURGE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+
+        def _progress(deleted):
+            if verbosity > 1:
+                self.stdout.write(f"deleted {deleted} keys")
+
+        deleted = purge_expired_idempotency_keys(
+            retention_days=options["retention_days"],
+            chunk_size=options["chunk_size"],
+            progress=_progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.services.ledger_reconciliation import CHUNK_SIZE, MAX_REPORTED_MISMATCHES, reconcile_ledger
+
+
+class Command(BaseCommand):
+    help = "Cross-check escrows against ledger entries, ledger accounts and paid payments, in id-ordered chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--max-reported", type=int, default=MAX_REPORTED_MISMATCHES)
+        parser.add_argument("--fail-on-mismatch", action="store_true", help="Exit non-zero when any check fails")
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+
+        def _progress(report):
+            if verbosity > 1:
+                self.stdout.write(f"checked {report.escrows} escrows, {report.mismatch_total} mismatches so far")
+
+        report = reconcile_ledger(
+            chunk_size=options["chunk_size"],
+            max_reported=options["max_reported"],
+            progress=_progress,
+        )
+        for mismatch in report.mismatches:
+            self.stderr.write(
+                f"escrow {mismatch.escrow_id} (project {mismatch.project_id}) {mismatch.check}: "
+                f"expected {mismatch.expected}, got {mismatch.actual}"
+            )
+        counts = ", ".join(f"{check} {count}" for check, count in report.mismatch_counts.items() if count)
+        self.stdout.write(
+            f"Escrows {report.escrows}, chunks {report.chunks}, mismatches {report.mismatch_total}"
+            f"{f' ({counts})' if counts else ''}, {report.elapsed_seconds:.1f}s"
+        )
+        if report.mismatch_total and options["fail_on_mismatch"]:
+            raise CommandError(f"{report.mismatch_total} ledger mismatches found")
+        self.stdout.write(self.style.SUCCESS("Ledger reconciliation finished."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.reconciliation import (
+    CHUNK_SIZE,
+    RATE_PER_SECOND,
+    WORKERS,
+    reconcile_pending_payments,
+)
+
+
+class Command(BaseCommand):
+    help = "Check stale pending payments with QPay: settle late payments and expire the rest"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ttl-minutes", type=int, help="Defaults to PAYMENT_RECONCILE_TTL_MINUTES")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--workers", type=int, default=WORKERS)
+        parser.add_argument("--rate", type=float, default=RATE_PER_SECOND, help="QPay calls per second, 0 for no limit")
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+
+        def _progress(report):
+            if verbosity > 1:
+                self.stdout.write(f"chunk {report.chunks}: scanned {report.scanned}")
+
+        report = reconcile_pending_payments(
+            ttl_minutes=options["ttl_minutes"],
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            rate_per_second=options["rate"],
+            progress=_progress,
+        )
+        for invoice_id, error in report.errors:
+            self.stderr.write(f"{invoice_id}: {error}")
+        summary = ", ".join(f"{key}={value}" for key, value in report.as_dict().items())
+        self.stdout.write(self.style.SUCCESS(f"Reconciled pending payments: {summary}"))
@@ -6,6 +6,7 @@ from apps.payments.models import Dispute, Escrow, LedgerEntry
 from apps.projects.models import Project, Proposal
 from apps.reviews.models import Review
 from apps.profiles.models import Profile
+from common.cache_utils import bump_platform_settings_version
 from common.models import PlatformSetting
 
 
@@ -79,10 +80,11 @@ class Command(BaseCommand):
             },
         )
 
-        setting = PlatformSetting.get_solo()
+        setting = PlatformSetting.get_solo(from_db=True)
         if setting.platform_fee_pct != 12:
             setting.platform_fee_pct = 12
             setting.save(update_fields=["platform_fee_pct"])
+            bump_platform_settings_version()
 
         open_project, _ = Project.objects.get_or_create(
             owner=client,
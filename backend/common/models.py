@@ -1,6 +1,17 @@
 """Common models."""
+import copy
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 
+from common.cache_utils import platform_settings_cache_key
+
+_solo_lock = threading.Lock()
+# The last settings row read by this process, under the versioned key it was cached with.
+_solo_local: dict = {}
+
 
 class PlatformSetting(models.Model):
     platform_fee_pct = models.PositiveSmallIntegerField(default=12)
@@ -16,6 +27,32 @@ class PlatformSetting(models.Model):
         ]
 
     @classmethod
-    def get_solo(cls):
-        setting, _created = cls.objects.get_or_create(id=1)
-        return setting
+    def get_solo(cls, *, from_db: bool = False, for_update: bool = False):
+        """The settings row, cached in-process and in the shared cache under the settings version.
+
+        Writers call ``bump_platform_settings_version`` (deferred to commit), which moves every
+        reader to a new key. ``from_db`` reads the committed row instead, and ``for_update``
+        also locks it; both are for code that writes or must not act on a lagging value.
+        """
+        if from_db or for_update:
+            queryset = cls.objects.select_for_update() if for_update else cls.objects
+            setting, _created = queryset.get_or_create(id=1)
+            return setting
+
+        key = platform_settings_cache_key()
+        with _solo_lock:
+            local = _solo_local.get(key)
+        if local is not None:
+            return copy.copy(local)
+
+        values = cache.get(key)
+        if values is None:
+            setting, _created = cls.objects.get_or_create(id=1)
+            values = {field.attname: getattr(setting, field.attname) for field in cls._meta.concrete_fields}
+            cache.set(key, values, timeout=settings.PLATFORM_SETTINGS_CACHE_SECONDS)
+        setting = cls(**values)
+        setting._state.adding = False
+        with _solo_lock:
+            _solo_local.clear()
+            _solo_local[key] = setting
+        return copy.copy(setting)
@@ -1,8 +1,123 @@
 """Pagination helpers."""
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import datetime
 
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-class StandardResultsSetPagination(PageNumberPagination):
+
+class KeysetCursorPagination(BasePagination):
+    """Seek pagination over (-created_at, -id) with opaque cursors and no COUNT(*).
+
+    The seek order replaces the queryset's own, so a queryset ordered by anything else first
+    (search rank, say) is refused rather than silently re-sorted by date.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    seek_field = "created_at"
+    invalid_cursor_message = "Invalid cursor"
+    unsupported_ordering_message = "Cursor pagination is only available for newest-first listings; use page numbers."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = queryset.query.order_by
+        if ordering and str(ordering[0]).lstrip("-") != self.seek_field:
+            raise ValidationError({"detail": self.unsupported_ordering_message})
+        self.base_url = remove_query_param(request.build_absolute_uri(), "page")
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor["reverse"])
+
+        if cursor is not None:
+            queryset = queryset.filter(self._seek_filter(cursor))
+        if self.reverse:
+            queryset = queryset.order_by(self.seek_field, "id")
+        else:
+            queryset = queryset.order_by(f"-{self.seek_field}", "-id")
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            return {
+                "position": datetime.fromisoformat(raw["p"]),
+                "id": int(raw["i"]),
+                "reverse": bool(raw.get("r")),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverse: bool) -> str:
+        raw = {"p": getattr(item, self.seek_field).isoformat(), "i": item.pk}
+        if reverse:
+            raw["r"] = 1
+        payload = json.dumps(raw, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(payload).decode("ascii")
+
+    def _seek_filter(self, cursor) -> Q:
+        position, pk = cursor["position"], cursor["id"]
+        if cursor["reverse"]:
+            return Q(**{f"{self.seek_field}__gt": position}) | Q(**{self.seek_field: position, "id__gt": pk})
+        return Q(**{f"{self.seek_field}__lt": position}) | Q(**{self.seek_field: position, "id__lt": pk})
+
+    def _link(self, item, reverse: bool) -> str:
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(item, reverse))
+
+
+class CursorOptInPagination(PageNumberPagination):
+    """Page-number pagination that switches to keyset mode on ?pagination=cursor or ?cursor=."""
+
+    mode_query_param = "pagination"
+    cursor_pagination_class = KeysetCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self._wants_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            self.cursor_paginator.page_size = self.get_page_size(request)
+            return self.cursor_paginator.paginate_queryset(queryset, request, view=view)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def _wants_cursor(self, request) -> bool:
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        return request.query_params.get(self.mode_query_param) == "cursor" or cursor_param in request.query_params
+
+
+class StandardResultsSetPagination(CursorOptInPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
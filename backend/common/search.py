@@ -0,0 +1,27 @@
+"""Full-text search query helpers."""
+import re
+import unicodedata
+
+SEARCH_CONFIG = "simple"
+MAX_SEARCH_TERMS = 8
+
+# Letters and digits in any script (Mongolian Cyrillic, Latin); underscores and
+# punctuation act as separators so they can never reach the tsquery parser.
+_TERM_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def normalize_search_terms(raw: str | None) -> list[str]:
+    if not raw:
+        return []
+    text = unicodedata.normalize("NFKC", raw).casefold()
+    terms: list[str] = []
+    for term in _TERM_PATTERN.findall(text):
+        if term not in terms:
+            terms.append(term)
+        if len(terms) >= MAX_SEARCH_TERMS:
+            break
+    return terms
+
+
+def build_prefix_tsquery(terms: list[str]) -> str:
+    return " & ".join(f"{term}:*" for term in terms)
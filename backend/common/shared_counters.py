@@ -0,0 +1,25 @@
+"""Named counters kept in the shared cache, so every worker process adds to the same totals."""
+from django.core.cache import cache
+
+
+class SharedCounters:
+    """Monotonic counters under ``{prefix}:{name}``; they live until reset or evicted."""
+
+    def __init__(self, prefix: str, names):
+        self._keys = {name: f"{prefix}:{name}" for name in names}
+
+    def incr(self, name: str, delta: int = 1) -> None:
+        key = self._keys[name]
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Evicted between add and incr.
+            cache.set(key, delta, timeout=None)
+
+    def snapshot(self) -> dict[str, int]:
+        values = cache.get_many(list(self._keys.values()))
+        return {name: int(values.get(key) or 0) for name, key in self._keys.items()}
+
+    def reset(self) -> None:
+        cache.delete_many(list(self._keys.values()))
@@ -0,0 +1,245 @@
+import functools
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from apps.accounts.models import User
+from apps.adminpanel.services import update_platform_fee
+from common import cached_read as cached_read_module
+from common import models as common_models
+from common import version_cache
+from common.cached_read import cached_read
+from common.invalidation import bump_version, collect_invalidations, invalidation_stats
+from common.models import PlatformSetting
+from common.version_cache import LocalVersionCache
+
+
+def _value(value):
+    return {"value": value}
+
+
+class CachedReadTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_miss_computes_once_then_serves_cache(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"value": len(calls)}
+
+        self.assertEqual(cached_read("t:miss:v1", compute, timeout=60), {"value": 1})
+        self.assertEqual(cached_read("t:miss:v1", compute, timeout=60), {"value": 1})
+        self.assertEqual(len(calls), 1)
+
+    def test_lock_loser_gets_previous_version_without_computing(self):
+        cached_read("t:flight:v1", lambda: {"value": "old"}, timeout=60, stale_key="t:flight:stale")
+        cache.add("t:flight:v2:lock", "other-worker", timeout=10)
+
+        def compute():
+            raise AssertionError("lock loser must not recompute")
+
+        payload = cached_read("t:flight:v2", compute, timeout=60, stale_key="t:flight:stale")
+        self.assertEqual(payload, {"value": "old"})
+
+    def test_lock_loser_waits_for_winner_when_nothing_stale(self):
+        cache.add("t:wait:v1:lock", "other-worker", timeout=10)
+
+        def winner():
+            time.sleep(0.1)
+            cache.set("t:wait:v1", {"payload": {"value": "fresh"}, "fresh_until": time.time() + 60, "tags": {}})
+
+        thread = threading.Thread(target=winner)
+        thread.start()
+        payload = cached_read("t:wait:v1", lambda: {"value": "local"}, timeout=60)
+        thread.join()
+        self.assertEqual(payload, {"value": "fresh"})
+
+    def test_soft_expired_entry_is_served_while_refreshing_in_background(self):
+        cache.set("t:soft:v1", {"payload": {"value": "stale"}, "fresh_until": time.time() - 1, "tags": {}}, timeout=60)
+        started = []
+
+        def fake_refresh(cache_key, compute, args, token, *options):
+            started.append(cache_key)
+            cached_read_module._compute_and_store(cache_key, compute, args, *options)
+            cached_read_module._release_lock(cache_key, token)
+
+        with patch.object(cached_read_module, "_refresh_in_background", side_effect=fake_refresh):
+            payload = cached_read("t:soft:v1", _value, args=("new",), timeout=60, soft_timeout=30)
+            self.assertEqual(payload, {"value": "stale"})
+            refreshed = cached_read("t:soft:v1", _value, args=("newer",), timeout=60, soft_timeout=30)
+            self.assertEqual(refreshed, {"value": "new"})
+        self.assertEqual(started, ["t:soft:v1"])
+
+    def test_soft_timeout_requires_a_module_level_compute(self):
+        request_state = {"value": "request"}
+
+        def _nested():
+            return {"value": "nested"}
+
+        for compute in (lambda: request_state, _nested, functools.partial(_value, "partial"), self.setUp):
+            with self.subTest(compute=compute), self.assertRaises(TypeError):
+                cached_read("t:closure:v1", compute, timeout=60, soft_timeout=30)
+        self.assertEqual(cached_read("t:closure:v1", _value, args=("plain",), timeout=60, soft_timeout=30), {"value": "plain"})
+
+    def test_redis_lock_release_compares_and_deletes_in_one_script(self):
+        connection = Mock()
+        with (
+            patch.object(cached_read_module, "_uses_redis", return_value=True),
+            patch("django_redis.get_redis_connection", return_value=connection),
+            patch.object(cache, "client", Mock(encode=lambda value: value.encode()), create=True),
+        ):
+            cached_read_module._release_lock("t:release:v1", "token")
+        connection.eval.assert_called_once_with(
+            cached_read_module.RELEASE_LOCK_SCRIPT, 1, cache.make_key("t:release:v1:lock"), b"token"
+        )
+
+
+class LocalVersionCacheTests(SimpleTestCase):
+    def test_lru_evicts_least_recently_used(self):
+        local = LocalVersionCache(max_entries=2, ttl_seconds=60)
+        local.set_many({"a": 1, "b": 1})
+        local.get_many(["a"])
+        local.set_many({"c": 1})
+        self.assertEqual(local.get_many(["a", "b", "c"]), {"a": 1, "c": 1})
+
+    def test_fetch_racing_an_invalidation_is_not_stored(self):
+        local = LocalVersionCache(max_entries=10, ttl_seconds=60)
+        generation = local.generation
+        local.discard("a")
+        local.set_many({"a": 1}, generation=generation)
+        self.assertEqual(local.get_many(["a"]), {})
+
+
+@override_settings(REDIS_URL="redis://cache:6379/0")
+class VersionL1Tests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        version_cache._local.clear()
+        listener = patch.object(version_cache, "_ensure_listener")
+        self.publish = patch.object(version_cache, "_publish_invalidation").start()
+        listener.start()
+        self.addCleanup(patch.stopall)
+
+    def test_hit_skips_shared_cache_and_bump_publishes(self):
+        with patch.object(version_cache.cache, "get_many", wraps=cache.get_many) as get_many:
+            self.assertEqual(version_cache.get_version("t:version:1"), 1)
+            self.assertEqual(version_cache.get_version("t:version:1"), 1)
+            self.assertEqual(get_many.call_count, 1)
+
+            version_cache.bump_version("t:version:1")
+            self.assertEqual(version_cache.get_version("t:version:1"), 2)
+            self.assertEqual(get_many.call_count, 1)
+        self.publish.assert_called_once_with("t:version:1")
+
+    def test_published_invalidation_evicts_local_entry(self):
+        version_cache.get_version("t:version:2")
+        cache.set("t:version:2", 5)
+        version_cache._local.discard("t:version:2")
+        self.assertEqual(version_cache.get_version("t:version:2"), 5)
+
+
+class InvalidationCollectorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bumps_wait_for_commit_and_are_coalesced(self):
+        before = invalidation_stats()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                for _ in range(3):
+                    bump_version("t:collect:a")
+                bump_version("t:collect:b")
+                self.assertEqual(version_cache.get_version("t:collect:a"), 1)
+
+        self.assertTrue(callbacks)
+        self.assertEqual(version_cache.get_versions(["t:collect:a", "t:collect:b"]), {"t:collect:a": 2, "t:collect:b": 2})
+        after = invalidation_stats()
+        self.assertEqual(after["requested"] - before["requested"], 4)
+        self.assertEqual(after["coalesced"] - before["coalesced"], 2)
+
+    def test_bump_survives_rolled_back_savepoint(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        bump_version("t:collect:d")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                bump_version("t:collect:d")
+
+        self.assertEqual(version_cache.get_version("t:collect:d"), 2)
+
+
+class RolledBackInvalidationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bumps_of_a_rolled_back_request_do_not_reach_the_next_commit(self):
+        with collect_invalidations():
+            try:
+                with transaction.atomic():
+                    bump_version("t:rollback:a")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        with transaction.atomic():
+            bump_version("t:rollback:b")
+
+        self.assertEqual(version_cache.get_versions(["t:rollback:a", "t:rollback:b"]), {"t:rollback:a": 1, "t:rollback:b": 2})
+
+
+class RequestInvalidationScopeTests(SimpleTestCase):
+    def test_request_scope_flushes_once_on_exit(self):
+        with patch("common.invalidation.bump_versions") as bump_versions:
+            with collect_invalidations():
+                bump_version("t:collect:c")
+                bump_version("t:collect:c")
+                bump_versions.assert_not_called()
+        bump_versions.assert_called_once_with({"t:collect:c"})
+
+
+class PlatformSettingCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        common_models._solo_local.clear()
+        self.admin = User.objects.create_user(email="admin-settings@test.com", role="admin", password="pass1234")
+
+    def test_reads_are_served_from_process_then_shared_cache(self):
+        self.assertEqual(PlatformSetting.get_solo().platform_fee_pct, 12)
+        with self.assertNumQueries(0):
+            self.assertEqual(PlatformSetting.get_solo().platform_fee_pct, 12)
+
+        common_models._solo_local.clear()
+        with self.assertNumQueries(0):
+            setting = PlatformSetting.get_solo()
+        self.assertEqual((setting.id, setting.partial_escrow_mode), (1, False))
+
+    def test_fee_update_moves_readers_to_new_version_on_commit(self):
+        PlatformSetting.get_solo()
+        with self.captureOnCommitCallbacks(execute=True):
+            update_platform_fee(15, actor=self.admin)
+            # Not committed yet: readers keep the previous version.
+            self.assertEqual(PlatformSetting.get_solo().platform_fee_pct, 12)
+
+        self.assertEqual(PlatformSetting.get_solo().platform_fee_pct, 15)
+
+    def test_from_db_bypasses_caches(self):
+        PlatformSetting.get_solo()
+        PlatformSetting.objects.filter(id=1).update(platform_fee_pct=20)
+
+        self.assertEqual(PlatformSetting.get_solo().platform_fee_pct, 12)
+        self.assertEqual(PlatformSetting.get_solo(from_db=True).platform_fee_pct, 20)
+        with transaction.atomic():
+            self.assertEqual(PlatformSetting.get_solo(for_update=True).platform_fee_pct, 20)
+
+    def test_cached_copies_are_independent(self):
+        first = PlatformSetting.get_solo()
+        first.platform_fee_pct = 29
+        self.assertEqual(PlatformSetting.get_solo().platform_fee_pct, 12)
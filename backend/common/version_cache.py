@@ -0,0 +1,203 @@
+"""Per-process L1 cache for cache version counters, invalidated over Redis pub/sub."""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:version:invalidate"
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+class LocalVersionCache:
+    """Thread-safe LRU of version counters with a TTL backstop for missed invalidations."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get_many(self, keys) -> dict[str, int]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, values: dict[str, int], generation: int | None = None) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            # An invalidation that arrived while the values were being fetched may make them stale.
+            if generation is not None and generation != self.generation:
+                return
+            for key, value in values.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+_local = LocalVersionCache(
+    max_entries=settings.CACHE_VERSION_L1_MAX_ENTRIES,
+    ttl_seconds=settings.CACHE_VERSION_L1_TTL_SECONDS,
+)
+_listener_pid: int | None = None
+_listener_lock = threading.Lock()
+
+
+def l1_enabled() -> bool:
+    # Only Redis is shared between workers; locmem is already in-process, so there is nothing to save.
+    return settings.CACHE_VERSION_L1_ENABLED and bool(settings.REDIS_URL)
+
+
+def get_versions(keys) -> dict[str, int]:
+    keys = list(keys)
+    if not keys:
+        return {}
+    if not l1_enabled():
+        current = cache.get_many(keys)
+        return {key: current.get(key) or 1 for key in keys}
+
+    _ensure_listener()
+    versions = _local.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        generation = _local.generation
+        current = cache.get_many(missing)
+        fetched = {key: current.get(key) or 1 for key in missing}
+        _local.set_many(fetched, generation=generation)
+        versions.update(fetched)
+    return versions
+
+
+def get_version(key: str) -> int:
+    return get_versions([key])[key]
+
+
+def bump_version(key: str) -> None:
+    bump_versions([key])
+
+
+def bump_versions(keys) -> dict[str, int]:
+    """Increment every key once; on Redis the increments and invalidations share one pipeline."""
+    keys = sorted(set(keys))
+    if not keys:
+        return {}
+    if _uses_redis():
+        return _bump_pipelined(keys)
+
+    versions = {}
+    for key in keys:
+        try:
+            versions[key] = cache.incr(key)
+        except ValueError:
+            versions[key] = 2
+            cache.set(key, 2, timeout=None)
+    if l1_enabled():
+        _local.set_many(versions)
+        for key in keys:
+            _publish_invalidation(key)
+    return versions
+
+
+def _uses_redis() -> bool:
+    return settings.CACHES["default"]["BACKEND"] == "django_redis.cache.RedisCache"
+
+
+def _bump_pipelined(keys: list[str]) -> dict[str, int]:
+    from django_redis import get_redis_connection
+
+    publish = l1_enabled()
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for key in keys:
+            redis_key = str(cache.make_key(key))
+            # A missing counter reads as version 1, so seed it first and the increment lands on 2.
+            pipe.set(redis_key, 1, nx=True)
+            pipe.incr(redis_key)
+        if publish:
+            for key in keys:
+                pipe.publish(_channel(), key)
+        results = pipe.execute()
+    except Exception:
+        logger.warning("Failed to bump cache versions %s", keys, exc_info=True)
+        if publish:
+            _local.clear()
+        return {}
+    versions = {key: int(results[index * 2 + 1]) for index, key in enumerate(keys)}
+    if publish:
+        _local.set_many(versions)
+    return versions
+
+
+def _channel() -> str:
+    prefix = settings.CACHES["default"].get("KEY_PREFIX", "")
+    return f"{prefix}:{INVALIDATION_CHANNEL}" if prefix else INVALIDATION_CHANNEL
+
+
+def _publish_invalidation(key: str) -> None:
+    from django_redis import get_redis_connection
+
+    try:
+        get_redis_connection("default").publish(_channel(), key)
+    except Exception:
+        logger.warning("Failed to publish version invalidation for %s", key, exc_info=True)
+
+
+def _ensure_listener() -> None:
+    global _listener_pid
+    # Compare pids so a worker forked from a preloaded master starts its own listener.
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        _local.clear()
+        threading.Thread(target=_listen_for_invalidations, name="cache-version-listener", daemon=True).start()
+
+
+def _listen_for_invalidations() -> None:
+    from django_redis import get_redis_connection
+
+    while True:
+        try:
+            pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(_channel())
+            # Anything cached before the subscription was live may have missed an invalidation.
+            _local.clear()
+            for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                key = message["data"]
+                _local.discard(key.decode("utf-8") if isinstance(key, bytes) else key)
+        except Exception:
+            logger.warning("Version invalidation listener disconnected; retrying", exc_info=True)
+        _local.clear()
+        time.sleep(RECONNECT_DELAY_SECONDS)
@@ -0,0 +1,35 @@
+"""Run a polling loop in several worker processes until interrupted."""
+import multiprocessing
+import signal
+
+from django.db import connections
+
+
+def _run(target, kwargs: dict, stop_event) -> None:
+    import django
+
+    django.setup()
+    # The parent handles Ctrl-C and stops the children through the shared event.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(should_stop=stop_event.is_set, **kwargs)
+
+
+def run_worker_processes(target, *, count: int, **kwargs) -> int:
+    """Start ``count`` processes running ``target(should_stop=..., **kwargs)`` and wait for them."""
+    # Children open their own database connections; an inherited socket must not be shared.
+    connections.close_all()
+    stop_event = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(target=_run, args=(target, kwargs, stop_event))
+        for _ in range(max(count, 1))
+    ]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        for process in workers:
+            process.join()
+    return len(workers)
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "common.invalidation.InvalidationCollectorMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -134,7 +135,7 @@ REST_FRAMEWORK = {
         "apps.accounts.authentication.CookieJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "common.pagination.CursorOptInPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_THROTTLE_CLASSES": (
         "rest_framework.throttling.AnonRateThrottle",
@@ -151,6 +152,11 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=14),
 }
 
+IDEMPOTENCY_RETENTION_DAYS = int(os.getenv("IDEMPOTENCY_RETENTION_DAYS", "7"))
+IDEMPOTENCY_CACHE_SECONDS = int(os.getenv("IDEMPOTENCY_CACHE_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "2"))
+IDEMPOTENCY_RESERVATION_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_RESERVATION_TTL_SECONDS", "120"))
+
 PLATFORM_FEE_PCT = int(os.getenv("PLATFORM_FEE_PCT", "12"))
 PLATFORM_FEE_MAX_PCT = int(os.getenv("PLATFORM_FEE_MAX_PCT", "30"))
 
@@ -160,8 +166,41 @@ QPAY_PASSWORD = os.getenv("QPAY_PASSWORD", "")
 QPAY_MERCHANT_CODE = os.getenv("QPAY_MERCHANT_CODE", "ITZUUN_ESCROW")
 QPAY_WEBHOOK_SECRET = os.getenv("QPAY_WEBHOOK_SECRET", "")
 QPAY_CALLBACK_URL = os.getenv("QPAY_CALLBACK_URL", "")
+QPAY_HTTP_POOL_SIZE = int(os.getenv("QPAY_HTTP_POOL_SIZE", "10"))
+QPAY_HTTP_MAX_RETRIES = int(os.getenv("QPAY_HTTP_MAX_RETRIES", "2"))
+QPAY_HTTP_RETRY_BASE_SECONDS = float(os.getenv("QPAY_HTTP_RETRY_BASE_SECONDS", "0.2"))
+QPAY_HTTP_RETRY_MAX_SECONDS = float(os.getenv("QPAY_HTTP_RETRY_MAX_SECONDS", "2"))
+# "sync" creates the QPay invoice inside the checkout request; "async" leaves it to create_pending_invoices.
+PAYMENT_INVOICE_MODE = os.getenv("PAYMENT_INVOICE_MODE", "sync")
+PAYMENT_INVOICE_MAX_ATTEMPTS = int(os.getenv("PAYMENT_INVOICE_MAX_ATTEMPTS", "5"))
+PAYMENT_INVOICE_RETRY_BASE_SECONDS = float(os.getenv("PAYMENT_INVOICE_RETRY_BASE_SECONDS", "10"))
+PAYMENT_INVOICE_RETRY_MAX_SECONDS = float(os.getenv("PAYMENT_INVOICE_RETRY_MAX_SECONDS", "300"))
+# How long a worker owns a checkout during its QPay call; well above the 12s QPay timeout.
+PAYMENT_INVOICE_LEASE_SECONDS = int(os.getenv("PAYMENT_INVOICE_LEASE_SECONDS", "60"))
+# reconcile_pending_payments asks QPay about pending payments older than this.
+PAYMENT_RECONCILE_TTL_MINUTES = int(os.getenv("PAYMENT_RECONCILE_TTL_MINUTES", "30"))
+# expire_stale_payments fails them without asking QPay, so it must wait longer than reconcile.
+PAYMENT_EXPIRY_TTL_MINUTES = int(os.getenv("PAYMENT_EXPIRY_TTL_MINUTES", "120"))
+PAYMENT_STATUS_WAIT_SECONDS = float(os.getenv("PAYMENT_STATUS_WAIT_SECONDS", "10"))
+# Request threads per process; keep equal to gunicorn --threads.
+WEB_THREADS = int(os.getenv("WEB_THREADS", "3"))
+# Long-polls parked per process; the default leaves one thread for every other endpoint.
+PAYMENT_STATUS_MAX_WAITERS = int(os.getenv("PAYMENT_STATUS_MAX_WAITERS", str(max(WEB_THREADS - 1, 1))))
+PAYMENT_INVOICE_ARTIFACT_MAX_AGE = int(os.getenv("PAYMENT_INVOICE_ARTIFACT_MAX_AGE", "86400"))
+QPAY_BREAKER_FAILURE_THRESHOLD = int(os.getenv("QPAY_BREAKER_FAILURE_THRESHOLD", "5"))
+QPAY_BREAKER_WINDOW_SECONDS = int(os.getenv("QPAY_BREAKER_WINDOW_SECONDS", "30"))
+QPAY_BREAKER_RESET_SECONDS = float(os.getenv("QPAY_BREAKER_RESET_SECONDS", "30"))
+QPAY_WEBHOOK_MAX_ATTEMPTS = int(os.getenv("QPAY_WEBHOOK_MAX_ATTEMPTS", "8"))
+QPAY_WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("QPAY_WEBHOOK_RETRY_BASE_SECONDS", "5"))
+QPAY_WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("QPAY_WEBHOOK_RETRY_MAX_SECONDS", "600"))
+QPAY_WEBHOOK_LEASE_SECONDS = int(os.getenv("QPAY_WEBHOOK_LEASE_SECONDS", "60"))
+QPAY_WEBHOOK_CACHE_SECONDS = int(os.getenv("QPAY_WEBHOOK_CACHE_SECONDS", "3600"))
 
 REDIS_URL = os.getenv("REDIS_URL", "")
+CACHE_VERSION_L1_ENABLED = os.getenv("CACHE_VERSION_L1_ENABLED", "1") == "1"
+CACHE_VERSION_L1_MAX_ENTRIES = int(os.getenv("CACHE_VERSION_L1_MAX_ENTRIES", "10000"))
+CACHE_VERSION_L1_TTL_SECONDS = float(os.getenv("CACHE_VERSION_L1_TTL_SECONDS", "30"))
+PLATFORM_SETTINGS_CACHE_SECONDS = int(os.getenv("PLATFORM_SETTINGS_CACHE_SECONDS", "3600"))
 if REDIS_URL:
     CACHES = {
         "default": {